@@ -1,18 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from .auth import get_current_user
-from .db import async_session
+from .db import async_session, get_read_db, pool_stats, read_engine, read_router
 from . import crud
+from . import rollups
+from . import exports
+from . import models
+from .token_cache import token_cache
+from .visit_buffer import visit_buffer
+from .minting import mint_tags, BATCH_ENCODE_MAX
+from . import tag_migration
+from .tag_migration import TAG_MIGRATION_CHUNK_SIZE
 from .schemas import UserCreate, Token, BatchEncodeRequest, BatchEncodeResponse
-from .schemas import MerchantCreateResponse, MerchantCredential
+from .schemas import MerchantCreateResponse, MerchantCredential, MerchantBulkRequest, AIBatchRequest
+from .ai_batch import AI_BATCH_MAX_ITEMS
+from .jobs import job_runner, serialize as serialize_job, JOB_ARTIFACT_DIR
+from . import job_handlers  # noqa: F401  registers job kinds
+from . import http_client
+from .llm_cache import llm_cache
+from .single_flight import upstream_flight
+from .upstream_guard import llm_guard
+from .audit_log import audit_log
+from .password_pool import password_pool
+from .principal_cache import principal_cache
+from .profiling import profile_store
+from . import rate_limit as rate_limits
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 import os
 from .auth import create_access_token
 
 router = APIRouter()
 
+# largest synchronous POST /admin/merchants/bulk; bigger batches go through /admin/merchants/jobs
+MERCHANT_BULK_MAX = int(os.getenv("MERCHANT_BULK_MAX", "2000"))
+# largest synchronous batch_encode (tokens come back in one JSON body); bigger batches use the job
+BATCH_ENCODE_SYNC_MAX = int(os.getenv("BATCH_ENCODE_SYNC_MAX", "10000"))
+
 
 async def get_db() -> AsyncSession:
     async with async_session() as s:
@@ -36,13 +62,17 @@ async def login(payload: UserCreate, db: AsyncSession = Depends(get_db)):
         if not user:
             raise HTTPException(status_code=400, detail="Incorrect email or password")
         # verify password via auth functions
-        from .auth import verify_password, create_access_token
+        from .auth import verify_and_update_async, create_access_token
         try:
-            ok = verify_password(payload.password, user.hashed_password)
+            ok, new_hash = await verify_and_update_async(payload.password, user.hashed_password)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"password_verify_error: {str(e)}")
         if not ok:
             raise HTTPException(status_code=400, detail="Incorrect email or password")
+        if new_hash:
+            # hashing parameters changed since this password was stored; upgrade it transparently
+            user.hashed_password = new_hash
+            await db.commit()
         token = create_access_token({"sub": user.email})
         return {"access_token": token, "token_type": "bearer"}
     except HTTPException:
@@ -71,34 +101,53 @@ async def batch_encode(shop_id: str, payload: BatchEncodeRequest, db: AsyncSessi
     Generate `count` tokens for a shop and persist NFCTag rows.
     Returns the list of tokens (and count). In production, you may want to store CSV on blob storage.
     """
-    if payload.count <= 0 or payload.count > 10000:
-        raise HTTPException(status_code=400, detail="Invalid count (1..10000)")
+    if payload.count <= 0 or payload.count > BATCH_ENCODE_SYNC_MAX:
+        raise HTTPException(status_code=400, detail=f"Invalid count (1..{BATCH_ENCODE_SYNC_MAX}); use the batch_encode job for more")
+
+    # bulk path: tokens built and collision-checked in memory, written in chunks (COPY on PostgreSQL)
+    # inside one transaction, so a failed request leaves no unreported tags
+    tokens = await mint_tags(db, shop_id, payload.count, prefix=payload.prefix)
+    for t in tokens:
+        token_cache.invalidate_token(t)
+    return {"tokens": tokens, "count": len(tokens)}
 
-    tokens: List[str] = []
-    for _ in range(payload.count):
-        new_token = (payload.prefix or "") + uuid.uuid4().hex[:12]
-        tagsql = {
-            "id": uuid.uuid4(),
-            "shop_id": shop_id,
-            "token": new_token,
-            "ndef_payload": {"uri": f"https://app.example.com/t/{new_token}"},
-            "status": "unused",
-        }
-        # Insert via raw SQL or ORM model creation
-        await db.execute(
-            "INSERT INTO nfc_tags (id, shop_id, token, ndef_payload, status, created_at) VALUES (:id, :shop_id, :token, :ndef_payload, :status, CURRENT_TIMESTAMP)",
-            {
-                "id": str(tagsql["id"]),
-                "shop_id": str(tagsql["shop_id"]),
-                "token": tagsql["token"],
-                "ndef_payload": json.dumps(tagsql["ndef_payload"]),
-                "status": tagsql["status"],
-            },
-        )
-        tokens.append(new_token)
 
-    await db.commit()
-    return {"tokens": tokens, "count": len(tokens)}
+def _require_shop_access(user, shop_id: str) -> None:
+    if not getattr(user, "is_admin", 0) and getattr(user, "shop_id", None) != shop_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def _export_response(batches, fmt: str, columns, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        exports.encode(batches, fmt, columns),
+        media_type=exports.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@router.get("/shops/{shop_id}/tags/export")
+async def export_tags(shop_id: str, format: str = "csv", status: Optional[str] = None, user=Depends(get_current_user)):
+    """
+    Stream a shop's tags (token, URI, status) as CSV, NDJSON, or `txt` (one token per line,
+    the input of the write-card tool). Memory use is constant regardless of row count.
+    """
+    _require_shop_access(user, shop_id)
+    if format not in exports.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be csv, ndjson or txt")
+    if status is not None and status not in models.TagStatus.__members__:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    return _export_response(exports.iter_tags(shop_id, status=status), format, exports.TAG_COLUMNS, f"tags-{shop_id}")
+
+
+@router.get("/shops/{shop_id}/visits/export")
+async def export_visits(shop_id: str, format: str = "csv", user=Depends(get_current_user)):
+    """
+    Stream a shop's visit log as CSV or NDJSON.
+    """
+    _require_shop_access(user, shop_id)
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    return _export_response(exports.iter_visits(shop_id), format, exports.VISIT_COLUMNS, f"visits-{shop_id}")
 
 
 @router.post("/admin/merchants", response_model=MerchantCredential)
@@ -107,26 +156,31 @@ async def create_merchant(db: AsyncSession = Depends(get_db), user=Depends(get_c
     if not getattr(user, "is_admin", 0):
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    from secrets import token_urlsafe
-    import random
-    import string
+    return await crud.create_merchant_account(db)
 
-    # Generate random username and password
-    username = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-    password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
 
-    # Create a new shop for this merchant (use CURRENT_TIMESTAMP for compatibility)
-    shop_id = str(uuid.uuid4())
-    await db.execute(
-        "INSERT INTO shops (id, name, created_at) VALUES (:id, :name, CURRENT_TIMESTAMP)",
-        {"id": shop_id, "name": f"Shop {username}"}
-    )
+@router.post("/admin/merchants/bulk")
+async def create_merchants_bulk(payload: MerchantBulkRequest, format: str = "json", db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    """
+    Admin-only: create `count` shops with one merchant user each in a single transaction.
+    Credentials are returned as JSON (`MerchantCreateResponse`) or streamed as `csv` / `ndjson`
+    once everything is committed.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if format not in ("json", "csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json, csv or ndjson")
+    if payload.count <= 0 or payload.count > MERCHANT_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"Invalid count (1..{MERCHANT_BULK_MAX})")
+    created = await crud.create_merchant_accounts(db, payload.count)
+    if format == "json":
+        return MerchantCreateResponse(credentials=created, count=len(created))
 
-    # Create merchant user linked to the new shop
-    created = await crud.create_user(db, f"{username}@merchant.local", password, shop_id=shop_id, is_admin=0)
-    await db.commit()
+    async def batches():
+        for i in range(0, len(created), exports.EXPORT_BATCH_SIZE):
+            yield created[i:i + exports.EXPORT_BATCH_SIZE]
 
-    return {"username": username, "password": password, "shop_id": shop_id}
+    return _export_response(batches(), format, exports.MERCHANT_COLUMNS, "merchants")
 
 
 @router.get("/me")
@@ -138,51 +192,309 @@ async def get_me(user=Depends(get_current_user)):
 
 
 @router.post("/admin/migrate_tag_uris")
-async def migrate_tag_uris(db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+async def migrate_tag_uris(restart: bool = False, chunk_size: int = TAG_MIGRATION_CHUNK_SIZE, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
     """
     Admin-only: migrate stored ndef_payload.uri for all nfc_tags to point to the frontend SPA domain.
     This updates each tag's ndef_payload.uri to: https://nfcfront3.vercel.app/t/{token}
+    Runs as id-ordered chunks with a commit and checkpoint per chunk; an interrupted run
+    resumes where it stopped unless `restart=true`.
     """
     if not getattr(user, "is_admin", 0):
         raise HTTPException(status_code=403, detail="Forbidden")
-    migrated = 0
+    if chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="Invalid chunk_size")
     try:
-        res = await db.execute("SELECT id, token, ndef_payload FROM nfc_tags")
-        rows = res.fetchall()
-        for r in rows:
-            id_, token_, payload = r[0], r[1], r[2]
-            try:
-                # payload may be a dict or JSON string
-                if isinstance(payload, str):
-                    p = json.loads(payload)
-                else:
-                    p = payload or {}
-            except Exception:
-                p = {}
-            p['uri'] = f"https://nfcfront3.vercel.app/t/{token_}"
-            await db.execute("UPDATE nfc_tags SET ndef_payload = :np WHERE id = :id", {"np": json.dumps(p), "id": str(id_)})
-            migrated += 1
-        await db.commit()
+        return await tag_migration.migrate_tag_uris(db, chunk_size=chunk_size, restart=restart)
     except Exception as exc:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(exc))
-    return {"migrated": migrated}
+
+
+# --- background jobs: "submit and poll" variants of the long-running admin operations ---
+
+def _job_owner(user) -> Optional[str]:
+    return getattr(user, "email", None)
+
+
+@router.post("/shops/{shop_id}/tags/batch_encode/jobs", status_code=202)
+async def batch_encode_job(shop_id: str, payload: BatchEncodeRequest, user=Depends(get_current_user)):
+    """
+    Queue tag minting as a background job; poll GET /api/jobs/{id}, then download the
+    minted tokens (one per line) from GET /api/jobs/{id}/artifact.
+    """
+    _require_shop_access(user, shop_id)
+    if payload.count <= 0 or payload.count > BATCH_ENCODE_MAX:
+        raise HTTPException(status_code=400, detail=f"Invalid count (1..{BATCH_ENCODE_MAX})")
+    params = {"shop_id": shop_id, "count": payload.count, "prefix": payload.prefix}
+    return await job_runner.submit("mint_tags", params, created_by=_job_owner(user), total=payload.count)
+
+
+@router.post("/shops/{shop_id}/tags/export/jobs", status_code=202)
+async def export_tags_job(shop_id: str, format: str = "csv", status: Optional[str] = None, user=Depends(get_current_user)):
+    _require_shop_access(user, shop_id)
+    if format not in exports.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be csv, ndjson or txt")
+    if status is not None and status not in models.TagStatus.__members__:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    params = {"shop_id": shop_id, "format": format, "status": status}
+    return await job_runner.submit("export_tags", params, created_by=_job_owner(user))
+
+
+@router.post("/shops/{shop_id}/visits/export/jobs", status_code=202)
+async def export_visits_job(shop_id: str, format: str = "csv", user=Depends(get_current_user)):
+    _require_shop_access(user, shop_id)
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    return await job_runner.submit("export_visits", {"shop_id": shop_id, "format": format}, created_by=_job_owner(user))
+
+
+@router.post("/admin/migrate_tag_uris/jobs", status_code=202)
+async def migrate_tag_uris_job(restart: bool = False, chunk_size: int = TAG_MIGRATION_CHUNK_SIZE, user=Depends(get_current_user)):
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="Invalid chunk_size")
+    params = {"restart": restart, "chunk_size": chunk_size}
+    return await job_runner.submit("migrate_tag_uris", params, created_by=_job_owner(user))
+
+
+@router.post("/admin/merchants/jobs", status_code=202)
+async def create_merchants_job(payload: MerchantBulkRequest, user=Depends(get_current_user)):
+    """
+    Admin-only: create `count` merchant accounts in the background; credentials are
+    delivered as a CSV artifact.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if payload.count <= 0 or payload.count > 10000:
+        raise HTTPException(status_code=400, detail="Invalid count (1..10000)")
+    return await job_runner.submit("create_merchants", {"count": payload.count}, created_by=_job_owner(user), total=payload.count)
+
+
+@router.post("/admin/ai/batch/jobs", status_code=202)
+async def ai_batch_job(payload: AIBatchRequest, user=Depends(get_current_user)):
+    """
+    Admin-only: generate copy for many (shop_id, template_id, context) items in the
+    background with bounded parallelism. Results are stored as draft content items
+    (created_by "ai-batch:<job id>"); publish them with POST /api/content/{id}/publish.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not payload.items or len(payload.items) > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Invalid item count (1..{AI_BATCH_MAX_ITEMS})")
+    if payload.parallelism is not None and not 1 <= payload.parallelism <= 64:
+        raise HTTPException(status_code=400, detail="Invalid parallelism (1..64)")
+    params = {
+        "items": [item.dict() for item in payload.items],
+        "model": payload.model,
+        "temperature": payload.temperature,
+        "parallelism": payload.parallelism,
+        "cache": payload.cache,
+    }
+    return await job_runner.submit("ai_copy_batch", params, created_by=_job_owner(user), total=len(payload.items))
+
+
+@router.post("/content/{content_id}/publish")
+async def publish_content(content_id: str, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    item = await db.get(models.ContentItem, content_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    _require_shop_access(user, item.shop_id)
+    item = await crud.publish_content(db, content_id)
+    return {"id": item.id, "shop_id": item.shop_id, "status": item.status}
+
+
+async def _visible_job(job_id: str, user):
+    job = await job_runner.get(job_id)
+    if job is None or (not getattr(user, "is_admin", 0) and job.created_by != _job_owner(user)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50, user=Depends(get_current_user)):
+    owner = None if getattr(user, "is_admin", 0) else _job_owner(user)
+    return await job_runner.list(created_by=owner, limit=min(max(limit, 1), 500))
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user=Depends(get_current_user)):
+    return serialize_job(await _visible_job(job_id, user))
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, user=Depends(get_current_user)):
+    await _visible_job(job_id, user)
+    return await job_runner.cancel(job_id)
+
+
+@router.get("/jobs/{job_id}/artifact")
+async def get_job_artifact(job_id: str, user=Depends(get_current_user)):
+    job = await _visible_job(job_id, user)
+    if not job.artifact:
+        raise HTTPException(status_code=404, detail="Job has no artifact")
+    path = os.path.join(JOB_ARTIFACT_DIR, os.path.basename(job.artifact))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Artifact no longer available")
+    fmt = job.artifact.rsplit(".", 1)[-1]
+    return FileResponse(path, media_type=exports.MEDIA_TYPES.get(fmt, "application/octet-stream"), filename=f"{job.kind}-{job.id}.{fmt}")
+
+
+@router.get("/admin/token_cache")
+async def token_cache_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: hit/miss/eviction counters of the /t/{token} resolution cache, for sizing
+    TOKEN_CACHE_SIZE / TOKEN_CACHE_TTL.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return token_cache.stats()
+
+
+@router.get("/admin/upstream")
+async def upstream_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: connection pool and response counters of the shared LLM upstream client,
+    plus hit rates of the response cache and request coalescing in front of it, and the
+    bulkhead queue and circuit breaker state.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "http_pool": http_client.pool_stats(),
+        "response_cache": llm_cache.stats(),
+        "single_flight": upstream_flight.stats(),
+        "guard": llm_guard.stats(),
+    }
+
+
+@router.get("/admin/rate_limits")
+async def rate_limit_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: backend and allowed/rejected counters of every rate limiter.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return rate_limits.stats()
+
+
+@router.get("/admin/audit_log")
+async def audit_log_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: pending/written/dropped counters of the background audit log writer.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return audit_log.stats()
+
+
+@router.get("/admin/password_pool")
+async def password_pool_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: concurrency and queue/hash timings of the password hashing pool.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return password_pool.stats()
+
+
+@router.get("/admin/db/pool")
+async def database_pool_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: connection pool gauges (checked out, overflow) and checkout wait times,
+    per engine, plus read-replica routing counters.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "primary": pool_stats(),
+        "replica": pool_stats(read_engine) if read_engine is not None else None,
+        "read_routing": read_router.stats(),
+    }
+
+
+@router.get("/admin/profiles")
+async def list_profiles(user=Depends(get_current_user)):
+    """
+    Admin-only: recently captured request profiles, newest first.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return profile_store.list()
+
+
+@router.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "txt", user=Depends(get_current_user)):
+    """
+    Admin-only: download one profile as a text summary (`txt`), collapsed stacks for
+    flame graph tools (`folded`), or a pstats dump (`prof`, cProfile mode).
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format not in meta["files"]:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(meta['files'])}")
+    return FileResponse(profile_store.path(profile_id, format), filename=f"profile-{profile_id}.{format}")
+
+
+@router.get("/admin/principal_cache")
+async def principal_cache_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: hit/miss counters of the authenticated principal cache and JWT memo.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return principal_cache.stats()
+
+
+@router.get("/admin/visit_buffer")
+async def visit_buffer_stats(user=Depends(get_current_user)):
+    """
+    Admin-only: pending/written/dropped counters of the write-behind visit buffer.
+    """
+    if not getattr(user, "is_admin", 0):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return visit_buffer.stats()
 
 
 @router.get("/shops")
-async def list_shops(db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+async def list_shops(db: AsyncSession = Depends(get_read_db), user=Depends(get_current_user)):
     # Admins see all shops; merchant users see only their shop
     if getattr(user, "is_admin", 0):
         summaries = await crud.list_shops_with_metrics(db)
         return summaries
-    # merchant view
+    # merchant view: only ever query the merchant's own shop
     if not getattr(user, "shop_id", None):
         raise HTTPException(status_code=403, detail="No shop assigned")
-    shops = await crud.list_shops_with_metrics(db)
-    for s in shops:
-        if s["id"] == user.shop_id:
-            return [s]
-    return []
+    return await crud.list_shops_with_metrics(db, shop_id=user.shop_id)
+
+
+@router.get("/shops/page")
+async def list_shops_page(
+    sort: str = "name",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Cursor-paginated shop summaries sorted by `name`, `visits` or `reviews`.
+    Pass the returned `next_cursor` back as `cursor` to fetch the following page.
+    """
+    if limit <= 0 or limit > 500:
+        raise HTTPException(status_code=400, detail="Invalid limit (1..500)")
+    shop_id = None
+    if not getattr(user, "is_admin", 0):
+        if not getattr(user, "shop_id", None):
+            raise HTTPException(status_code=403, detail="No shop assigned")
+        shop_id = user.shop_id
+    try:
+        items, next_cursor = await crud.list_shops_page(db, sort=sort, limit=limit, cursor=cursor, shop_id=shop_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get("/social/{platform}/auth")
@@ -201,20 +513,14 @@ async def social_publish(platform: str, payload: Dict[str, Any]):
     then call the platform API to publish.
     """
     # Log the publish attempt (mock)
-    try:
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        with open(os.path.join(log_dir, "social_publish.log"), "a", encoding="utf-8") as f:
-            f.write(f"TIME:{__import__('datetime').datetime.utcnow().isoformat()} PLATFORM:{platform} PAYLOAD:{str(payload)[:200]}\\n")
-    except Exception:
-        pass
+    audit_log.log("social_publish", platform=platform, payload_summary=str(payload)[:200])
     # return a mock publish id for front-end to reference
     publish_id = str(uuid.uuid4())
     return {"status": "mocked", "platform": platform, "result": "success", "publish_id": publish_id}
 
 
 @router.get("/merchant/{shop_id}")
-async def get_merchant_dashboard(shop_id: str, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+async def get_merchant_dashboard(shop_id: str, db: AsyncSession = Depends(get_read_db), user=Depends(get_current_user)):
     # Only allow access if user is admin or belongs to this shop
     if not getattr(user, "is_admin", 0) and getattr(user, "shop_id", None) != shop_id:
         raise HTTPException(status_code=403, detail="Forbidden")
@@ -230,24 +536,17 @@ async def get_merchant_dashboard(shop_id: str, db: AsyncSession = Depends(get_db
     except Exception:
         return {"shop": {"id": shop_id, "name": "Unknown Shop"}, "visits": 0, "reviews": 0, "contents": []}
 
+    # counters come from the per-day rollup (app.rollups): O(days) for the shop, no raw visit scan
+    today = __import__('datetime').datetime.utcnow().date()
     try:
-        today = __import__('datetime').date.today()
-        # visits: count visits where visit.tag_id belongs to tags of this shop
-        visits_result = await db.execute(
-            "SELECT COUNT(*) FROM visits WHERE tag_id IN (SELECT id FROM nfc_tags WHERE shop_id = :shop_id)",
-            {"shop_id": shop_id}
-        )
-        visits = visits_result.scalar() or 0
+        totals = await rollups.shop_totals(db, shop_id)
+        visits = totals["visits"]
     except Exception:
         visits = 0
 
     try:
         # reviews: count content_items for this shop (today)
-        reviews_result = await db.execute(
-            "SELECT COUNT(*) FROM content_items WHERE shop_id = :shop_id AND DATE(created_at) = :today",
-            {"shop_id": shop_id, "today": today}
-        )
-        reviews = reviews_result.scalar() or 0
+        reviews = (await rollups.shop_day(db, shop_id, today))["contents"]
     except Exception:
         reviews = 0
 
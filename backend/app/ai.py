@@ -1,6 +1,8 @@
 import os
+import time
 from typing import List, Dict, Any, Optional
-import httpx
+from .http_client import get_client, default_timeout
+from .audit_log import audit_log
 
 SILRA_API_URL = os.getenv("SILRA_API_URL", "https://api.silra.cn/v1/chat/completions")
 SILRA_API_KEY = os.getenv("SILRA_API_KEY")
@@ -11,7 +13,7 @@ async def generate_text(
     messages: List[Dict[str, Any]],
     stream: bool = False,
     temperature: float = 0.0,
-    timeout_seconds: int = 600,
+    timeout_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Call the Silra chat completions endpoint and return parsed JSON.
@@ -32,19 +34,24 @@ async def generate_text(
         "temperature": temperature,
     }
 
-    async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-        resp = await client.post(SILRA_API_URL, headers=headers, json=payload)
-        resp.raise_for_status()
-        # If stream=True the response will be streamed; for scaffold we expect non-stream JSON.
-        result = resp.json()
-        # simple logging of AI calls for auditing
-        try:
-            log_dir = os.path.join(os.getcwd(), "logs")
-            os.makedirs(log_dir, exist_ok=True)
-            with open(os.path.join(log_dir, "ai_calls.log"), "a", encoding="utf-8") as f:
-                f.write(f"TIME:{__import__('datetime').datetime.utcnow().isoformat()} MODEL:{model} MESSAGES:{messages} RESPONSE_SUMMARY:{str(result)[:100]}\\n")
-        except Exception:
-            pass
-        return result
+    client = get_client()
+    # shared pooled client; an explicit timeout_seconds only overrides the read timeout
+    timeout = default_timeout(read=timeout_seconds)
+    start = time.perf_counter()
+    resp = await client.post(SILRA_API_URL, headers=headers, json=payload, timeout=timeout)
+    resp.raise_for_status()
+    # If stream=True the response will be streamed; for scaffold we expect non-stream JSON.
+    result = resp.json()
+    # audit record; written by the background audit log writer
+    audit_log.log(
+        "ai_calls",
+        model=model,
+        stream=False,
+        status="completed",
+        messages=len(messages),
+        duration_ms=round((time.perf_counter() - start) * 1000, 1),
+        response_summary=str(result)[:100],
+    )
+    return result
 
 
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select
+
+from . import crud, models
+from .upstream_guard import UpstreamUnavailable, is_upstream_failure
+
+logger = logging.getLogger(__name__)
+
+AI_BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", "2000"))
+AI_BATCH_PARALLELISM = int(os.getenv("AI_BATCH_PARALLELISM", "8"))
+AI_BATCH_RETRIES = int(os.getenv("AI_BATCH_RETRIES", "3"))
+# full-jitter exponential backoff: sleep uniform(0, min(MAX, BASE * 2**attempt)) seconds
+AI_BATCH_BACKOFF_BASE = float(os.getenv("AI_BATCH_BACKOFF_BASE", "1.0"))
+AI_BATCH_BACKOFF_MAX = float(os.getenv("AI_BATCH_BACKOFF_MAX", "30"))
+# drafts are inserted in bulk once this many results are ready
+AI_BATCH_WRITE_SIZE = int(os.getenv("AI_BATCH_WRITE_SIZE", "50"))
+
+Generate = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, UpstreamUnavailable) or is_upstream_failure(exc) or str(exc) == "rate_limit_exceeded"
+
+
+def backoff_delay(attempt: int, base: float = AI_BATCH_BACKOFF_BASE, cap: float = AI_BATCH_BACKOFF_MAX) -> float:
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def completion_text(result: Dict[str, Any]) -> str:
+    # OpenAI-compatible chat completion, or the mock {"text": ...} shape
+    try:
+        return result["choices"][0]["message"]["content"] or ""
+    except (KeyError, IndexError, TypeError):
+        return str(result.get("text") or "") if isinstance(result, dict) else ""
+
+
+async def _with_retries(generate: Generate, item: Dict[str, Any], retries: int) -> Dict[str, Any]:
+    attempt = 0
+    while True:
+        try:
+            return await generate(item)
+        except Exception as exc:
+            if attempt >= retries or not is_retryable(exc):
+                raise
+            delay = backoff_delay(attempt)
+            if isinstance(exc, UpstreamUnavailable):
+                delay = max(delay, exc.retry_after)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+async def _done_indexes(db, marker: str) -> set:
+    res = await db.execute(select(models.ContentItem.metadata_json).where(models.ContentItem.created_by == marker))
+    return {m.get("item_index") for m in res.scalars().all() if isinstance(m, dict)}
+
+
+async def generate_drafts(
+    db,
+    items: List[Dict[str, Any]],
+    generate: Generate,
+    marker: str,
+    parallelism: int = AI_BATCH_PARALLELISM,
+    retries: int = AI_BATCH_RETRIES,
+    write_size: int = AI_BATCH_WRITE_SIZE,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Generate copy for every item with at most `parallelism` upstream calls in flight and
+    store the results as draft content items, inserted `write_size` at a time.
+    Transient upstream failures are retried with jittered exponential backoff; items that
+    still fail are reported, not fatal. Rows carry `marker` as created_by and their item
+    index in metadata, so a re-run skips items already stored.
+    """
+    done = await _done_indexes(db, marker)
+    pending = [(i, item) for i, item in enumerate(items) if i not in done]
+    queue: asyncio.Queue = asyncio.Queue()
+    for entry in pending:
+        queue.put_nowait(entry)
+
+    ready: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    counts = {"created": 0, "failed": 0, "finished": len(done)}
+    write_lock = asyncio.Lock()
+
+    async def flush() -> None:
+        async with write_lock:
+            if not ready:
+                return
+            rows = ready[:]
+            ready.clear()
+            counts["created"] += await crud.create_content_drafts(db, rows)
+
+    async def worker() -> None:
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await _with_retries(generate, item, retries)
+                text = completion_text(result)
+                ready.append({
+                    "id": str(uuid.uuid4()),
+                    "shop_id": item["shop_id"],
+                    "title": text.split("\n")[0][:80],
+                    "body": text,
+                    "created_by": marker,
+                    "metadata": {
+                        "item_index": index,
+                        "template_id": item.get("template_id"),
+                        "context": item.get("context"),
+                        "model": result.get("model") if isinstance(result, dict) else None,
+                    },
+                })
+            except Exception as exc:
+                counts["failed"] += 1
+                if len(errors) < 50:
+                    errors.append({"index": index, "shop_id": item.get("shop_id"), "error": str(exc)[:300]})
+            counts["finished"] += 1
+            if len(ready) >= write_size:
+                await flush()
+            if on_progress is not None:
+                await on_progress(counts["finished"], len(items))
+
+    await asyncio.gather(*[worker() for _ in range(max(1, min(parallelism, len(pending))))])
+    await flush()
+    return {
+        "total": len(items),
+        "created": counts["created"],
+        "skipped": len(done),
+        "failed": counts["failed"],
+        "errors": errors,
+    }
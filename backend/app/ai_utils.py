@@ -1,15 +1,40 @@
 import os
-from typing import List, Dict, Any, Optional
-import httpx
+from typing import AsyncIterator, List, Dict, Any, Optional
+from .http_client import get_client, default_timeout
+from .rate_limit import RateLimiter
+from .audit_log import audit_log
+from . import metrics
 import time
 
 SILRA_API_URL = os.getenv("SILRA_API_URL", "https://api.silra.cn/v1/chat/completions")
 SILRA_API_KEY = os.getenv("SILRA_API_KEY")
 
-# In-memory per-IP rate limiter (suitable for dev/demo)
-_rate_limit_store: Dict[str, List[float]] = {}
 RATE_LIMIT_MAX = int(os.getenv("RATE_LIMIT_MAX", "60"))
 RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+# per-IP limiter; state lives in the RATE_LIMIT_BACKEND shared by all workers
+ai_limiter = RateLimiter(RATE_LIMIT_MAX, RATE_LIMIT_WINDOW, name="ai")
+
+
+async def _check_rate_limit(client_ip: Optional[str], count: bool = True) -> None:
+    if not client_ip:
+        return
+    result = await (ai_limiter.hit(client_ip) if count else ai_limiter.check(client_ip))
+    if not result.allowed:
+        raise RuntimeError("rate_limit_exceeded")
+
+
+async def _record_call(client_ip: Optional[str]) -> None:
+    if client_ip:
+        await ai_limiter.record(client_ip)
+
+
+def _headers() -> Dict[str, str]:
+    if not SILRA_API_KEY:
+        raise RuntimeError("SILRA_API_KEY not configured in environment")
+    return {
+        "Authorization": f"Bearer {SILRA_API_KEY}",
+        "Content-Type": "application/json",
+    }
 
 
 async def generate_text(
@@ -17,29 +42,19 @@ async def generate_text(
     messages: List[Dict[str, Any]],
     stream: bool = False,
     temperature: float = 0.0,
-    timeout_seconds: int = 600,
+    timeout_seconds: Optional[float] = None,
     client_ip: Optional[str] = None,
+    enforce_limit: bool = True,
 ) -> Dict[str, Any]:
     """
     Call the Silra chat completions endpoint and return parsed JSON.
-    Adds simple per-IP rate limiting and logs timing and short response summaries.
+    Adds simple per-IP rate limiting (unless the caller already limited the request, as the
+    /ai/generate route does) and logs timing and short response summaries.
     """
-    now = time.time()
-    if client_ip:
-        arr = _rate_limit_store.get(client_ip, [])
-        arr = [t for t in arr if now - t < RATE_LIMIT_WINDOW]
-        if len(arr) >= RATE_LIMIT_MAX:
-            raise RuntimeError("rate_limit_exceeded")
-        arr.append(now)
-        _rate_limit_store[client_ip] = arr
+    if enforce_limit:
+        await _check_rate_limit(client_ip)
 
-    if not SILRA_API_KEY:
-        raise RuntimeError("SILRA_API_KEY not configured in environment")
-
-    headers = {
-        "Authorization": f"Bearer {SILRA_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    headers = _headers()
 
     payload = {
         "model": model,
@@ -49,23 +64,91 @@ async def generate_text(
     }
 
     start = time.time()
-    async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-        resp = await client.post(SILRA_API_URL, headers=headers, json=payload)
-        resp.raise_for_status()
-        result = resp.json()
+    client = get_client()
+    timeout = default_timeout(read=timeout_seconds)
+    resp = await client.post(SILRA_API_URL, headers=headers, json=payload, timeout=timeout)
+    resp.raise_for_status()
+    result = resp.json()
     duration = time.time() - start
 
-    # write audit log
-    try:
-        log_dir = os.path.join(os.getcwd(), "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        ts = __import__("datetime").datetime.utcnow().isoformat()
-        ip = client_ip or "-"
-        with open(os.path.join(log_dir, "ai_calls.log"), "a", encoding="utf-8") as f:
-            f.write(f"TIME:{ts} IP:{ip} MODEL:{model} DUR:{duration:.3f}s MSGS:{len(messages)} RES:{str(result)[:200]}\\n")
-    except Exception:
-        pass
+    audit_log.log(
+        "ai_calls",
+        ip=client_ip,
+        model=model,
+        stream=False,
+        status="completed",
+        duration_ms=round(duration * 1000, 1),
+        messages=len(messages),
+        response_summary=str(result)[:200],
+    )
 
     return result
 
 
+async def stream_text(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.0,
+    timeout_seconds: Optional[float] = None,
+    client_ip: Optional[str] = None,
+    enforce_limit: bool = True,
+) -> AsyncIterator[bytes]:
+    """
+    Stream a chat completion: yields the upstream SSE body (`data: {...}` events) chunk by
+    chunk as it arrives. Admission is checked before the request is sent; the call is
+    counted against the rate limit and audit-logged once the stream ends, including when
+    the client disconnects part way through. With `enforce_limit=False` (the /ai/generate
+    route, which counts on admission) only the audit record is written.
+    """
+    start = time.time()
+    if enforce_limit:
+        await _check_rate_limit(client_ip, count=False)
+    headers = _headers()
+    headers["Accept"] = "text/event-stream"
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": True,
+        "temperature": temperature,
+    }
+
+    client = get_client()
+    timeout = default_timeout(read=timeout_seconds)
+    status = "aborted"
+    chunks = 0
+    size = 0
+    first_chunk = None
+    error = None
+    try:
+        async with client.stream("POST", SILRA_API_URL, headers=headers, json=payload, timeout=timeout) as resp:
+            resp.raise_for_status()
+            # decoded: the shared client negotiates gzip, and the relay sends no Content-Encoding
+            async for chunk in resp.aiter_bytes():
+                if not chunk:
+                    continue
+                if first_chunk is None:
+                    first_chunk = time.time() - start
+                chunks += 1
+                size += len(chunk)
+                yield chunk
+        status = "completed"
+    except Exception as exc:
+        status = "error"
+        error = exc
+        raise
+    finally:
+        metrics.observe_upstream(model, time.time() - start, error)
+        if enforce_limit:
+            await _record_call(client_ip)
+        audit_log.log(
+            "ai_calls",
+            ip=client_ip,
+            model=model,
+            stream=True,
+            status=status,
+            ttft_ms=round(first_chunk * 1000, 1) if first_chunk is not None else None,
+            duration_ms=round((time.time() - start) * 1000, 1),
+            messages=len(messages),
+            chunks=chunks,
+            bytes=size,
+        )
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List
+
+from .batch_writer import BatchWriter
+
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", os.path.join(os.getcwd(), "logs"))
+AUDIT_LOG_QUEUE_MAX = int(os.getenv("AUDIT_LOG_QUEUE_MAX", "10000"))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "200"))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1.0"))
+# rotate a log file once it exceeds this many bytes ...
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+# ... or when it was started in an earlier period of this many seconds (0 disables)
+AUDIT_LOG_ROTATE_SECONDS = int(os.getenv("AUDIT_LOG_ROTATE_SECONDS", "86400"))
+AUDIT_LOG_BACKUPS = int(os.getenv("AUDIT_LOG_BACKUPS", "7"))
+
+
+class AuditLog(BatchWriter):
+    """
+    Structured audit records written off the event loop.
+    `log()` only enqueues (dropping and counting when the queue is full); a background task
+    groups records into batches and appends them, one JSON object per line, to
+    `<directory>/<stream>.jsonl` in a worker thread. Files rotate to `.1`, `.2`, ... by size
+    or by time period. Like the visit buffer, it is started and drained by the app lifespan.
+    """
+
+    label = "audit log"
+    item_name = "records"
+
+    def __init__(
+        self,
+        directory: str = AUDIT_LOG_DIR,
+        max_size: int = AUDIT_LOG_QUEUE_MAX,
+        batch_size: int = AUDIT_LOG_BATCH_SIZE,
+        flush_interval: float = AUDIT_LOG_FLUSH_INTERVAL,
+        max_bytes: int = AUDIT_LOG_MAX_BYTES,
+        rotate_seconds: int = AUDIT_LOG_ROTATE_SECONDS,
+        backups: int = AUDIT_LOG_BACKUPS,
+    ):
+        super().__init__(max_size, batch_size, flush_interval)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        # rotation period each open stream file started in
+        self._periods: Dict[str, int] = {}
+        self.rotations = 0
+
+    def log(self, stream: str, /, **fields: Any) -> bool:
+        record = {"ts": datetime.utcnow().isoformat() + "Z"}
+        record.update(fields)
+        return self._put((stream, record))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        await super().stop(timeout)
+
+    async def _sink(self, batch: List[tuple]) -> None:
+        await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[tuple]) -> None:
+        by_stream: Dict[str, List[str]] = defaultdict(list)
+        for stream, record in batch:
+            by_stream[stream].append(json.dumps(record, ensure_ascii=False, default=str))
+        os.makedirs(self.directory, exist_ok=True)
+        for stream, lines in by_stream.items():
+            path = os.path.join(self.directory, f"{stream}.jsonl")
+            self._maybe_rotate(stream, path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def _period(self, ts: float) -> int:
+        return int(ts // self.rotate_seconds) if self.rotate_seconds > 0 else 0
+
+    def _maybe_rotate(self, stream: str, path: str) -> None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._periods[stream] = self._period(time.time())
+            return
+        started = self._periods.setdefault(stream, self._period(st.st_mtime))
+        if st.st_size < self.max_bytes and started == self._period(time.time()):
+            return
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+        self._periods[stream] = self._period(time.time())
+        self.rotations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "directory": self.directory, "rotations": self.rotations}
+
+
+# process-wide audit log for AI calls and social publishing
+audit_log = AuditLog()
@@ -1,42 +1,81 @@
+import hashlib
 import os
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from .db import async_session
-from . import crud
+from . import crud, models
+from .password_pool import password_pool
+from .principal_cache import Principal, principal_cache
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# stored hashes with fewer rounds than this are re-hashed on the next successful login
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", str(pbkdf2_sha256.default_rounds)))
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
-def verify_password(plain_password, hashed_password) -> bool:
+def _legacy_sha256(plain_password, hashed_password) -> bool:
+    # legacy simple sha256 hex digests used in dev seed
+    return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
+
+
+def verify_and_update(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; the second value is a replacement hash when the stored one uses
+    outdated parameters (or is a legacy sha256 digest), otherwise None.
+    The sha256 fallback only runs for hashes passlib does not recognise.
+    """
+    if not hashed_password:
+        return False, None
+    if pwd_context.identify(hashed_password, required=False) is None:
+        if _legacy_sha256(plain_password, hashed_password):
+            return True, pwd_context.hash(plain_password)
+        return False, None
     try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception:
-        # fallback: support legacy simple sha256 hex digests used in dev seed
-        try:
-            import hashlib
-            return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
-        except Exception:
-            return False
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except ValueError:
+        # malformed hash of a known scheme
+        return False, None
+
+
+def verify_password(plain_password, hashed_password) -> bool:
+    return verify_and_update(plain_password, hashed_password)[0]
 
 
 def get_password_hash(password) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_and_update_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    # pbkdf2 costs tens of milliseconds; never run it on the event loop
+    return await password_pool.run(verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password) -> str:
+    return await password_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    # jti: token id, part of the principal cache key
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -46,7 +85,24 @@ async def get_db() -> AsyncSession:
         yield s
 
 
+async def _load_principal(db: AsyncSession, email: str, token_id: str) -> Optional[Principal]:
+    cached = principal_cache.get(email, token_id)
+    if cached is not None:
+        return cached
+    user = await crud.get_user_by_email(db, email)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(email, token_id, principal)
+    return principal
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """
+    Resolve the bearer token to a Principal (id, email, is_admin, shop_id, is_active).
+    Verified tokens and principals are cached, so repeated calls with the same token need
+    neither a JWT decode nor a users query.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,22 +110,45 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     )
     # support a mock token for local development/demo
     if token == "mock-token":
-        user = await crud.get_user_by_email(db, "admin@example.com")
-        if user:
-            return user
+        principal = await _load_principal(db, "admin@example.com", token)
+        if principal:
+            return principal
         # fallback: create admin user
         user = await crud.create_user(db, "admin@example.com", "password123")
-        return user
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        return Principal.from_user(user)
+    claims = principal_cache.get_claims(token)
+    if claims is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        claims = (email, payload.get("jti") or "")
+        principal_cache.set_claims(token, claims[0], claims[1], payload.get("exp"))
+    principal = await _load_principal(db, *claims)
+    if principal is None or principal.is_active == 0:
         raise credentials_exception
-    user = await crud.get_user_by_email(db, email)
-    if user is None:
-        raise credentials_exception
-    return user
+    return principal
+
+
+@event.listens_for(models.User, "after_update")
+def _invalidate_changed_principal(mapper, connection, target) -> None:
+    # ORM updates only; bulk UPDATE statements rely on PRINCIPAL_CACHE_TTL
+    state = inspect(target)
+    changed = False
+    for attr in ("is_active", "is_admin", "shop_id", "email"):
+        history = state.attrs[attr].history
+        if history.has_changes():
+            changed = True
+            for old in history.deleted or ():
+                if attr == "email":
+                    principal_cache.invalidate_user(old)
+    if changed:
+        principal_cache.invalidate_user(target.email)
 
 
+@event.listens_for(models.User, "after_delete")
+def _invalidate_deleted_principal(mapper, connection, target) -> None:
+    principal_cache.invalidate_user(target.email)
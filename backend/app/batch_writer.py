@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Bounded write-behind queue drained by one background task.
+    `_put` never blocks the caller: when the queue is full the item is dropped and counted.
+    The task hands items to `_sink` in batches once `batch_size` are pending or
+    `flush_interval` seconds have passed, and drains everything left on `stop()`.
+    Subclasses implement `_sink(batch)`; it should raise on failure so the batch is counted
+    as failed. Start and stop it from the app lifespan.
+    """
+
+    # used in log messages: "<label> did not drain ...; N <item_name> lost"
+    label = "batch writer"
+    item_name = "items"
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    def _put(self, item: Any) -> bool:
+        try:
+            self._ensure_queue().put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        # a queue is bound to the loop that first waits on it; build a fresh one on
+        # this loop and carry over anything put before start
+        previous, self._queue = self._queue, asyncio.Queue(maxsize=self.max_size)
+        while previous is not None and not previous.empty():
+            self._queue.put_nowait(previous.get_nowait())
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if not self.running:
+            # nothing consuming the queue; write what is pending inline
+            await self.flush_pending()
+            self._queue = None
+            return
+        queue = self._ensure_queue()
+        try:
+            queue.put_nowait(_STOP)
+        except asyncio.QueueFull:
+            # the worker drains until empty anyway; make room for the sentinel
+            await queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.warning("%s did not drain within %.1fs; %d %s lost", self.label, timeout, queue.qsize(), self.item_name)
+        self._task = None
+        self._queue = None
+
+    async def flush_pending(self) -> None:
+        queue = self._ensure_queue()
+        batch: List[Any] = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def _run(self) -> None:
+        queue = self._ensure_queue()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+        await self.flush_pending()
+
+    async def _flush(self, batch: List[Any]) -> None:
+        start = time.perf_counter()
+        try:
+            await self._sink(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("%s failed to write %d %s", self.label, len(batch), self.item_name)
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - start
+
+    async def _sink(self, batch: List[Any]) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
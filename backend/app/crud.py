@@ -1,21 +1,78 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, tuple_
 from . import models
+from . import rollups
+from .token_cache import token_cache
+import asyncio
 import uuid
+import json
+import base64
 from sqlalchemy.exc import IntegrityError
 
 
 
 async def create_user(db: AsyncSession, email: str, password: str, shop_id: str | None = None, is_admin: int = 0):
     # import hashing function locally to avoid circular import at module load
-    from .auth import get_password_hash
-    user = models.User(id=str(uuid.uuid4()), email=email, hashed_password=get_password_hash(password), shop_id=shop_id, is_admin=is_admin)
+    from .auth import get_password_hash_async
+    hashed = await get_password_hash_async(password)
+    user = models.User(id=str(uuid.uuid4()), email=email, hashed_password=hashed, shop_id=shop_id, is_admin=is_admin)
     db.add(user)
     await db.commit()
     await db.refresh(user)
     return user
 
 
+def generate_merchant_credentials():
+    import random
+    import string
+    username = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+    password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+    return username, password
+
+
+async def create_merchant_account(db: AsyncSession):
+    # one shop plus a merchant user linked to it, with generated credentials
+    username, password = generate_merchant_credentials()
+    shop = models.Shop(id=str(uuid.uuid4()), name=f"Shop {username}")
+    db.add(shop)
+    await db.flush()
+    await rollups.add_shops(db, [shop.id])
+    email = f"{username}@merchant.local"
+    await create_user(db, email, password, shop_id=shop.id, is_admin=0)
+    return {"username": username, "email": email, "password": password, "shop_id": shop.id}
+
+
+async def create_merchant_accounts(db: AsyncSession, count: int, chunk_size: int = 500, commit: bool = True):
+    """
+    Provision `count` shops with one merchant user each in a single transaction.
+    Passwords are hashed concurrently on the password pool, then shops and users are
+    written with multi-row INSERTs of `chunk_size` rows and committed once (left to the
+    caller with `commit=False`).
+    """
+    from .auth import get_password_hash_async
+    creds = []
+    usernames = set()
+    while len(creds) < count:
+        username, password = generate_merchant_credentials()
+        if username in usernames:
+            continue
+        usernames.add(username)
+        creds.append({"username": username, "email": f"{username}@merchant.local", "password": password, "shop_id": str(uuid.uuid4())})
+    hashes = await asyncio.gather(*[get_password_hash_async(c["password"]) for c in creds])
+    shops = [{"id": c["shop_id"], "name": f"Shop {c['username']}"} for c in creds]
+    users = [
+        {"id": str(uuid.uuid4()), "email": c["email"], "hashed_password": h, "shop_id": c["shop_id"], "is_admin": 0, "is_active": 1}
+        for c, h in zip(creds, hashes)
+    ]
+    for i in range(0, len(creds), chunk_size):
+        await db.execute(insert(models.Shop.__table__).values(shops[i:i + chunk_size]))
+        await db.execute(insert(models.User.__table__).values(users[i:i + chunk_size]))
+    await rollups.add_shops(db, [s["id"] for s in shops])
+    if commit:
+        await db.commit()
+    return creds
+
+
 async def get_user_by_email(db: AsyncSession, email: str):
     q = select(models.User).where(models.User.email == email)
     res = await db.execute(q)
@@ -31,30 +88,77 @@ async def get_tag_by_token(db: AsyncSession, token: str):
 async def create_visit(db: AsyncSession, tag_id):
     visit = models.Visit(id=str(uuid.uuid4()), tag_id=tag_id)
     db.add(visit)
+    await rollups.record_visits(db, [{"tag_id": tag_id}])
     await db.commit()
     return visit
 
 
-async def get_content_for_tag(db: AsyncSession, tag_id):
-    # Simple mapping: find a content item for the same shop
-    q = (
-        select(models.ContentItem)
+async def create_visits_bulk(db: AsyncSession, rows: list, chunk_size: int = 200):
+    # multi-row INSERT ... VALUES (...), (...) per chunk, one commit for the whole batch
+    for i in range(0, len(rows), chunk_size):
+        await db.execute(insert(models.Visit.__table__).values(rows[i:i + chunk_size]))
+    # counters commit in the same transaction as the raw rows
+    await rollups.record_visits(db, rows)
+    await db.commit()
+    return len(rows)
+
+
+def _content_for_tag_query(tag_id, *columns):
+    # Simple mapping: the shop's newest published content item. The order is total, so the
+    # id-only and full-row variants always pick the same row; ix_content_items_shop_created
+    # serves it (scanned backwards) without a sort.
+    return (
+        select(*columns)
         .where(models.ContentItem.shop_id == select(models.NFCTag.shop_id).where(models.NFCTag.id == tag_id).scalar_subquery())
+        .where(models.ContentItem.status.is_distinct_from(models.CONTENT_DRAFT))
+        .order_by(models.ContentItem.created_at.desc(), models.ContentItem.id.desc())
         .limit(1)
     )
-    res = await db.execute(q)
+
+
+async def get_content_for_tag(db: AsyncSession, tag_id):
+    res = await db.execute(_content_for_tag_query(tag_id, models.ContentItem))
     return res.scalars().first()
 
 
+async def get_content_id_for_tag(db: AsyncSession, tag_id):
+    # same row as get_content_for_tag without loading title/body; enough to compute the landing ETag
+    res = await db.execute(_content_for_tag_query(tag_id, models.ContentItem.id))
+    return res.scalar()
+
+
 async def create_content(db: AsyncSession, shop_id: str, title: str, body: str, created_by: str | None = None):
     from .models import ContentItem
     item = ContentItem(id=str(uuid.uuid4()), shop_id=shop_id, title=title, body=body, created_by=created_by)
     db.add(item)
+    await rollups.record_content(db, shop_id)
     await db.commit()
+    # landing responses embed the shop's content; drop every cached token of this shop
+    token_cache.invalidate_shop(shop_id)
     await db.refresh(item)
     return item
 
 
+async def create_content_drafts(db: AsyncSession, rows: list) -> int:
+    # executemany insert of generated drafts; drafts stay out of rollups until published
+    if not rows:
+        return 0
+    await db.execute(insert(models.ContentItem.__table__), [{**r, "status": models.CONTENT_DRAFT} for r in rows])
+    await db.commit()
+    return len(rows)
+
+
+async def publish_content(db: AsyncSession, content_id: str):
+    item = await db.get(models.ContentItem, content_id)
+    if item is None or item.status != models.CONTENT_DRAFT:
+        return item
+    item.status = models.CONTENT_PUBLISHED
+    await rollups.record_content(db, item.shop_id)
+    await db.commit()
+    token_cache.invalidate_shop(item.shop_id)
+    return item
+
+
 async def create_nfc_tag(db: AsyncSession, shop_id: str, token: str, ndef_payload: dict | None = None, status: str = "unused"):
     tag = models.NFCTag(
         id=str(uuid.uuid4()),
@@ -70,27 +174,93 @@ async def create_nfc_tag(db: AsyncSession, shop_id: str, token: str, ndef_payloa
         await db.rollback()
         # token collision; raise for caller to handle
         raise
+    token_cache.invalidate_token(token)
     await db.refresh(tag)
     return tag
 
 
-async def list_shops_with_metrics(db: AsyncSession):
+def _shop_metrics_query():
+    totals = models.ShopTotals
+    visits = func.coalesce(totals.visits, 0).label("visits")
+    reviews = func.coalesce(totals.contents, 0).label("reviews")
+    q = (
+        select(models.Shop.id, models.Shop.name, visits, reviews)
+        .outerjoin(totals, totals.shop_id == models.Shop.id)
+    )
+    return q
+
+
+async def list_shops_with_metrics(db: AsyncSession, shop_id: str | None = None):
     # Return simple shop summaries: id, name, visits_count, reviews_count
-    # visits_count: count of visits via tags belonging to shop
-    # reviews_count: count of content_items for shop
-    q = select(models.Shop)
+    # visits/reviews are all-time totals from the shop_totals rollup (app.rollups), fetched in
+    # one query; pass shop_id to fetch a single shop
+    q = _shop_metrics_query()
+    if shop_id is not None:
+        q = q.where(models.Shop.id == shop_id)
     res = await db.execute(q)
-    shops = res.scalars().all()
-    summaries = []
-    for s in shops:
-        # visits
-        vq = select(models.Visit).where(models.Visit.tag_id.in_(select(models.NFCTag.id).where(models.NFCTag.shop_id == s.id).scalar_subquery()))
-        vres = await db.execute(select(func.count()).select_from(models.Visit).where(models.Visit.tag_id.in_(select(models.NFCTag.id).where(models.NFCTag.shop_id == s.id).scalar_subquery())))
-        visits = int(vres.scalar() or 0)
-        # reviews/content count
-        cres = await db.execute(select(func.count()).select_from(models.ContentItem).where(models.ContentItem.shop_id == s.id))
-        reviews = int(cres.scalar() or 0)
-        summaries.append({"id": s.id, "name": s.name, "visits": visits, "reviews": reviews})
-    return summaries
+    return [
+        {"id": r[0], "name": r[1], "visits": int(r[2] or 0), "reviews": int(r[3] or 0)}
+        for r in res.fetchall()
+    ]
+
+
+SHOP_SORTS = ("name", "visits", "reviews")
+
+
+def encode_shop_cursor(sort: str, row: dict) -> str:
+    raw = json.dumps({"s": sort, "v": row[sort], "id": row["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_shop_cursor(sort: str, cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["s"] != sort:
+            raise ValueError("cursor was issued for a different sort")
+        return data["v"], data["id"]
+    except Exception as exc:
+        raise ValueError(f"invalid cursor: {exc}")
 
 
+async def list_shops_page(db: AsyncSession, sort: str = "name", limit: int = 50, cursor: str | None = None, shop_id: str | None = None):
+    """
+    Keyset-paginated shop summaries. `name` sorts ascending with ties broken by ascending
+    shop id, a range scan of ix_shops_name. `visits`/`reviews` sort descending with ties
+    broken by descending shop id; they are read from shop_totals (one row per shop) joined
+    to shops, a range scan of ix_shop_totals_visits/ix_shop_totals_contents. Either way a
+    page costs the same at any depth.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    if sort not in SHOP_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SHOP_SORTS)}")
+    totals = models.ShopTotals
+    if sort == "name":
+        q = _shop_metrics_query()
+        key, id_col = models.Shop.name, models.Shop.id
+    else:
+        q = (
+            select(models.Shop.id, models.Shop.name, totals.visits, totals.contents)
+            .select_from(totals)
+            .join(models.Shop, models.Shop.id == totals.shop_id)
+        )
+        key, id_col = (totals.visits if sort == "visits" else totals.contents), totals.shop_id
+    if shop_id is not None:
+        q = q.where(id_col == shop_id)
+    if cursor:
+        last_value, last_id = decode_shop_cursor(sort, cursor)
+        if sort == "name":
+            q = q.where(tuple_(key, id_col) > tuple_(last_value, last_id))
+        else:
+            q = q.where(tuple_(key, id_col) < tuple_(last_value, last_id))
+    if sort == "name":
+        q = q.order_by(key.asc(), id_col.asc())
+    else:
+        q = q.order_by(key.desc(), id_col.desc())
+    res = await db.execute(q.limit(limit + 1))
+    rows = [
+        {"id": r[0], "name": r[1], "visits": int(r[2] or 0), "reviews": int(r[3] or 0)}
+        for r in res.fetchall()
+    ]
+    next_cursor = encode_shop_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -1,15 +1,240 @@
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeout
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "sqlite+aiosqlite:///./dev.db"
 )
+# optional read replica for read-only endpoints; unset means everything uses DATABASE_URL
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+# after a failed replica checkout, reads go to the primary for this many seconds
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+# (pool_size, max_overflow) presets; the DB_POOL_* variables below override single values
+POOL_PROFILES = {
+    "small": (5, 5),
+    "default": (10, 20),
+    "burst": (30, 70),
+}
+DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "default")
+_profile_size, _profile_overflow = POOL_PROFILES.get(DB_POOL_PROFILE, POOL_PROFILES["default"])
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(_profile_size)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_profile_overflow)))
+# seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# reconnect connections older than this many seconds (-1 disables)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# asyncpg prepared statements cached per connection (0 disables, e.g. behind pgbouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# applied to every new aiosqlite connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+class PoolMetrics:
+    """
+    Counters for one engine's connection pool, fed by pool events and by timing how long
+    each checkout waited for a connection.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that reports how long callers wait for a connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def make_engine(
+    url: str,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+    **kwargs: Any,
+) -> AsyncEngine:
+    """
+    Engine with the configured pool profile. PostgreSQL (asyncpg) also gets the statement
+    cache size; file-backed SQLite gets a real pool (instead of a connection per session)
+    and the journal/synchronous/busy_timeout PRAGMAs. In-memory SQLite keeps its defaults.
+    """
+    parsed = make_url(url)
+    sqlite = parsed.get_backend_name() == "sqlite"
+    in_memory = sqlite and parsed.database in (None, "", ":memory:")
+    options: Dict[str, Any] = {"echo": False}
+    metrics = PoolMetrics()
+    if not in_memory:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    options.update(kwargs)
+    engine = create_async_engine(url, **options)
+    pool = engine.sync_engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.metrics = metrics
 
-engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=False)
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+        if sqlite and not in_memory:
+            _sqlite_pragmas(dbapi_connection, connection_record)
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+    engine.sync_engine.pool_metrics = metrics
+    return engine
+
+
+def pool_stats(target: Optional[AsyncEngine] = None) -> Dict[str, Any]:
+    target = target or engine
+    pool = target.sync_engine.pool
+    metrics: PoolMetrics = target.sync_engine.pool_metrics
+    stats: Dict[str, Any] = {
+        "pool_class": type(pool).__name__,
+        "connects": metrics.connects,
+        "checkouts": metrics.checkouts,
+        "invalidations": metrics.invalidations,
+        "timeouts": metrics.timeouts,
+        "wait_ms_avg": round(metrics.wait_seconds_total / (metrics.checkouts or 1) * 1000, 3),
+        "wait_ms_max": round(metrics.wait_seconds_max * 1000, 3),
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+        )
+    return stats
+
+
+class ReadRouter:
+    """
+    Hands out sessions for read-only work: on the replica when one is configured and
+    reachable, otherwise on the primary. A replica whose connection checkout fails is
+    skipped for `retry_seconds`. Sessions opened on the replica have `info["replica"]`
+    set, so callers can re-check the primary when a row may not have replicated yet.
+    """
+
+    def __init__(self, primary: sessionmaker, replica: Optional[sessionmaker] = None, retry_seconds: float = DB_REPLICA_RETRY_SECONDS):
+        self.primary = primary
+        self.replica = replica
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+        self.fallbacks = 0
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        if self.replica is not None and time.monotonic() >= self._down_until:
+            session = self.replica()
+            try:
+                # checks a connection out (pre-pinged) so an unreachable replica fails here
+                await session.connection()
+            except (DBAPIError, OSError, PoolTimeout) as exc:
+                await session.close()
+                self._down_until = time.monotonic() + self.retry_seconds
+                self.fallbacks += 1
+                logger.warning("read replica unavailable, using primary for %.0fs: %s", self.retry_seconds, exc)
+            else:
+                self.replica_sessions += 1
+                session.info["replica"] = True
+                try:
+                    yield session
+                finally:
+                    await session.close()
+                return
+        self.primary_sessions += 1
+        async with self.primary() as session:
+            yield session
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "configured": self.replica is not None,
+            "replica_available": self.replica is not None and time.monotonic() >= self._down_until,
+            "replica_sessions": self.replica_sessions,
+            "primary_sessions": self.primary_sessions,
+            "fallbacks": self.fallbacks,
+        }
+
+
+engine: AsyncEngine = make_engine(DATABASE_URL)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-Base = declarative_base()
+read_engine: Optional[AsyncEngine] = make_engine(DATABASE_READ_URL) if DATABASE_READ_URL else None
+read_router = ReadRouter(
+    async_session,
+    sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False) if read_engine is not None else None,
+)
 
 
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    # FastAPI dependency for endpoints that only read; writes keep using the primary get_db
+    async with read_router.session() as session:
+        yield session
+
+Base = declarative_base()
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from . import models
+from .db import async_session
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+TAG_COLUMNS = ["id", "token", "uri", "status", "created_at", "encoded_at"]
+VISIT_COLUMNS = ["id", "tag_id", "token", "created_at", "user_agent", "referer"]
+MERCHANT_COLUMNS = ["username", "email", "password", "shop_id"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    # one token per line, the input format of writecard_tool/write_cards.py
+    "txt": "text/plain; charset=utf-8",
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, models.TagStatus):
+        return value.value
+    return value
+
+
+def _tag_row(tag_id, token, payload, status, created_at, encoded_at) -> Dict[str, Any]:
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = {}
+    uri = payload.get("uri") if isinstance(payload, dict) else None
+    return {
+        "id": tag_id,
+        "token": token,
+        "uri": uri,
+        "status": _plain(status),
+        "created_at": _plain(created_at),
+        "encoded_at": _plain(encoded_at),
+    }
+
+
+async def iter_tags(shop_id: str, status: Optional[str] = None, session_factory=None, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield a shop's tags in batches of plain dicts, read through a server-side cursor so only
+    one batch is held in memory. Opens its own session: the generator outlives the request handler.
+    """
+    T = models.NFCTag
+    q = select(T.id, T.token, T.ndef_payload, T.status, T.created_at, T.encoded_at).where(T.shop_id == shop_id)
+    if status:
+        q = q.where(T.status == models.TagStatus(status))
+    q = q.order_by(T.id).execution_options(yield_per=batch_size)
+    async with (session_factory or async_session)() as db:
+        result = await db.stream(q)
+        async for partition in result.partitions(batch_size):
+            yield [_tag_row(*r) for r in partition]
+
+
+async def iter_visits(shop_id: str, session_factory=None, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+    V, T = models.Visit, models.NFCTag
+    q = (
+        select(V.id, V.tag_id, T.token, V.created_at, V.user_agent, V.referer)
+        .join(T, T.id == V.tag_id)
+        .where(T.shop_id == shop_id)
+        .execution_options(yield_per=batch_size)
+    )
+    async with (session_factory or async_session)() as db:
+        result = await db.stream(q)
+        async for partition in result.partitions(batch_size):
+            yield [dict(zip(VISIT_COLUMNS, (_plain(v) for v in r))) for r in partition]
+
+
+async def encode(batches: AsyncIterator[List[Dict[str, Any]]], fmt: str, columns: Sequence[str]) -> AsyncIterator[str]:
+    """
+    Serialize row batches as CSV (with header), NDJSON, or bare tokens (`txt`), one chunk per batch.
+    """
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=list(columns), extrasaction="ignore")
+        writer.writeheader()
+        yield buf.getvalue()
+        async for batch in batches:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows(batch)
+            yield buf.getvalue()
+    elif fmt == "ndjson":
+        async for batch in batches:
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch)
+    elif fmt == "txt":
+        async for batch in batches:
+            yield "".join(f"{row['token']}\n" for row in batch)
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
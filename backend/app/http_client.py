@@ -0,0 +1,109 @@
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+LLM_WRITE_TIMEOUT = float(os.getenv("LLM_WRITE_TIMEOUT", "10"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "10"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "0").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+_http2_enabled = False
+_counters: Dict[str, int] = {"requests": 0, "responses_2xx": 0, "responses_4xx": 0, "responses_5xx": 0, "clients_created": 0}
+
+
+def default_timeout(read: Optional[float] = None) -> httpx.Timeout:
+    # separate connect/read/write/pool budgets; `read` overrides the configured read timeout
+    return httpx.Timeout(connect=LLM_CONNECT_TIMEOUT, read=read or LLM_READ_TIMEOUT, write=LLM_WRITE_TIMEOUT, pool=LLM_POOL_TIMEOUT)
+
+
+def _http2_available() -> bool:
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("LLM_HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _counters["requests"] += 1
+
+
+async def _on_response(response: httpx.Response) -> None:
+    bucket = f"responses_{response.status_code // 100}xx"
+    if bucket in _counters:
+        _counters[bucket] += 1
+
+
+def _build() -> httpx.AsyncClient:
+    global _http2_enabled
+    _counters["clients_created"] += 1
+    _http2_enabled = _http2_available()
+    return httpx.AsyncClient(
+        timeout=default_timeout(),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        http2=_http2_enabled,
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Shared app-lifetime client for the LLM upstream, so calls reuse pooled keep-alive
+    connections instead of paying DNS + TCP + TLS per request. Created on first use when
+    the lifespan has not run (scripts, tests).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build()
+    return _client
+
+
+async def startup() -> None:
+    get_client()
+
+
+async def shutdown() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = dict(_counters)
+    stats.update({
+        "max_connections": LLM_MAX_CONNECTIONS,
+        "max_keepalive": LLM_MAX_KEEPALIVE,
+        "http2": _http2_enabled,
+    })
+    # connection gauges come from httpcore's pool; private API, so read defensively
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    stats["connections"] = len(connections)
+    stats["idle_connections"] = sum(1 for c in connections if _safe(c, "is_idle"))
+    stats["active_connections"] = stats["connections"] - stats["idle_connections"]
+    stats["pending_requests"] = len(getattr(pool, "_requests", []) or [])
+    return stats
+
+
+def _safe(conn, method: str) -> bool:
+    try:
+        return bool(getattr(conn, method)())
+    except Exception:
+        return False
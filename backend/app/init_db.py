@@ -3,6 +3,7 @@ import uuid
 from sqlalchemy import select
 from .db import engine, async_session, Base
 from . import models
+from . import rollups
 
 
 async def init_db():
@@ -22,6 +23,9 @@ async def init_db():
 
         content = models.ContentItem(id=str(uuid.uuid4()), shop_id=shop.id, title="Welcome", body="This is demo content for your NFC tag.", metadata_json={"source":"seed"})
         await session.merge(content)
+        await session.flush()
+        # every shop has a shop_totals row; this one starts with the seeded content item
+        await rollups.record_content(session, shop.id)
         # create admin user
         # create admin user if not exists
         from .auth import get_password_hash
@@ -0,0 +1,202 @@
+import csv
+import os
+from typing import Any, Dict, List
+
+from sqlalchemy import select, func
+
+from . import ai_batch, crud, exports, models, tag_migration
+from .db import async_session
+from .jobs import JobContext, job_handler
+from .minting import existing_tokens, mint_tags
+from .token_cache import token_cache
+
+# merchants created (hashed, inserted, committed) per step of a create_merchants job
+MERCHANT_JOB_CHUNK = int(os.getenv("MERCHANT_JOB_CHUNK", "200"))
+
+
+def _artifact_lines(path: str) -> List[str]:
+    """
+    Complete lines of an artifact left by an earlier attempt (none if there is no file).
+    A line torn by a crash mid-write is dropped.
+    """
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    if lines and not lines[-1].endswith("\n"):
+        lines.pop()
+    return lines
+
+
+def _rewrite_artifact(path: str, lines: List[str]) -> None:
+    # replace the file atomically so a crash here cannot lose lines that are still needed
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _sync(out) -> None:
+    # artifact lines must be on disk before the rows they describe are committed
+    out.flush()
+    os.fsync(out.fileno())
+
+
+@job_handler("mint_tags")
+async def run_mint_tags(ctx: JobContext) -> Dict[str, Any]:
+    """
+    params: shop_id, count, prefix. Each chunk's tokens are appended to a `txt` artifact and
+    fsynced before the chunk is committed, then checkpointed, so every committed tag is in
+    the artifact. A resumed attempt keeps the artifact tokens that reached nfc_tags (a crash
+    before the commit leaves lines for tags that never did), and mints the rest.
+    """
+    shop_id, count, prefix = ctx.params["shop_id"], int(ctx.params["count"]), ctx.params.get("prefix")
+    path = ctx.artifact_path("txt")
+    await ctx.set_artifact(path)
+    done = 0
+    if ctx.attempt > 1:
+        tokens = [line.rstrip("\n") for line in _artifact_lines(path)]
+        async with async_session() as db:
+            stored = await existing_tokens(db, tokens)
+        kept = [t for t in tokens if t in stored]
+        _rewrite_artifact(path, [f"{t}\n" for t in kept])
+        done = len(kept)
+    resumed = done
+
+    with open(path, "a" if ctx.attempt > 1 else "w", encoding="utf-8") as out:
+        async def on_chunk(tokens: List[str]) -> None:
+            out.write("".join(f"{t}\n" for t in tokens))
+            _sync(out)
+            for t in tokens:
+                token_cache.invalidate_token(t)
+
+        async def on_progress(minted: int, _total: int) -> None:
+            nonlocal done
+            done = resumed + minted
+            await ctx.progress(done, count, force=True)
+
+        async with async_session() as db:
+            await mint_tags(db, shop_id, count - done, prefix=prefix, on_progress=on_progress, on_chunk=on_chunk, commit_per_chunk=True)
+    return {"shop_id": shop_id, "count": done}
+
+
+@job_handler("migrate_tag_uris")
+async def run_migrate_tag_uris(ctx: JobContext) -> Dict[str, Any]:
+    """
+    params: restart, chunk_size. Resumes from the migration's own checkpoint on retry.
+    """
+    restart = bool(ctx.params.get("restart")) and ctx.attempt == 1
+    chunk_size = int(ctx.params.get("chunk_size") or tag_migration.TAG_MIGRATION_CHUNK_SIZE)
+    async with async_session() as db:
+        total = (await db.execute(select(func.count()).select_from(models.NFCTag))).scalar()
+        await ctx.progress(0, total, force=True)
+
+        async def on_progress(done: int, _total) -> None:
+            await ctx.progress(done, total)
+
+        return await tag_migration.migrate_tag_uris(db, chunk_size=chunk_size, restart=restart, on_progress=on_progress)
+
+
+async def _run_export(ctx: JobContext, batches, columns) -> Dict[str, Any]:
+    fmt = ctx.params.get("format", "csv")
+    path = ctx.artifact_path(fmt)
+    rows = 0
+
+    async def counted():
+        nonlocal rows
+        async for batch in batches:
+            rows += len(batch)
+            await ctx.progress(rows)
+            yield batch
+
+    # exports are cheap to redo; a retry rewrites the file from scratch
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        async for chunk in exports.encode(counted(), fmt, columns):
+            out.write(chunk)
+    await ctx.set_artifact(path)
+    await ctx.progress(rows, rows, force=True)
+    return {"rows": rows, "format": fmt}
+
+
+@job_handler("export_tags")
+async def run_export_tags(ctx: JobContext) -> Dict[str, Any]:
+    return await _run_export(ctx, exports.iter_tags(ctx.params["shop_id"], status=ctx.params.get("status")), exports.TAG_COLUMNS)
+
+
+@job_handler("export_visits")
+async def run_export_visits(ctx: JobContext) -> Dict[str, Any]:
+    return await _run_export(ctx, exports.iter_visits(ctx.params["shop_id"]), exports.VISIT_COLUMNS)
+
+
+@job_handler("create_merchants")
+async def run_create_merchants(ctx: JobContext) -> Dict[str, Any]:
+    """
+    params: count. Merchants are created MERCHANT_JOB_CHUNK at a time; each chunk's
+    credentials are appended to a CSV artifact and fsynced before the chunk is committed,
+    then checkpointed. The file holds the only copy of the plaintext passwords, so a retry
+    never truncates it: it keeps the rows whose user reached the database and drops those
+    of a chunk whose commit never happened.
+    """
+    count = int(ctx.params["count"])
+    path = ctx.artifact_path("csv")
+    await ctx.set_artifact(path)
+    lines = _artifact_lines(path) if ctx.attempt > 1 else []
+    if lines:
+        rows = lines[1:]
+        emails = [r["email"] for r in csv.DictReader(lines)]
+        async with async_session() as db:
+            stored = set()
+            for i in range(0, len(emails), 900):
+                res = await db.execute(select(models.User.email).where(models.User.email.in_(emails[i:i + 900])))
+                stored.update(res.scalars())
+        lines = lines[:1] + [row for row, email in zip(rows, emails) if email in stored]
+        _rewrite_artifact(path, lines)
+    done = max(len(lines) - 1, 0)
+    with open(path, "a" if lines else "w", encoding="utf-8", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=exports.MERCHANT_COLUMNS, extrasaction="ignore")
+        if not lines:
+            writer.writeheader()
+        async with async_session() as db:
+            while done < count:
+                created = await crud.create_merchant_accounts(db, min(MERCHANT_JOB_CHUNK, count - done), commit=False)
+                writer.writerows(created)
+                _sync(out)
+                await db.commit()
+                done += len(created)
+                await ctx.progress(done, count, force=True)
+    return {"count": done}
+
+
+@job_handler("ai_copy_batch")
+async def run_ai_copy_batch(ctx: JobContext) -> Dict[str, Any]:
+    """
+    params: items, model, temperature, parallelism, cache. Results become draft content items;
+    a resumed attempt skips items whose draft was already stored by this job.
+    """
+    # the /ai/generate pipeline (cache, coalescing, bulkhead, breaker); main imports this module
+    from .main import AIGenerateRequest, _build_messages, _generate
+
+    items = ctx.params["items"]
+    model = ctx.params.get("model") or "deepseek-chat"
+    temperature = ctx.params.get("temperature") or 0.0
+    use_cache = ctx.params.get("cache", True) is not False
+
+    async def generate(item: Dict[str, Any]) -> Dict[str, Any]:
+        payload = AIGenerateRequest(model=model, temperature=temperature, **{k: item.get(k) for k in ("template_id", "context", "messages")})
+        return await _generate(model, _build_messages(payload), temperature, None, use_cache=use_cache)
+
+    async def on_progress(done: int, total: int) -> None:
+        await ctx.progress(done, total)
+
+    async with async_session() as db:
+        return await ai_batch.generate_drafts(
+            db,
+            items,
+            generate,
+            marker=f"ai-batch:{ctx.job_id}",
+            parallelism=int(ctx.params.get("parallelism") or ai_batch.AI_BATCH_PARALLELISM),
+            on_progress=on_progress,
+        )
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from . import models
+from .db import async_session
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_ARTIFACT_DIR = os.getenv("JOB_ARTIFACT_DIR", os.path.join(os.getcwd(), "job_artifacts"))
+# minimum seconds between persisted progress updates of one job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+Handler = Callable[["JobContext"], Awaitable[Any]]
+_handlers: Dict[str, Handler] = {}
+
+
+def job_handler(kind: str):
+    """
+    Register a coroutine `handler(ctx) -> result` for jobs of `kind`.
+    Handlers may be re-run after a restart (ctx.attempt > 1) and should resume from
+    ctx.resume_from / their own checkpoints rather than redo finished work.
+    """
+    def decorator(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+class JobContext:
+    def __init__(self, runner: "JobRunner", job: models.Job):
+        self.runner = runner
+        self.job_id = job.id
+        self.kind = job.kind
+        self.params: Dict[str, Any] = dict(job.params or {})
+        self.attempt = job.attempts
+        # progress persisted by a previous, interrupted attempt
+        self.resume_from = job.progress or 0
+        self.total = job.total
+        self._last_flush = 0.0
+
+    def artifact_path(self, suffix: str) -> str:
+        os.makedirs(JOB_ARTIFACT_DIR, exist_ok=True)
+        return os.path.join(JOB_ARTIFACT_DIR, f"{self.job_id}.{suffix}")
+
+    async def set_artifact(self, path: str) -> None:
+        await self.runner._update(self.job_id, artifact=os.path.basename(path))
+
+    async def progress(self, done: int, total: Optional[int] = None, force: bool = False) -> None:
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if not force and now - self._last_flush < JOB_PROGRESS_INTERVAL and (self.total is None or done < self.total):
+            return
+        self._last_flush = now
+        await self.runner._update(self.job_id, progress=done, total=self.total)
+
+
+def serialize(job: models.Job) -> Dict[str, Any]:
+    def ts(v):
+        return v.isoformat() if v else None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": job.params,
+        "progress": job.progress,
+        "total": job.total,
+        "result": job.result,
+        "error": job.error,
+        "has_artifact": bool(job.artifact),
+        "attempts": job.attempts,
+        "created_by": job.created_by,
+        "created_at": ts(job.created_at),
+        "started_at": ts(job.started_at),
+        "finished_at": ts(job.finished_at),
+    }
+
+
+class JobRunner:
+    """
+    In-process asyncio job runner persisted in the `jobs` table; no external broker.
+    At most `concurrency` jobs execute at once, the rest wait in `queued`.
+    Jobs left `running` by a crash, or interrupted by shutdown, are re-queued by `start()`.
+    Designed for a single app instance: two processes sharing a database would both recover
+    the same interrupted jobs.
+    """
+
+    def __init__(self, session_factory=None, concurrency: int = JOB_CONCURRENCY):
+        self.session_factory = session_factory or async_session
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(models.Job).where(models.Job.status == RUNNING).values(status=QUEUED)
+                )
+                await db.commit()
+                res = await db.execute(
+                    select(models.Job.id).where(models.Job.status == QUEUED).order_by(models.Job.created_at)
+                )
+                pending = [r[0] for r in res.fetchall()]
+        except Exception:
+            # jobs table missing (database not initialized yet); nothing to recover
+            logger.exception("job recovery skipped")
+            return
+        for job_id in pending:
+            self._spawn(job_id)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    async def submit(self, kind: str, params: Optional[Dict[str, Any]] = None, created_by: Optional[str] = None, total: Optional[int] = None) -> Dict[str, Any]:
+        if kind not in _handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+        job = models.Job(
+            id=str(uuid.uuid4()), kind=kind, status=QUEUED, params=params or {},
+            progress=0, total=total, attempts=0, created_by=created_by,
+        )
+        async with self.session_factory() as db:
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+        self._spawn(job.id)
+        return serialize(job)
+
+    async def get(self, job_id: str) -> Optional[models.Job]:
+        async with self.session_factory() as db:
+            return await db.get(models.Job, job_id)
+
+    async def list(self, created_by: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        q = select(models.Job).order_by(models.Job.created_at.desc()).limit(limit)
+        if created_by is not None:
+            q = q.where(models.Job.created_by == created_by)
+        async with self.session_factory() as db:
+            res = await db.execute(q)
+            return [serialize(j) for j in res.scalars().all()]
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(models.Job)
+                .where(models.Job.id == job_id, models.Job.status == QUEUED)
+                .values(status=CANCELLED, finished_at=datetime.utcnow())
+            )
+            await db.commit()
+        task = self._tasks.get(job_id)
+        if task is not None:
+            # a queued job's task is only waiting for a slot; a running one gets CancelledError
+            task.cancel()
+            await asyncio.wait([task], timeout=5)
+        job = await self.get(job_id)
+        return serialize(job) if job else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"concurrency": self.concurrency, "in_process": len(self._tasks)}
+
+    def _spawn(self, job_id: str) -> None:
+        if job_id in self._tasks:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        task = asyncio.create_task(self._execute(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(job_id, None))
+
+    async def _update(self, job_id: str, **values: Any) -> None:
+        async with self.session_factory() as db:
+            await db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+            await db.commit()
+
+    async def _execute(self, job_id: str) -> None:
+        async with self._semaphore:
+            async with self.session_factory() as db:
+                job = await db.get(models.Job, job_id)
+                if job is None or job.status != QUEUED:
+                    return
+                job.status = RUNNING
+                job.attempts = (job.attempts or 0) + 1
+                job.started_at = datetime.utcnow()
+                await db.commit()
+            ctx = JobContext(self, job)
+            try:
+                result = await _handlers[job.kind](ctx)
+            except asyncio.CancelledError:
+                # shutdown interrupts (job resumes on next start); an explicit cancel is final
+                if self._stopping:
+                    await self._update(job_id, status=QUEUED)
+                else:
+                    await self._update(job_id, status=CANCELLED, finished_at=datetime.utcnow())
+                raise
+            except Exception as exc:
+                logger.exception("job %s (%s) failed", job_id, job.kind)
+                await self._update(job_id, status=FAILED, error=str(exc)[:1000], finished_at=datetime.utcnow())
+                return
+            values: Dict[str, Any] = {"status": SUCCEEDED, "result": result, "finished_at": datetime.utcnow()}
+            if ctx.total is not None:
+                values["progress"] = ctx.total
+            await self._update(job_id, **values)
+
+
+# process-wide runner; started (with recovery) and stopped by the app lifespan
+job_runner = JobRunner()
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+# path of the optional on-disk tier; unset disables it
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "50000"))
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], temperature: float) -> str:
+    """
+    Canonical hash of a completion request: key order and whitespace never change the key.
+    """
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "temperature": float(temperature)},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """SQLite-file tier; all access runs in a worker thread so the event loop never blocks on disk."""
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, upstream_seconds REAL NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, upstream_seconds, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[2] + self.ttl < now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, value: Dict[str, Any], upstream_seconds: float) -> int:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, upstream_seconds, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), upstream_seconds, now, now),
+            )
+            evicted = 0
+            count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                # evict expired rows, then least recently used down to 90% of capacity
+                evicted += conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+                excess = count - evicted - int(self.max_entries * 0.9)
+                if excess > 0:
+                    evicted += conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)", (excess,)
+                    ).rowcount
+            conn.commit()
+        return evicted
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class LLMCache:
+    """
+    Two-tier cache of deterministic completions: an in-memory LRU in front of an optional
+    SQLite file, both with TTL. Only requests with temperature 0 are cacheable.
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL, db_path: str = LLM_CACHE_DB, disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk = _DiskTier(db_path, ttl, disk_max_entries) if db_path else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.saved_upstream_seconds = 0.0
+
+    def cacheable(self, temperature: Optional[float], use_cache: bool = True) -> bool:
+        return use_cache and not (temperature or 0.0) > 0 and (self.maxsize > 0 or self._disk is not None)
+
+    def record_bypass(self) -> None:
+        # a request answered without consulting the cache (not cacheable, or streamed)
+        self.bypassed += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._memory.get(key)
+        if item is not None:
+            value, upstream_seconds, created_at = item
+            if created_at + self.ttl >= time.time():
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                self.saved_upstream_seconds += upstream_seconds
+                return value
+            del self._memory[key]
+        if self._disk is not None:
+            try:
+                found = await asyncio.to_thread(self._disk.get, key)
+            except Exception:
+                logger.exception("llm cache disk read failed")
+                found = None
+            if found is not None:
+                value, upstream_seconds, created_at = found
+                self._remember(key, (value, upstream_seconds, created_at))
+                self.hits_disk += 1
+                self.saved_upstream_seconds += upstream_seconds
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any], upstream_seconds: float) -> None:
+        self._remember(key, (value, upstream_seconds, time.time()))
+        self.stores += 1
+        if self._disk is not None:
+            try:
+                self.evictions += await asyncio.to_thread(self._disk.set, key, value, upstream_seconds)
+            except Exception:
+                logger.exception("llm cache disk write failed")
+
+    def _remember(self, key: str, item: tuple) -> None:
+        if self.maxsize <= 0:
+            return
+        self._memory[key] = item
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_memory + self.hits_disk
+        lookups = hits + self.misses
+        return {
+            "memory_size": len(self._memory),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "disk_enabled": self._disk is not None,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "saved_upstream_seconds": round(self.saved_upstream_seconds, 3),
+        }
+
+
+# process-wide cache used by /ai/generate
+llm_cache = LLMCache()
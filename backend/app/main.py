@@ -1,13 +1,33 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from .db import async_session
+from .db import async_session, get_read_db
 from . import crud
+from .token_cache import token_cache, TOKEN_CACHE_REPLICA_TTL
+from .visit_buffer import visit_buffer
+from .audit_log import audit_log
+from .password_pool import password_pool
+from .jobs import job_runner
+from . import http_client
+from .llm_cache import llm_cache, cache_key
+from .single_flight import upstream_flight
+from .upstream_guard import llm_guard, UpstreamUnavailable
+from . import rate_limit as rate_limits
+from . import metrics
+from . import profiling
+from .rate_limit import rate_limit
 from sqlalchemy.ext.asyncio import AsyncSession
 from . import ai
+from . import ai_utils
 from .ai_utils import generate_text as generate_text_impl
 from fastapi import Request
 from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+import hashlib
+import math
+import os
+import time
 
 
 class AIGenerateRequest(BaseModel):
@@ -19,12 +39,37 @@ class AIGenerateRequest(BaseModel):
     shop_id: Optional[str] = None
     template_id: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
+    # set false to skip the response cache for this call
+    cache: Optional[bool] = True
+
+
+UPSTREAM_UNAVAILABLE_TEXT = "这是模拟生成的文案（AI 服务暂时不可用）。请稍后重试获取真实生成。"
 
 
 class AIGenerateResponse(BaseModel):
     raw: Dict[str, Any]
 
-app = FastAPI(title="AllValue Link Backend (scaffold)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.startup()
+    await audit_log.start()
+    await visit_buffer.start()
+    # re-queues jobs interrupted by the previous shutdown or crash
+    await job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        # drain buffered visits before the process exits
+        await visit_buffer.stop()
+        await http_client.shutdown()
+        await audit_log.stop()
+        password_pool.shutdown()
+        llm_cache.close()
+        await rate_limits.shutdown()
+
+
+app = FastAPI(title="AllValue Link Backend (scaffold)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +86,13 @@ app.add_middleware(
 )
 
 
+if metrics.METRICS_ENABLED:
+    metrics.instrument_sqlalchemy()
+    app.add_middleware(metrics.MetricsMiddleware)
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+
 class ContentResponse(BaseModel):
     type: str
     content_id: str | None = None
@@ -59,6 +111,16 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """
+    Prometheus text exposition of request, SQL and LLM upstream metrics.
+    """
+    if metrics.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     return {
@@ -68,43 +130,141 @@ async def root():
     }
 
 
+# Cache-Control of GET /t/{token}. With max-age 0 every tap revalidates at the origin (usually
+# a 304), so visits are still counted there; longer policies need clients to send the beacon.
+TAP_CACHE_VISIBILITY = os.getenv("TAP_CACHE_VISIBILITY", "public")
+TAP_CACHE_MAX_AGE = int(os.getenv("TAP_CACHE_MAX_AGE", "0"))
+TAP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("TAP_CACHE_STALE_WHILE_REVALIDATE", "0"))
+# count a visit on every GET /t/{token} (200 or 304); set 0 once clients POST /t/{token}/visit
+TAP_COUNT_ON_GET = os.getenv("TAP_COUNT_ON_GET", "1") == "1"
+# bump to invalidate every landing ETag when the response shape changes
+_TAP_ETAG_VERSION = "1"
+
+
+def _record_visit(tag_id: str, request: Request) -> None:
+    # write-behind: the visit is persisted by the buffer's background flush, never in the request
+    visit_buffer.enqueue(
+        tag_id,
+        user_agent=request.headers.get("user-agent"),
+        referer=request.headers.get("referer"),
+    )
+
+
+def _tap_etag(tag, content_id: Optional[str]) -> str:
+    # the landing payload is fully determined by the tag, its shop and the content item chosen
+    version = f"{_TAP_ETAG_VERSION}:{tag.id}:{tag.shop_id}:{content_id}"
+    return '"' + hashlib.sha1(version.encode()).hexdigest()[:20] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # weak comparison, as for GET: W/"x" matches "x"
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+def _tap_cache_headers(etag: str) -> Dict[str, str]:
+    directives = [TAP_CACHE_VISIBILITY]
+    if TAP_CACHE_MAX_AGE > 0:
+        directives.append(f"max-age={TAP_CACHE_MAX_AGE}")
+    else:
+        directives.append("no-cache")
+    if TAP_CACHE_STALE_WHILE_REVALIDATE > 0:
+        directives.append(f"stale-while-revalidate={TAP_CACHE_STALE_WHILE_REVALIDATE}")
+    return {"ETag": etag, "Cache-Control": ", ".join(directives)}
+
+
+async def _lookup_token(db: AsyncSession, token: str, if_none_match: Optional[str] = None):
+    """
+    Return (tag, etag, content). When the client's ETag still matches, the content item's
+    title/body are not loaded and content is None.
+    """
+    tag = await crud.get_tag_by_token(db, token)
+    if not tag:
+        return None, None, None
+    if if_none_match:
+        etag = _tap_etag(tag, await crud.get_content_id_for_tag(db, tag.id))
+        if _etag_matches(if_none_match, etag):
+            return tag, etag, None
+    content = await crud.get_content_for_tag(db, tag.id)
+    return tag, _tap_etag(tag, content.id if content else None), content
+
+
 @app.get("/t/{token}", response_model=ContentResponse)
-async def resolve_token(token: str, db: AsyncSession = Depends(get_db)):
+async def resolve_token(token: str, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
     """
     Resolve a token stored in nfc_tags table and return content.
+    Responses carry an ETag; a matching If-None-Match gets an empty 304.
     """
     if not token:
         raise HTTPException(status_code=404, detail="Token not provided")
-
-    tag = await crud.get_tag_by_token(db, token)
+    if_none_match = request.headers.get("if-none-match")
+
+    cached = token_cache.get(token)
+    if cached is not None and cached.get("etag"):
+        if TAP_COUNT_ON_GET:
+            _record_visit(cached["tag_id"], request)
+        if _etag_matches(if_none_match, cached["etag"]):
+            return Response(status_code=304, headers=_tap_cache_headers(cached["etag"]))
+        response.headers.update(_tap_cache_headers(cached["etag"]))
+        return dict(cached["response"])
+
+    tag, etag, content = await _lookup_token(db, token, if_none_match)
+    from_replica = bool(db.info.get("replica"))
+    if not tag and from_replica:
+        # a tag minted moments ago may not have reached the replica yet
+        async with async_session() as primary:
+            tag, etag, content = await _lookup_token(primary, token, if_none_match)
+        from_replica = False
     if not tag:
         raise HTTPException(status_code=404, detail="Token not found")
 
     # record visit (best-effort, don't block response)
-    try:
-        await crud.create_visit(db, tag.id)
-    except Exception:
-        # swallow logging for scaffold
-        pass
+    if TAP_COUNT_ON_GET:
+        _record_visit(tag.id, request)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=_tap_cache_headers(etag))
 
     # shape response
-    content = await crud.get_content_for_tag(db, tag.id)
-    response = {
+    body = {
         "type": "content" if content else "shop",
         "content_id": content.id if content else None,
         "title": content.title if content else None,
         "body": content.body if content else None,
         "shop": {"id": tag.shop_id, "name": getattr(tag, "shop_name", None)},
     }
-    return response
+    # a replica may still serve content the primary has replaced (and the cache was cleared
+    # for); keep such entries only briefly so a lagging read is not pinned for TOKEN_CACHE_TTL
+    token_cache.set(
+        token, tag.shop_id, {"tag_id": tag.id, "response": body, "etag": etag},
+        ttl=TOKEN_CACHE_REPLICA_TTL if from_replica else None,
+    )
+    response.headers.update(_tap_cache_headers(etag))
+    return dict(body)
 
 
-@app.post("/ai/generate", response_model=AIGenerateResponse)
-async def ai_generate(payload: AIGenerateRequest, request: Request, db: AsyncSession = Depends(get_db)):
+@app.post("/t/{token}/visit", status_code=204)
+async def record_tap_visit(token: str, request: Request, db: AsyncSession = Depends(get_read_db)):
     """
-    Proxy endpoint to call Silra (or other LLM) service.
-    Reads SILRA_API_KEY from environment; do NOT commit keys to repo.
+    Visit beacon (e.g. `navigator.sendBeacon`) for landing pages served from a browser or CDN
+    cache: counts one visit without returning content.
     """
+    cached = token_cache.get(token)
+    tag_id = cached["tag_id"] if cached is not None else None
+    if tag_id is None:
+        tag = await crud.get_tag_by_token(db, token)
+        if not tag and db.info.get("replica"):
+            async with async_session() as primary:
+                tag = await crud.get_tag_by_token(primary, token)
+        if not tag:
+            raise HTTPException(status_code=404, detail="Token not found")
+        tag_id = tag.id
+    _record_visit(tag_id, request)
+    return Response(status_code=204)
+
+
+def _build_messages(payload: AIGenerateRequest) -> List[Dict[str, Any]]:
     # Build messages: if API caller didn't pass messages, attempt to construct one
     messages = payload.messages
     if not messages:
@@ -116,41 +276,148 @@ async def ai_generate(payload: AIGenerateRequest, request: Request, db: AsyncSes
             prompt_parts.append(f"Context: {payload.context}")
         prompt_text = ";\n".join(prompt_parts) or "请根据提供的信息生成文案。"
         messages = [{"role": "user", "content": prompt_text}]
+    return messages
+
 
+def _client_ip(request: Request) -> Optional[str]:
     try:
-        client_ip = None
-        try:
-            client_ip = request.client.host
-        except Exception:
-            client_ip = None
-        # prefer ai.generate_text if present (tests monkeypatch backend.app.ai.generate_text);
-        # otherwise fall back to ai_utils implementation with rate-limiting
+        return request.client.host
+    except Exception:
+        return None
+
+
+async def _call_upstream(model: str, messages: List[Dict[str, Any]], temperature: float, client_ip: Optional[str]) -> Dict[str, Any]:
+    # bounded concurrency + circuit breaker; raises UpstreamUnavailable instead of piling up calls
+    return await llm_guard.call(lambda: _invoke_upstream(model, messages, temperature, client_ip))
+
+
+async def _invoke_upstream(model: str, messages: List[Dict[str, Any]], temperature: float, client_ip: Optional[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = await _invoke_upstream_once(model, messages, temperature, client_ip)
+    except Exception as exc:
+        metrics.observe_upstream(model, time.perf_counter() - started, exc)
+        raise
+    metrics.observe_upstream(model, time.perf_counter() - started)
+    return result
+
+
+async def _invoke_upstream_once(model: str, messages: List[Dict[str, Any]], temperature: float, client_ip: Optional[str]) -> Dict[str, Any]:
+    # prefer ai.generate_text if present (tests monkeypatch backend.app.ai.generate_text);
+    # otherwise fall back to ai_utils implementation (the route has already rate-limited the call)
+    try:
+        # some test monkeypatches may supply a function that doesn't accept client_ip;
+        # attempt with client_ip first, fallback to calling without it on TypeError.
         try:
-            # some test monkeypatches may supply a function that doesn't accept client_ip;
-            # attempt with client_ip first, fallback to calling without it on TypeError.
-            try:
-                result = await ai.generate_text(
-                    model=payload.model or "deepseek-chat",
-                    messages=messages,
-                    stream=payload.stream or False,
-                    temperature=payload.temperature or 0.0,
-                    client_ip=client_ip,
-                )
-            except TypeError:
-                result = await ai.generate_text(
-                    model=payload.model or "deepseek-chat",
-                    messages=messages,
-                    stream=payload.stream or False,
-                    temperature=payload.temperature or 0.0,
-                )
-        except AttributeError:
-            result = await generate_text_impl(
-                model=payload.model or "deepseek-chat",
-                messages=messages,
-                stream=payload.stream or False,
-                temperature=payload.temperature or 0.0,
-                client_ip=client_ip,
+            return await ai.generate_text(
+                model=model, messages=messages, stream=False, temperature=temperature, client_ip=client_ip,
             )
+        except TypeError:
+            return await ai.generate_text(model=model, messages=messages, stream=False, temperature=temperature)
+    except AttributeError:
+        return await generate_text_impl(
+            model=model, messages=messages, stream=False, temperature=temperature, client_ip=client_ip, enforce_limit=False,
+        )
+
+
+async def _generate(model: str, messages: List[Dict[str, Any]], temperature: float, client_ip: Optional[str], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Non-streaming completion through the response cache. Identical deterministic requests
+    (temperature 0) are answered from the cache instead of a new upstream round-trip, and
+    identical ones that arrive while the first is still in flight share its upstream call.
+    """
+    if not llm_cache.cacheable(temperature, use_cache):
+        llm_cache.record_bypass()
+        return await _call_upstream(model, messages, temperature, client_ip)
+    key = cache_key(model, messages, temperature)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch() -> Dict[str, Any]:
+        started = time.perf_counter()
+        result = await _call_upstream(model, messages, temperature, client_ip)
+        if isinstance(result, dict) and not result.get("mock"):
+            await llm_cache.set(key, result, time.perf_counter() - started)
+        return result
+
+    return await upstream_flight.do(key, fetch)
+
+
+async def _stream_response(model: str, messages: List[Dict[str, Any]], temperature: float, client_ip: Optional[str]) -> StreamingResponse:
+    """
+    Relay the upstream SSE stream. The first chunk is awaited before the response starts,
+    so rate limiting, a missing key and upstream HTTP errors still map to proper status
+    codes; after that, chunks are forwarded as they arrive.
+    """
+    async def guarded():
+        # the bulkhead slot is held, and the breaker informed, for the whole stream
+        async with llm_guard.slot():
+            # already counted by ai_rate_limit; client_ip is only recorded in the audit log
+            upstream = ai_utils.stream_text(model=model, messages=messages, temperature=temperature, client_ip=client_ip, enforce_limit=False)
+            try:
+                async for chunk in upstream:
+                    yield chunk
+            finally:
+                await upstream.aclose()
+
+    chunks = guarded()
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def relay():
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            # runs on client disconnect too, so the upstream connection is released
+            await chunks.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# per client, counted on admission: before cache hits, coalesced calls and streams
+ai_rate_limit = rate_limit(ai_utils.RATE_LIMIT_MAX, ai_utils.RATE_LIMIT_WINDOW, name="ai")
+
+
+@app.post("/ai/generate", response_model=AIGenerateResponse, dependencies=[Depends(ai_rate_limit)])
+async def ai_generate(payload: AIGenerateRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Proxy endpoint to call Silra (or other LLM) service.
+    Reads SILRA_API_KEY from environment; do NOT commit keys to repo.
+    Deterministic requests are served from the response cache unless the caller sends
+    `"cache": false` or `Cache-Control: no-cache`. With `"stream": true` the upstream
+    server-sent events are relayed as they arrive (`text/event-stream`).
+    """
+    messages = _build_messages(payload)
+    model = payload.model or "deepseek-chat"
+    temperature = payload.temperature or 0.0
+    use_cache = payload.cache is not False and "no-cache" not in request.headers.get("cache-control", "").lower()
+
+    try:
+        client_ip = _client_ip(request)
+        if payload.stream:
+            # streamed responses are never cached
+            llm_cache.record_bypass()
+            return await _stream_response(model, messages, temperature, client_ip)
+        result = await _generate(model, messages, temperature, client_ip, use_cache=use_cache)
+    except UpstreamUnavailable as exc:
+        # breaker open or no free upstream slot: degrade instead of queueing more calls
+        if llm_guard.fallback == "mock":
+            return {"raw": {"mock": True, "text": UPSTREAM_UNAVAILABLE_TEXT, "degraded": exc.reason}}
+        raise HTTPException(
+            status_code=503,
+            detail=f"upstream unavailable ({exc.reason})",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
     except Exception as exc:
         # handle rate limit specifically
         msg = str(exc)
@@ -194,8 +461,8 @@ async def reset_admin(db: AsyncSession = Depends(get_db)):
     """
     if __import__('os').getenv("ENV", "dev") != "dev":
         raise HTTPException(status_code=404, detail="Not available")
-    from .auth import get_password_hash
-    hashed = get_password_hash("password123")
+    from .auth import get_password_hash_async
+    hashed = await get_password_hash_async("password123")
     # upsert user
     await db.execute(
         "INSERT OR REPLACE INTO users (id, email, hashed_password) VALUES ((SELECT id FROM users WHERE email='admin@example.com') , :email, :hp)",
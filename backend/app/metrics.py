@@ -0,0 +1,223 @@
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# when set, GET /metrics requires `Authorization: Bearer <METRICS_TOKEN>`
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "COPY"}
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels: Any, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; per label set it keeps bucket counts, a sum and a count."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., overflow count, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_latency = registry.register(Histogram("http_request_duration_seconds", "HTTP request latency, until the response body is sent.", ("method", "route")))
+http_in_progress = registry.register(Gauge("http_requests_in_progress", "HTTP requests currently being served."))
+db_latency = registry.register(Histogram("db_query_duration_seconds", "SQL statement execution time by operation.", ("operation",), DB_BUCKETS))
+db_queries_per_request = registry.register(Histogram("db_queries_per_request", "SQL statements executed while serving one request.", ("route",), QUERY_COUNT_BUCKETS))
+db_seconds_per_request = registry.register(Histogram("db_seconds_per_request", "Time spent executing SQL while serving one request.", ("route",), DB_BUCKETS))
+upstream_latency = registry.register(Histogram("llm_upstream_duration_seconds", "LLM upstream call latency by model and outcome.", ("model", "status"), UPSTREAM_BUCKETS))
+
+# [statements, seconds] for the request being served in this context
+_request_db: ContextVar[Optional[List[float]]] = ContextVar("request_db", default=None)
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    op = head[0].upper() if head else ""
+    return op if op in _SQL_OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the per-statement execution context: a statement that raises never reaches
+    # after_cursor_execute, and its start time is discarded with the context
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_latency.observe(elapsed, _operation(statement))
+    current = _request_db.get()
+    if current is not None:
+        current[0] += 1
+        current[1] += elapsed
+
+
+def instrument_sqlalchemy() -> None:
+    # class-level listeners: every engine (primary, replica, tests) is timed
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def upstream_status(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return "ok"
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return str(status)
+    return type(exc).__name__
+
+
+def observe_upstream(model: str, seconds: float, exc: Optional[BaseException] = None) -> None:
+    upstream_latency.observe(seconds, model or "unknown", upstream_status(exc))
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or body buffering): times each HTTP request
+    and labels it with the matched route template, so `/t/{token}` is one series however
+    many tokens are resolved. SQL statements run on behalf of the request are counted
+    through a context variable fed by the engine hooks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Any, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._routes.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            path = self._routes[endpoint] = path or getattr(endpoint, "__name__", "unknown")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        db_stats = [0, 0.0]
+        token = _request_db.set(db_stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_progress.dec()
+            _request_db.reset(token)
+            route = self._route(scope)
+            method = scope.get("method", "")
+            http_requests.inc(method, route, status)
+            http_latency.observe(elapsed, method, route)
+            db_queries_per_request.observe(db_stats[0], route)
+            db_seconds_per_request.observe(db_stats[1], route)
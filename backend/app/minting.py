@@ -0,0 +1,163 @@
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Iterable, List, Optional, Set
+
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+BATCH_ENCODE_MAX = int(os.getenv("BATCH_ENCODE_MAX", "200000"))
+MINT_CHUNK_SIZE = int(os.getenv("MINT_CHUNK_SIZE", "2000"))
+TAG_URI_BASE = os.getenv("TAG_URI_BASE", "https://app.example.com/t/")
+
+# bound IN (...) lists well below SQLite/PostgreSQL parameter limits
+_LOOKUP_CHUNK = 900
+_MAX_COLLISION_ROUNDS = 5
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+ChunkCallback = Callable[[List[str]], Awaitable[None]]
+
+
+def new_token(prefix: Optional[str] = None) -> str:
+    return (prefix or "") + uuid.uuid4().hex[:12]
+
+
+def tag_uri(token: str) -> str:
+    return f"{TAG_URI_BASE}{token}"
+
+
+async def existing_tokens(db: AsyncSession, tokens: Iterable[str]) -> Set[str]:
+    """The subset of `tokens` already stored in nfc_tags."""
+    tokens = list(tokens)
+    found: Set[str] = set()
+    for i in range(0, len(tokens), _LOOKUP_CHUNK):
+        res = await db.execute(select(models.NFCTag.token).where(models.NFCTag.token.in_(tokens[i:i + _LOOKUP_CHUNK])))
+        found.update(r[0] for r in res.fetchall())
+    return found
+
+
+async def generate_unique_tokens(db: AsyncSession, count: int, prefix: Optional[str] = None) -> List[str]:
+    """
+    Build `count` tokens in memory, unique among themselves and against nfc_tags.
+    Each round checks only the candidates that are still unverified.
+    """
+    accepted: Set[str] = set()
+    pending: Set[str] = set()
+    for _ in range(_MAX_COLLISION_ROUNDS):
+        while len(accepted) + len(pending) < count:
+            t = new_token(prefix)
+            if t not in accepted:
+                pending.add(t)
+        taken = await existing_tokens(db, pending)
+        accepted.update(pending - taken)
+        pending = set()
+        if len(accepted) >= count:
+            return list(accepted)[:count]
+    raise RuntimeError("could not generate enough unique tokens; prefix space exhausted?")
+
+
+def _rows(shop_id: Optional[str], tokens: List[str]) -> List[dict]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "shop_id": shop_id,
+            "token": t,
+            "ndef_payload": {"uri": tag_uri(t)},
+            "status": models.TagStatus.unused,
+        }
+        for t in tokens
+    ]
+
+
+async def _write_chunk(db: AsyncSession, rows: List[dict]) -> None:
+    if db.bind.dialect.name == "postgresql" and db.bind.dialect.driver == "asyncpg":
+        # COPY is the fastest bulk path on PostgreSQL; created_at falls back to its server default
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        try:
+            await raw.driver_connection.copy_records_to_table(
+                models.NFCTag.__tablename__,
+                columns=["id", "shop_id", "token", "ndef_payload", "status"],
+                records=[(r["id"], r["shop_id"], r["token"], json.dumps(r["ndef_payload"]), r["status"].value) for r in rows],
+            )
+        except Exception as exc:
+            # the raw driver bypasses SQLAlchemy's exception wrapping; surface unique violations the same way
+            if getattr(exc, "sqlstate", None) == "23505":
+                raise IntegrityError("COPY nfc_tags", None, exc)
+            raise
+        return
+    # executemany over a single prepared INSERT
+    await db.execute(insert(models.NFCTag.__table__), rows)
+
+
+async def _replace_taken(db: AsyncSession, tokens: List[str], prefix: Optional[str]) -> List[str]:
+    """Swap tokens that a concurrent writer has since stored for fresh unique ones."""
+    taken = await existing_tokens(db, tokens)
+    kept = [t for t in tokens if t not in taken]
+    return kept + await generate_unique_tokens(db, len(tokens) - len(kept), prefix)
+
+
+async def mint_tags(
+    db: AsyncSession,
+    shop_id: Optional[str],
+    count: int,
+    prefix: Optional[str] = None,
+    chunk_size: int = MINT_CHUNK_SIZE,
+    on_progress: Optional[ProgressCallback] = None,
+    on_chunk: Optional[ChunkCallback] = None,
+    commit_per_chunk: bool = False,
+) -> List[str]:
+    """
+    Create `count` unused NFC tags for a shop and return their tokens.
+    Tokens are generated and collision-checked up front, then written in chunks of
+    `chunk_size`. By default every chunk goes into one transaction committed at the end,
+    so a failure leaves no tags behind; if the unique token index is hit because of a
+    concurrent writer, the transaction is rolled back and rewritten with the taken tokens
+    replaced.
+    With `commit_per_chunk` each chunk is committed on its own (a colliding chunk is
+    regenerated and retried). `on_chunk` then receives each chunk's tokens after they are
+    written and before they are committed, so the caller can record them durably first;
+    only use it when the caller does, as the mint_tags job does.
+    """
+    tokens = await generate_unique_tokens(db, count, prefix)
+    if not commit_per_chunk:
+        for _ in range(_MAX_COLLISION_ROUNDS):
+            try:
+                for i in range(0, len(tokens), chunk_size):
+                    await _write_chunk(db, _rows(shop_id, tokens[i:i + chunk_size]))
+                    if on_progress is not None:
+                        await on_progress(min(i + chunk_size, len(tokens)), count)
+                await db.commit()
+                break
+            except IntegrityError:
+                await db.rollback()
+                tokens = await _replace_taken(db, tokens, prefix)
+        else:
+            raise RuntimeError("token collisions persisted after retries")
+        if on_chunk is not None:
+            await on_chunk(tokens)
+        return tokens
+
+    minted: List[str] = []
+    for i in range(0, len(tokens), chunk_size):
+        chunk = tokens[i:i + chunk_size]
+        for _ in range(_MAX_COLLISION_ROUNDS):
+            try:
+                await _write_chunk(db, _rows(shop_id, chunk))
+            except IntegrityError:
+                await db.rollback()
+                chunk = await _replace_taken(db, chunk, prefix)
+                continue
+            if on_chunk is not None:
+                await on_chunk(chunk)
+            await db.commit()
+            break
+        else:
+            raise RuntimeError("token collisions persisted after retries")
+        minted.extend(chunk)
+        if on_progress is not None:
+            await on_progress(len(minted), count)
+    return minted
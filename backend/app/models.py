@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Enum, DateTime, JSON, func
+from sqlalchemy import Column, String, Integer, ForeignKey, Enum, DateTime, Date, JSON, Index, func
 from .db import Base
 import enum
 
@@ -14,6 +14,10 @@ class Shop(Base):
     id = Column(String(length=36), primary_key=True)
     name = Column(String, nullable=False)
     description = Column(String)
+    __table_args__ = (
+        # keyset pagination index for /api/shops/page sorted by name
+        Index("ix_shops_name", "name", "id"),
+    )
 
 
 class NFCTag(Base):
@@ -27,6 +31,11 @@ class NFCTag(Base):
     encoded_at = Column(DateTime)
 
 
+CONTENT_PUBLISHED = "published"
+# generated copy awaiting review; never served on /t/{token} nor counted in rollups
+CONTENT_DRAFT = "draft"
+
+
 class ContentItem(Base):
     __tablename__ = "content_items"
     id = Column(String(length=36), primary_key=True)
@@ -36,6 +45,11 @@ class ContentItem(Base):
     metadata_json = Column("metadata", JSON)
     created_by = Column(String)
     created_at = Column(DateTime, server_default=func.now())
+    status = Column(String(length=20), default=CONTENT_PUBLISHED, server_default=CONTENT_PUBLISHED)
+    __table_args__ = (
+        # newest content of a shop, looked up on every uncached /t/{token}
+        Index("ix_content_items_shop_created", "shop_id", "created_at", "id"),
+    )
 
 
 class Visit(Base):
@@ -48,6 +62,67 @@ class Visit(Base):
     created_at = Column(DateTime, server_default=func.now())
 
 
+class TagHourlyStats(Base):
+    # visits per tag per hour, maintained incrementally by app.rollups
+    __tablename__ = "tag_hourly_stats"
+    tag_id = Column(String(length=36), ForeignKey("nfc_tags.id"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    shop_id = Column(String(length=36), ForeignKey("shops.id"), index=True)
+    visits = Column(Integer, nullable=False, default=0)
+
+
+class ShopDailyStats(Base):
+    # visits and content items per shop per (UTC) day, maintained incrementally by app.rollups
+    __tablename__ = "shop_daily_stats"
+    shop_id = Column(String(length=36), ForeignKey("shops.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+    contents = Column(Integer, nullable=False, default=0)
+
+
+class ShopTotals(Base):
+    # all-time visits and content items per shop, maintained alongside ShopDailyStats;
+    # every shop has a row (created with the shop), so /api/shops/page reads these sorts from here
+    __tablename__ = "shop_totals"
+    shop_id = Column(String(length=36), ForeignKey("shops.id"), primary_key=True)
+    visits = Column(Integer, nullable=False, default=0, server_default="0")
+    contents = Column(Integer, nullable=False, default=0, server_default="0")
+    __table_args__ = (
+        # keyset pagination of /api/shops/page by visits/reviews: ORDER BY <key> DESC, shop_id DESC
+        Index("ix_shop_totals_visits", visits.desc(), shop_id.desc()),
+        Index("ix_shop_totals_contents", contents.desc(), shop_id.desc()),
+    )
+
+
+class MigrationCheckpoint(Base):
+    # progress of resumable, chunked data migrations (see app.tag_migration)
+    __tablename__ = "migration_checkpoints"
+    name = Column(String, primary_key=True)
+    last_id = Column(String(length=36), nullable=False, default="")
+    processed = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class Job(Base):
+    # long-running admin operation executed by app.jobs.JobRunner
+    __tablename__ = "jobs"
+    id = Column(String(length=36), primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)
+    params = Column(JSON)
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    result = Column(JSON)
+    error = Column(String)
+    artifact = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_by = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(String(length=36), primary_key=True)
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# pbkdf2 (hashlib / OpenSSL) releases the GIL, so threads hash in parallel
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class PasswordPool:
+    """
+    Runs password hashing and verification on a small dedicated thread pool so a login
+    burst never blocks the event loop. At most `workers` hashes run at once; callers beyond
+    that wait on a semaphore, and the wait is reported as queue time.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+
+    def _ensure(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        # a semaphore is bound to the loop it first blocks on; make a new one per event loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._ensure()
+        semaphore = self._semaphore
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            finished = time.perf_counter()
+            self.running -= 1
+            semaphore.release()
+            self.completed += 1
+            queued, ran = started - queued_at, finished - started
+            self.queue_seconds_total += queued
+            self.queue_seconds_max = max(self.queue_seconds_max, queued)
+            self.run_seconds_total += ran
+            self.run_seconds_max = max(self.run_seconds_max, ran)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._semaphore = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        n = self.completed or 1
+        return {
+            "workers": self.workers,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "queue_ms_avg": round(self.queue_seconds_total / n * 1000, 2),
+            "queue_ms_max": round(self.queue_seconds_max * 1000, 2),
+            "hash_ms_avg": round(self.run_seconds_total / n * 1000, 2),
+            "hash_ms_max": round(self.run_seconds_max * 1000, 2),
+        }
+
+
+# process-wide pool used by app.auth
+password_pool = PasswordPool()
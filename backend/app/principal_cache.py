@@ -0,0 +1,140 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "5000"))
+# bounds how long another worker's role/shop change can go unnoticed
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+JWT_MEMO_SIZE = int(os.getenv("JWT_MEMO_SIZE", "10000"))
+
+
+class Principal:
+    """
+    Detached snapshot of the authenticated user: the fields authorization needs, safe to
+    share between requests (unlike an ORM instance bound to a closed session).
+    """
+
+    __slots__ = ("id", "email", "is_admin", "shop_id", "is_active")
+
+    def __init__(self, id, email, is_admin, shop_id, is_active):
+        self.id = id
+        self.email = email
+        self.is_admin = is_admin
+        self.shop_id = shop_id
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.email, user.is_admin or 0, user.shop_id, user.is_active)
+
+
+class PrincipalCache:
+    """
+    Two bounded LRU maps in front of get_current_user:
+    raw JWT -> (subject, token id), kept until the token's own `exp`, so a token is only
+    verified once; and (subject, token id) -> Principal with a short TTL, so authorization
+    does not need a users query. Principals are indexed by email for invalidation when a
+    user's is_active / is_admin / shop_id change. Single-threaded (event loop) use only.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL, memo_size: int = JWT_MEMO_SIZE):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.memo_size = memo_size
+        self._claims: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+        self._principals: "OrderedDict[Tuple[str, str], Tuple[float, Principal]]" = OrderedDict()
+        self._by_email: Dict[str, Set[Tuple[str, str]]] = {}
+        self.jwt_hits = 0
+        self.jwt_misses = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # -- verified JWT claims -------------------------------------------------
+
+    def get_claims(self, token: str) -> Optional[Tuple[str, str]]:
+        item = self._claims.get(token)
+        if item is None or item[0] <= time.time():
+            if item is not None:
+                del self._claims[token]
+            self.jwt_misses += 1
+            return None
+        self._claims.move_to_end(token)
+        self.jwt_hits += 1
+        return item[1], item[2]
+
+    def set_claims(self, token: str, subject: str, token_id: str, expires_at: Optional[float]) -> None:
+        if self.memo_size <= 0 or expires_at is None:
+            return
+        self._claims[token] = (expires_at, subject, token_id)
+        self._claims.move_to_end(token)
+        while len(self._claims) > self.memo_size:
+            self._claims.popitem(last=False)
+
+    # -- principals ----------------------------------------------------------
+
+    def get(self, subject: str, token_id: str) -> Optional[Principal]:
+        key = (subject, token_id)
+        item = self._principals.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._principals.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, subject: str, token_id: str, principal: Principal) -> None:
+        if self.maxsize <= 0:
+            return
+        key = (subject, token_id)
+        self._principals[key] = (time.monotonic() + self.ttl, principal)
+        self._principals.move_to_end(key)
+        self._by_email.setdefault(principal.email, set()).add(key)
+        while len(self._principals) > self.maxsize:
+            oldest = next(iter(self._principals))
+            self._drop(oldest)
+
+    def invalidate_user(self, email: Optional[str]) -> None:
+        keys = self._by_email.pop(email, None)
+        if not keys:
+            return
+        for key in keys:
+            self._principals.pop(key, None)
+        self.invalidations += 1
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        item = self._principals.pop(key, None)
+        if item is None:
+            return
+        keys = self._by_email.get(item[1].email)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_email[item[1].email]
+
+    def clear(self) -> None:
+        self._claims.clear()
+        self._principals.clear()
+        self._by_email.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "principals": len(self._principals),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "verified_tokens": len(self._claims),
+            "jwt_memo_hits": self.jwt_hits,
+            "jwt_memo_misses": self.jwt_misses,
+        }
+
+
+# process-wide cache used by auth.get_current_user
+principal_cache = PrincipalCache()
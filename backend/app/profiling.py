@@ -0,0 +1,333 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# requests carrying `X-Profile: <PROFILE_SECRET>` are profiled (admins hold the secret)
+PROFILE_SECRET = os.getenv("PROFILE_SECRET") or None
+# fraction of all requests profiled at random (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# seconds between stack samples in the default `sample` mode
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+# newest profiles kept on disk and listed; older ones are deleted
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# the middleware is only installed when one of the triggers is configured
+PROFILING_ENABLED = bool(PROFILE_SECRET) or PROFILE_SAMPLE_RATE > 0
+
+MODES = ("sample", "cprofile")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_stack(coro) -> List[str]:
+    # follow the chain of awaiting coroutines down to what the task is suspended on
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            if not hasattr(coro, "cr_await") and not hasattr(coro, "gi_yieldfrom"):
+                stack.append(f"<{type(coro).__name__}>")
+            break
+        stack.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return stack
+
+
+class _Tracked:
+    """
+    Awaitable that drives `coro` step by step and sets `sampler.running` while one of its
+    steps executes on the event loop, so the sampler can tell running from suspended time.
+    """
+
+    def __init__(self, coro, sampler: "StackSampler"):
+        self.coro = coro
+        self.sampler = sampler
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            self.sampler.running = True
+            try:
+                yielded = self.coro.throw(error) if error is not None else self.coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.sampler.running = False
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:
+                value, error = None, exc
+
+
+class StackSampler:
+    """
+    Wall-clock sampler for one coroutine, awaited through `track()` on the event loop
+    thread. A background thread wakes every `interval` seconds; while the coroutine is
+    running it records the loop thread's Python stack (`cpu;...`), otherwise the chain of
+    coroutines it is suspended in (`await;...`), which shows time spent waiting on the
+    database, HTTP or worker threads.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.coro = None
+        self.running = False
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, coro) -> _Tracked:
+        self.coro = coro
+        return _Tracked(coro, self)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                # the task's frames can change under us; a lost sample is harmless
+                continue
+
+    def _sample(self) -> None:
+        coro = self.coro
+        if coro is None or getattr(coro, "cr_frame", None) is None:
+            # not started yet, or finished
+            return
+        if self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = ["cpu"] + _thread_stack(frame)
+        else:
+            stack = ["await"] + _await_stack(coro)
+        self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, limit: int = 30) -> str:
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            parts = stack.split(";")
+            leaves[(parts[0], parts[-1])] += count
+        total = self.samples or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms", "", "top leaf frames (cpu = running, await = suspended):"]
+        for (kind, leaf), count in leaves.most_common(limit):
+            lines.append(f"{count / total:7.1%}  {kind:5}  {leaf}")
+        return "\n".join(lines) + "\n"
+
+
+class ProfileStore:
+    """
+    Profiles on disk under `directory` plus an in-memory index of the newest `keep`. The
+    index is rebuilt from the `*.json` metadata files on first use, so profiles written
+    before a restart are still listed and rotated out.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._index: Deque[Dict[str, Any]] = deque()
+        self._loaded = False
+
+    def path(self, profile_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{kind}")
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return
+        found = []
+        for name in names:
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    found.append(json.load(f))
+            except (OSError, ValueError):
+                logger.warning("skipping unreadable profile metadata %s", name)
+        found.sort(key=lambda m: m.get("created_at") or "", reverse=True)
+        self._index = deque(found)
+        self._evict()
+
+    def _evict(self) -> List[Dict[str, Any]]:
+        evicted = []
+        while len(self._index) > self.keep:
+            evicted.append(self._index.pop())
+        for old in evicted:
+            for kind in list(old.get("files", [])) + ["json"]:
+                try:
+                    os.remove(self.path(old["id"], kind))
+                except FileNotFoundError:
+                    pass
+        return evicted
+
+    def _write(self, meta: Dict[str, Any], files: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self._load()
+        os.makedirs(self.directory, exist_ok=True)
+        for kind, data in files.items():
+            if kind == "prof":
+                data.dump_stats(self.path(meta["id"], kind))
+            else:
+                with open(self.path(meta["id"], kind), "w", encoding="utf-8") as f:
+                    f.write(data)
+        with open(self.path(meta["id"], "json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self._index.appendleft(meta)
+        return self._evict()
+
+    async def add(self, meta: Dict[str, Any], files: Dict[str, Any]) -> None:
+        meta["files"] = sorted(files)
+        await asyncio.to_thread(self._write, meta, files)
+
+    def list(self) -> List[Dict[str, Any]]:
+        self._load()
+        return list(self._index)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        self._load()
+        return next((m for m in self._index if m["id"] == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests on demand: those sending `X-Profile: <PROFILE_SECRET>`
+    (optionally `X-Profile-Mode: cprofile`) and a random PROFILE_SAMPLE_RATE share of the
+    rest. One request is profiled at a time; the response carries `X-Profile-Id` and the
+    result is listed at GET /api/admin/profiles. Only installed when a trigger is configured;
+    unprofiled requests pay one header scan.
+    """
+
+    def __init__(self, app, secret: Optional[str] = PROFILE_SECRET, sample_rate: float = PROFILE_SAMPLE_RATE, store: ProfileStore = profile_store):
+        self.app = app
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.store = store
+        self._busy = False
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.secret:
+            value = _header(scope, b"x-profile")
+            if value is not None and hmac.compare_digest(value, self.secret):
+                return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" and not self._busy else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        self._busy = True
+        try:
+            await self._profile(scope, receive, send, trigger)
+        finally:
+            self._busy = False
+
+    async def _profile(self, scope, receive, send, trigger: str) -> None:
+        profile_id = uuid.uuid4().hex
+        mode = _header(scope, b"x-profile-mode") if trigger == "header" else None
+        mode = mode if mode in MODES else "sample"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = profiler = None
+        if mode == "cprofile":
+            # deterministic, CPU only, and includes whatever else the loop ran meanwhile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler()
+            sampler.start()
+        started = time.perf_counter()
+        try:
+            call = self.app(scope, receive, send_wrapper)
+            await (sampler.track(call) if sampler is not None else call)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            await self._save(profile_id, scope, status, elapsed, mode, trigger, sampler, profiler)
+
+    async def _save(self, profile_id, scope, status, elapsed, mode, trigger, sampler, profiler) -> None:
+        meta = {
+            "id": profile_id,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 2),
+            "mode": mode,
+            "trigger": trigger,
+        }
+        if sampler is not None:
+            meta["samples"] = sampler.samples
+            files = {"folded": sampler.folded(), "txt": sampler.summary()}
+        else:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+            files = {"prof": profiler, "txt": out.getvalue()}
+        try:
+            await self.store.add(meta, files)
+        except Exception:
+            logger.exception("failed to store profile %s", profile_id)
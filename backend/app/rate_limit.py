@@ -0,0 +1,400 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from fastapi import HTTPException, Request, Response
+
+logger = logging.getLogger(__name__)
+
+# memory | sqlite | redis
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", os.path.join(os.getcwd(), "rate_limits.db"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/0")
+# seconds a request may spend on the shared store (including waiting for the connection)
+# before the limiter gives up and lets it through
+RATE_LIMIT_BACKEND_TIMEOUT = float(os.getenv("RATE_LIMIT_BACKEND_TIMEOUT", "0.5"))
+# upper bound on keys tracked by the memory backend; least recently seen keys go first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# key clients by the first X-Forwarded-For hop (only behind a trusted proxy)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0").lower() in ("1", "true", "yes")
+
+CHECK, HIT, RECORD = "check", "hit", "record"
+_SWEEP_EVERY = 1000
+
+
+def _roll(state_window: int, cur: int, prev: int, window_index: int) -> Tuple[int, int]:
+    # move a (cur, prev) pair forward to window_index
+    if state_window == window_index:
+        return cur, prev
+    if state_window == window_index - 1:
+        return 0, cur
+    return 0, 0
+
+
+class MemoryBackend:
+    """
+    Per-process counters: three integers per key in an LRU-ordered dict. Keys idle for
+    more than one window carry no state and are swept; `max_keys` bounds the total.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._state: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._ops = 0
+        self.evicted = 0
+
+    async def apply(self, key: str, window_index: int, weight: float, limit: int, mode: str, window: float) -> Tuple[int, int, bool]:
+        state = self._state.get(key)
+        cur, prev = _roll(state[0], state[1], state[2], window_index) if state else (0, 0)
+        estimate = prev * weight + cur
+        counted = mode == RECORD or (mode == HIT and estimate + 1 <= limit)
+        if counted or state is not None:
+            self._state[key] = [window_index, cur + counted, prev]
+            self._state.move_to_end(key)
+        self._ops += 1
+        if self._ops % _SWEEP_EVERY == 0 or len(self._state) > self.max_keys:
+            self._sweep(window_index)
+        return cur, prev, counted
+
+    def _sweep(self, window_index: int) -> None:
+        # front of the dict is least recently used, so idle keys are found first
+        while self._state:
+            key, state = next(iter(self._state.items()))
+            if state[0] < window_index - 1 or len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+                self.evicted += 1
+            else:
+                break
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "keys": len(self._state), "max_keys": self.max_keys, "evicted": self.evicted}
+
+
+class SQLiteBackend:
+    """
+    Counters in a SQLite file shared by all workers on one host. Each request is one
+    `BEGIN IMMEDIATE` transaction run in a worker thread, so the check-and-count is atomic
+    across processes without blocking the event loop.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._ops = 0
+        self.evicted = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, win INTEGER NOT NULL, cur INTEGER NOT NULL, prev INTEGER NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _apply_sync(self, key: str, window_index: int, weight: float, limit: int, mode: str) -> Tuple[int, int, bool]:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT win, cur, prev FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                cur, prev = _roll(row[0], row[1], row[2], window_index) if row else (0, 0)
+                estimate = prev * weight + cur
+                counted = mode == RECORD or (mode == HIT and estimate + 1 <= limit)
+                if counted:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rate_limits (key, win, cur, prev) VALUES (?, ?, ?, ?)",
+                        (key, window_index, cur + 1, prev),
+                    )
+                self._ops += 1
+                if self._ops % _SWEEP_EVERY == 0:
+                    self.evicted += conn.execute("DELETE FROM rate_limits WHERE win < ?", (window_index - 1,)).rowcount
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return cur, prev, counted
+
+    async def apply(self, key: str, window_index: int, weight: float, limit: int, mode: str, window: float) -> Tuple[int, int, bool]:
+        return await asyncio.to_thread(self._apply_sync, key, window_index, weight, limit, mode)
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, "evicted": self.evicted}
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """
+    Counters in any server speaking the Redis protocol (Redis, Valkey, KeyDB, ...), shared by
+    every worker and host. One key per (client, window) with INCR + EXPIRE, so idle keys
+    expire on their own. Talks RESP over a single pipelined connection; no client library needed.
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, timeout: float = RATE_LIMIT_BACKEND_TIMEOUT):
+        parsed = urlparse(url)
+        self.timeout = timeout
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._roundtrip([("AUTH", self.password)])
+        if self.db:
+            await self._roundtrip([("SELECT", self.db)])
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    async def _read_reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = await self._reader.readexactly(size + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            return [await self._read_reply() for _ in range(int(rest))]
+        raise RedisError(f"unexpected reply: {line!r}")
+
+    async def _roundtrip(self, commands) -> list:
+        self._writer.write(b"".join(self._encode(c) for c in commands))
+        await self._writer.drain()
+        return [await self._read_reply() for _ in commands]
+
+    async def execute(self, *commands) -> list:
+        """
+        Send `commands` as one pipeline and return their replies; reconnects once on a dropped
+        connection. The whole call, queueing for the connection included, is bounded by
+        `timeout`, so a stalled server raises TimeoutError instead of hanging every caller.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return await asyncio.wait_for(self._execute(commands), self.timeout)
+
+    async def _execute(self, commands) -> list:
+        async with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._roundtrip(commands)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    await self._drop()
+                    if attempt == 2:
+                        raise
+                except BaseException:
+                    # timed out, cancelled or an error reply mid-pipeline: replies may still be
+                    # unread on the socket, so the connection must not be reused
+                    await self._drop()
+                    raise
+
+    async def _drop(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def apply(self, key: str, window_index: int, weight: float, limit: int, mode: str, window: float) -> Tuple[int, int, bool]:
+        cur_key, prev_key = f"rl:{key}:{window_index}", f"rl:{key}:{window_index - 1}"
+        ttl = max(1, math.ceil(window * 2))
+        if mode == CHECK:
+            cur, prev = await self.execute(("GET", cur_key), ("GET", prev_key))
+            return int(cur or 0), int(prev or 0), False
+        cur, _, prev = await self.execute(("INCR", cur_key), ("EXPIRE", cur_key, ttl), ("GET", prev_key))
+        cur, prev = cur - 1, int(prev or 0)
+        if mode == HIT and prev * weight + cur + 1 > limit:
+            # over the limit: take the optimistic increment back
+            await self.execute(("DECR", cur_key))
+            return cur, prev, False
+        return cur, prev, True
+
+    async def close(self) -> None:
+        await self._drop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "host": self.host, "port": self.port, "db": self.db, "timeout_seconds": self.timeout}
+
+
+class RateLimitResult:
+    __slots__ = ("allowed", "limit", "remaining", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"X-RateLimit-Limit": str(self.limit), "X-RateLimit-Remaining": str(self.remaining)}
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimiter:
+    """
+    Sliding-window-counter limiter: at most `limit` requests per `window` seconds per key,
+    estimated from the current and previous fixed windows (the previous one weighted by
+    how much of it still overlaps the sliding window). Constant memory per key.
+    Backend errors fail open: a broken shared store must not take the API down.
+    """
+
+    def __init__(self, limit: int, window: float, backend=None, name: str = "default"):
+        self.limit = limit
+        self.window = window
+        self.name = name
+        self._backend = backend
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+        _limiters.append(self)
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    async def _apply(self, key: str, mode: str) -> RateLimitResult:
+        now = time.time()
+        window_index = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        weight = 1.0 - elapsed
+        try:
+            cur, prev, counted = await self.backend.apply(f"{self.name}:{key}", window_index, weight, self.limit, mode, self.window)
+        except Exception:
+            self.errors += 1
+            logger.exception("rate limit backend failed; allowing request")
+            return RateLimitResult(True, self.limit, self.limit, 0)
+        estimate = prev * weight + cur
+        allowed = mode == RECORD or estimate + 1 <= self.limit
+        remaining = max(0, int(self.limit - estimate - counted))
+        retry_after = 0.0 if allowed else self._retry_after(cur, prev, elapsed)
+        return RateLimitResult(allowed, self.limit, remaining, retry_after)
+
+    def _retry_after(self, cur: int, prev: int, elapsed: float) -> float:
+        # seconds until the previous window's weighted share has decayed enough for one more request
+        if prev > 0 and cur + 1 <= self.limit:
+            needed = 1.0 - (self.limit - 1 - cur) / prev
+            return max(0.0, (needed - elapsed) * self.window)
+        return (1.0 - elapsed) * self.window
+
+    async def hit(self, key: str) -> RateLimitResult:
+        """Count one request for `key` if it is within the limit; the result says whether it was."""
+        result = await self._apply(key, HIT)
+        if result.allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return result
+
+    async def check(self, key: str) -> RateLimitResult:
+        """Whether one more request would be allowed, without counting it."""
+        return await self._apply(key, CHECK)
+
+    async def record(self, key: str) -> None:
+        """Count a request that was already admitted (e.g. a stream accounted when it ends)."""
+        await self._apply(key, RECORD)
+        self.allowed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "window_seconds": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "backend_errors": self.errors,
+        }
+
+
+_limiters: List[RateLimiter] = []
+_backend = None
+
+
+def get_backend():
+    """Process-wide backend selected by RATE_LIMIT_BACKEND, created on first use."""
+    global _backend
+    if _backend is None:
+        if RATE_LIMIT_BACKEND == "sqlite":
+            _backend = SQLiteBackend()
+        elif RATE_LIMIT_BACKEND == "redis":
+            _backend = RedisBackend()
+        else:
+            _backend = MemoryBackend()
+    return _backend
+
+
+async def shutdown() -> None:
+    if _backend is not None:
+        await _backend.close()
+
+
+def client_key(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "-"
+
+
+def rate_limit(limit: int, window: float, name: str, key_func: Callable[[Request], str] = client_key):
+    """
+    FastAPI dependency factory: `Depends(rate_limit(30, 60, "ai"))` on any route.
+    Over-limit requests get 429 with Retry-After; allowed ones carry X-RateLimit-* headers.
+    """
+    limiter = RateLimiter(limit, window, name=name)
+
+    async def dependency(request: Request, response: Response) -> None:
+        result = await limiter.hit(key_func(request))
+        if not result.allowed:
+            raise HTTPException(status_code=429, detail="rate limit exceeded", headers=result.headers())
+        for header, value in result.headers().items():
+            response.headers[header] = value
+
+    dependency.limiter = limiter
+    return dependency
+
+
+def stats() -> Dict[str, Any]:
+    return {"backend": get_backend().stats(), "limiters": [l.stats() for l in _limiters]}
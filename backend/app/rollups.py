@@ -0,0 +1,220 @@
+import asyncio
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, delete, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+_tag_hourly = models.TagHourlyStats.__table__
+_shop_daily = models.ShopDailyStats.__table__
+_shop_totals = models.ShopTotals.__table__
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _as_datetime(value) -> datetime:
+    # SQLite returns bucket expressions as text, PostgreSQL as datetime/date
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+async def _increment(db: AsyncSession, table, key_cols: Tuple[str, ...], rows: List[Dict]) -> None:
+    """
+    Add the counter columns of `rows` onto existing rows of `table` (matched by `key_cols`),
+    inserting missing ones. Rows must be unique per key within one call.
+    """
+    if not rows:
+        return
+    counter_cols = [c for c in rows[0] if c not in key_cols and c != "shop_id"]
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        for i in range(0, len(rows), 200):
+            stmt = dialect_insert(table).values(rows[i:i + 200])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key_cols),
+                set_={c: table.c[c] + stmt.excluded[c] for c in counter_cols},
+            )
+            await db.execute(stmt)
+        return
+    # portable fallback: update, then insert what did not exist
+    for row in rows:
+        where = [table.c[k] == row[k] for k in key_cols]
+        res = await db.execute(
+            table.update().where(*where).values({c: table.c[c] + row[c] for c in counter_cols})
+        )
+        if not res.rowcount:
+            await db.execute(table.insert().values(row))
+
+
+async def record_visits(db: AsyncSession, visits: Iterable[Dict]) -> None:
+    """
+    Fold a batch of visit rows (tag_id, created_at) into the hourly tag and daily shop counters.
+    Runs inside the caller's transaction so counters commit atomically with the visits.
+    """
+    visits = list(visits)
+    if not visits:
+        return
+    tag_ids = {v["tag_id"] for v in visits}
+    res = await db.execute(select(models.NFCTag.id, models.NFCTag.shop_id).where(models.NFCTag.id.in_(tag_ids)))
+    shop_of = {r[0]: r[1] for r in res.fetchall()}
+
+    per_tag_hour: Counter = Counter()
+    per_shop_day: Counter = Counter()
+    per_shop: Counter = Counter()
+    for v in visits:
+        ts = v.get("created_at") or datetime.utcnow()
+        shop_id = shop_of.get(v["tag_id"])
+        per_tag_hour[(v["tag_id"], _hour(ts), shop_id)] += 1
+        if shop_id:
+            per_shop_day[(shop_id, ts.date())] += 1
+            per_shop[shop_id] += 1
+
+    await _increment(
+        db, _tag_hourly, ("tag_id", "hour"),
+        [{"tag_id": t, "hour": h, "shop_id": s, "visits": n} for (t, h, s), n in per_tag_hour.items() if t in shop_of],
+    )
+    await _increment(
+        db, _shop_daily, ("shop_id", "day"),
+        [{"shop_id": s, "day": d, "visits": n, "contents": 0} for (s, d), n in per_shop_day.items()],
+    )
+    await _increment(
+        db, _shop_totals, ("shop_id",),
+        [{"shop_id": s, "visits": n, "contents": 0} for s, n in per_shop.items()],
+    )
+
+
+async def record_content(db: AsyncSession, shop_id: Optional[str], created_at: Optional[datetime] = None, count: int = 1) -> None:
+    if not shop_id:
+        return
+    day = (created_at or datetime.utcnow()).date()
+    await _increment(db, _shop_daily, ("shop_id", "day"), [{"shop_id": shop_id, "day": day, "visits": 0, "contents": count}])
+    await _increment(db, _shop_totals, ("shop_id",), [{"shop_id": shop_id, "visits": 0, "contents": count}])
+
+
+async def add_shops(db: AsyncSession, shop_ids: Iterable[str]) -> None:
+    """
+    Create the zeroed shop_totals rows of newly created shops, in the caller's transaction
+    and after the shops themselves. Every shop needs one: the visits/reviews shop pages
+    are read from shop_totals alone.
+    """
+    await _increment(db, _shop_totals, ("shop_id",), [{"shop_id": s, "visits": 0, "contents": 0} for s in shop_ids])
+
+
+async def shop_totals(db: AsyncSession, shop_id: str) -> Dict[str, int]:
+    res = await db.execute(select(_shop_totals.c.visits, _shop_totals.c.contents).where(_shop_totals.c.shop_id == shop_id))
+    row = res.first()
+    return {"visits": int(row[0]), "contents": int(row[1])} if row else {"visits": 0, "contents": 0}
+
+
+async def shop_day(db: AsyncSession, shop_id: str, day: date) -> Dict[str, int]:
+    res = await db.execute(
+        select(_shop_daily.c.visits, _shop_daily.c.contents).where(_shop_daily.c.shop_id == shop_id, _shop_daily.c.day == day)
+    )
+    row = res.first()
+    return {"visits": int(row[0]), "contents": int(row[1])} if row else {"visits": 0, "contents": 0}
+
+
+def _bucket_exprs(dialect: str):
+    if dialect == "postgresql":
+        return (
+            lambda col: func.date_trunc("hour", col),
+            lambda col: func.date_trunc("day", col),
+        )
+    return (
+        lambda col: func.strftime("%Y-%m-%d %H:00:00", col),
+        lambda col: func.date(col),
+    )
+
+
+async def backfill(db: AsyncSession, chunk_size: int = 5000) -> Dict[str, int]:
+    """
+    Rebuild the rollup tables from raw `visits` and `content_items`.
+    Aggregation happens in SQL; only the (far smaller) grouped rows travel to Python.
+    Run while the visit buffer is quiet: increments committed during the rebuild are overwritten.
+    """
+    hour_of, day_of = _bucket_exprs(db.bind.dialect.name)
+    V, T, C = models.Visit, models.NFCTag, models.ContentItem
+
+    await db.execute(delete(_tag_hourly))
+    await db.execute(delete(_shop_daily))
+    await db.execute(delete(_shop_totals))
+    # one row per shop, including shops without any activity
+    await db.execute(
+        _shop_totals.insert().from_select(
+            ["shop_id", "visits", "contents"],
+            select(models.Shop.id, literal(0), literal(0)),
+        )
+    )
+
+    hour_bucket = hour_of(V.created_at)
+    tag_rows = await db.stream(
+        select(V.tag_id, hour_bucket, T.shop_id, func.count())
+        .join(T, T.id == V.tag_id)
+        .group_by(V.tag_id, hour_bucket, T.shop_id)
+    )
+    tag_hours = 0
+    per_shop_day: Counter = Counter()
+    batch: List[Dict] = []
+    async for tag_id, bucket, shop_id, n in tag_rows:
+        hour = _as_datetime(bucket)
+        batch.append({"tag_id": tag_id, "hour": hour, "shop_id": shop_id, "visits": n})
+        if shop_id:
+            per_shop_day[(shop_id, hour.date())] += n
+        if len(batch) >= chunk_size:
+            await _increment(db, _tag_hourly, ("tag_id", "hour"), batch)
+            tag_hours += len(batch)
+            batch = []
+    await _increment(db, _tag_hourly, ("tag_id", "hour"), batch)
+    tag_hours += len(batch)
+
+    day_bucket = day_of(C.created_at)
+    content_rows = await db.execute(
+        select(C.shop_id, day_bucket, func.count())
+        .where(C.shop_id.isnot(None), C.status.is_distinct_from(models.CONTENT_DRAFT))
+        .group_by(C.shop_id, day_bucket)
+    )
+    per_shop_contents: Counter = Counter()
+    for shop_id, bucket, n in content_rows.fetchall():
+        per_shop_contents[(shop_id, _as_datetime(bucket).date())] += n
+
+    keys = set(per_shop_day) | set(per_shop_contents)
+    day_rows = [{"shop_id": s, "day": d, "visits": per_shop_day.get((s, d), 0), "contents": per_shop_contents.get((s, d), 0)} for s, d in keys]
+    for i in range(0, len(day_rows), chunk_size):
+        await _increment(db, _shop_daily, ("shop_id", "day"), day_rows[i:i + chunk_size])
+
+    per_shop: Dict[str, Dict] = {}
+    for row in day_rows:
+        total = per_shop.setdefault(row["shop_id"], {"shop_id": row["shop_id"], "visits": 0, "contents": 0})
+        total["visits"] += row["visits"]
+        total["contents"] += row["contents"]
+    total_rows = list(per_shop.values())
+    for i in range(0, len(total_rows), chunk_size):
+        await _increment(db, _shop_totals, ("shop_id",), total_rows[i:i + chunk_size])
+
+    await db.commit()
+    return {"tag_hours": tag_hours, "shop_days": len(day_rows)}
+
+
+async def main():
+    from .db import engine, async_session, Base
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[_tag_hourly, _shop_daily, _shop_totals])
+    async with async_session() as db:
+        result = await backfill(db)
+    print(f"Rollups rebuilt: {result['tag_hours']} tag-hour rows, {result['shop_days']} shop-day rows.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 
 class Token(BaseModel):
@@ -22,12 +22,31 @@ class BatchEncodeResponse(BaseModel):
     count: int
 
 
+class MerchantBulkRequest(BaseModel):
+    count: int
+
+
 class MerchantCredential(BaseModel):
     email: str
     password: str
+    username: Optional[str] = None
+    shop_id: Optional[str] = None
 
 class MerchantCreateResponse(BaseModel):
     credentials: List[MerchantCredential]
     count: int
 
 
+class AIBatchItem(BaseModel):
+    shop_id: str
+    template_id: Optional[str] = None
+    context: Optional[Dict[str, Any]] = None
+    messages: Optional[List[Dict[str, Any]]] = None
+
+
+class AIBatchRequest(BaseModel):
+    items: List[AIBatchItem]
+    model: Optional[str] = "deepseek-chat"
+    temperature: Optional[float] = 0.0
+    parallelism: Optional[int] = None
+    cache: Optional[bool] = True
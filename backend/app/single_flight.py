@@ -0,0 +1,71 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution: the first caller
+    starts `fn()` as a task, later callers with that key await the same task, and all of
+    them get its result or its exception. The key is forgotten as soon as the call
+    finishes, so a failure is never replayed to later requests.
+    A waiter that is cancelled only stops waiting; the shared call is cancelled once the
+    last waiter is gone.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self.executions += 1
+            call.task.add_done_callback(lambda t, k=key, c=call: self._finished(k, c, t))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            # shield: cancelling one waiter must not cancel the call the others share
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self.abandoned += 1
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finished(self, key: str, call: _Call, task: "asyncio.Future[Any]") -> None:
+        self._forget(key, call)
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            # requests answered by another request's upstream call
+            "saved_upstream_calls": self.coalesced,
+            "failures": self.failures,
+            "abandoned": self.abandoned,
+        }
+
+
+# process-wide flight group for /ai/generate upstream calls
+upstream_flight = SingleFlight()
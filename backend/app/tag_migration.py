@@ -0,0 +1,114 @@
+import json
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .token_cache import token_cache
+
+FRONTEND_TAG_URI_BASE = os.getenv("FRONTEND_TAG_URI_BASE", "https://nfcfront3.vercel.app/t/")
+TAG_MIGRATION_CHUNK_SIZE = int(os.getenv("TAG_MIGRATION_CHUNK_SIZE", "5000"))
+CHECKPOINT_NAME = "tag_uris"
+
+# set-based rewrite of ndef_payload.uri inside the database, per dialect
+_SET_URI_SQL = {
+    "sqlite": (
+        "UPDATE nfc_tags SET ndef_payload = json_set("
+        "CASE WHEN NOT json_valid(ndef_payload) THEN '{}' "
+        "WHEN json_type(ndef_payload) = 'object' THEN ndef_payload ELSE '{}' END, '$.uri', :base || token) "
+        "WHERE id > :lo"
+    ),
+    "postgresql": (
+        "UPDATE nfc_tags SET ndef_payload = jsonb_set("
+        "CASE WHEN json_typeof(ndef_payload::json) = 'object' THEN ndef_payload::jsonb ELSE '{}'::jsonb END, "
+        "'{uri}', to_jsonb(CAST(:base AS text) || token))::json "
+        "WHERE id > :lo"
+    ),
+}
+
+ProgressCallback = Callable[[int, Optional[int]], Awaitable[None]]
+
+
+async def _checkpoint(db: AsyncSession, name: str) -> models.MigrationCheckpoint:
+    cp = await db.get(models.MigrationCheckpoint, name)
+    if cp is None:
+        cp = models.MigrationCheckpoint(name=name, last_id="", processed=0, completed=0)
+        db.add(cp)
+        await db.flush()
+    return cp
+
+
+async def _update_chunk_python(db: AsyncSession, base: str, lo: str, hi: Optional[str]) -> int:
+    # fallback for dialects without JSON functions: decode/encode in Python, one executemany per chunk
+    T = models.NFCTag
+    q = select(T.id, T.token, T.ndef_payload).where(T.id > lo)
+    if hi is not None:
+        q = q.where(T.id <= hi)
+    rows = (await db.execute(q)).fetchall()
+    params = []
+    for id_, token_, payload in rows:
+        if isinstance(payload, str):
+            try:
+                payload = json.loads(payload)
+            except ValueError:
+                payload = {}
+        p = dict(payload) if isinstance(payload, dict) else {}
+        p["uri"] = f"{base}{token_}"
+        params.append({"b_id": id_, "b_payload": p})
+    if params:
+        table = T.__table__
+        await db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(ndef_payload=bindparam("b_payload")),
+            params,
+        )
+    return len(params)
+
+
+async def migrate_tag_uris(
+    db: AsyncSession,
+    base: str = FRONTEND_TAG_URI_BASE,
+    chunk_size: int = TAG_MIGRATION_CHUNK_SIZE,
+    restart: bool = False,
+    name: str = CHECKPOINT_NAME,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Dict:
+    """
+    Point every tag's ndef_payload.uri at `base` + token.
+    Tags are processed in id order, `chunk_size` at a time, each chunk being one set-based
+    UPDATE committed together with the checkpoint row. A crashed or interrupted run resumes
+    after the last committed id; `restart=True` (or a completed checkpoint) starts over.
+    """
+    cp = await _checkpoint(db, name)
+    if restart or cp.completed:
+        cp.last_id, cp.processed, cp.completed = "", 0, 0
+        await db.commit()
+    resumed_from = cp.processed
+    sql = _SET_URI_SQL.get(db.bind.dialect.name)
+    T = models.NFCTag
+    chunks = 0
+    while True:
+        lo = cp.last_id
+        # upper bound of this chunk: the chunk_size-th id after the checkpoint
+        hi = (await db.execute(select(T.id).where(T.id > lo).order_by(T.id).offset(chunk_size - 1).limit(1))).scalar()
+        if hi is None:
+            hi = (await db.execute(select(T.id).where(T.id > lo).order_by(T.id.desc()).limit(1))).scalar()
+            if hi is None:
+                break
+        if sql is not None:
+            res = await db.execute(text(sql + " AND id <= :hi"), {"base": base, "lo": lo, "hi": hi})
+            done = res.rowcount
+        else:
+            done = await _update_chunk_python(db, base, lo, hi)
+        cp.last_id = hi
+        cp.processed += done
+        await db.commit()
+        chunks += 1
+        if on_progress is not None:
+            await on_progress(cp.processed, None)
+    cp.completed = 1
+    await db.commit()
+    # cached landing responses are derived from tags; drop them once the rewrite is visible
+    token_cache.clear()
+    return {"migrated": cp.processed, "resumed_from": resumed_from, "chunks": chunks}
@@ -0,0 +1,99 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+# TTL of entries resolved on a read replica, which may lag writes the cache was cleared for
+TOKEN_CACHE_REPLICA_TTL = float(os.getenv("TOKEN_CACHE_REPLICA_TTL", "2"))
+
+
+class TokenCache:
+    """
+    Bounded LRU + TTL cache mapping an NFC token to its resolved tag/shop/content.
+    Entries are indexed by shop so content writes can drop every token of that shop.
+    Single-threaded (event loop) use only; no locking.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_shop: Dict[Optional[str], Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        item = self._data.get(token)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, _shop_id, entry = item
+        if expires_at < time.monotonic():
+            self._drop(token)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(token)
+        self.hits += 1
+        return entry
+
+    def set(self, token: str, shop_id: Optional[str], entry: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        if token in self._data:
+            self._drop(token)
+        self._data[token] = (time.monotonic() + (self.ttl if ttl is None else ttl), shop_id, entry)
+        self._by_shop.setdefault(shop_id, set()).add(token)
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def invalidate_token(self, token: str) -> None:
+        if token in self._data:
+            self._drop(token)
+            self.invalidations += 1
+
+    def invalidate_shop(self, shop_id: Optional[str]) -> None:
+        for token in list(self._by_shop.get(shop_id, ())):
+            self._drop(token)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidations += len(self._data)
+        self._data.clear()
+        self._by_shop.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _drop(self, token: str) -> None:
+        item = self._data.pop(token, None)
+        if item is None:
+            return
+        shop_id = item[1]
+        tokens = self._by_shop.get(shop_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_shop[shop_id]
+
+
+# process-wide instance used by /t/{token} and invalidated by crud writes
+token_cache = TokenCache()
@@ -0,0 +1,210 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "20"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "100"))
+# seconds a call may wait for a free slot before it is rejected
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+# consecutive upstream failures that open the breaker
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+# seconds the breaker stays open before a half-open probe is let through
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# "mock": /ai/generate answers with the mock text while the upstream is unavailable; "error": 503
+LLM_BREAKER_FALLBACK = os.getenv("LLM_BREAKER_FALLBACK", "mock").lower()
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling the upstream: breaker open, or no free slot in time."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    # only faults of the upstream itself count; config errors and local rate limits do not
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return False
+
+
+class Bulkhead:
+    """
+    At most `max_concurrent` calls run at once; up to `max_queue` more wait at most
+    `queue_timeout` seconds for a slot. Everything beyond that is rejected immediately.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE, queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected_full += 1
+            raise UpstreamUnavailable("bulkhead_full")
+        self.queued += 1
+        # wait on a task we own: on Python < 3.12 wait_for(acquire()) can lose an acquire that
+        # completes just as the timeout or a cancellation hits, leaking the permit for good
+        waiter = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except BaseException as exc:
+            waiter.cancel()
+            waiter.add_done_callback(self._return_unused)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                raise UpstreamUnavailable("bulkhead_timeout")
+            raise
+        finally:
+            self.queued -= 1
+        self.active += 1
+
+    def _return_unused(self, waiter: asyncio.Future) -> None:
+        # a permit granted to a caller that already gave up goes straight back
+        if not waiter.cancelled() and waiter.exception() is None:
+            self._semaphore.release()
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queued": self.queued,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and then fails fast for
+    `reset_timeout` seconds. After that one probe call is let through (half-open): success
+    closes the breaker, failure opens it again for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_THRESHOLD, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.short_circuited = 0
+
+    def before_call(self) -> bool:
+        """Admit a call or raise UpstreamUnavailable; returns True when the call is the half-open probe."""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.short_circuited += 1
+                raise UpstreamUnavailable("circuit_open", retry_after=remaining)
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.short_circuited += 1
+                raise UpstreamUnavailable("circuit_half_open", retry_after=1.0)
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        # a probe that ended without a verdict (cancelled, local error) lets the next call probe
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "times_opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class UpstreamGuard:
+    """Circuit breaker in front of a bulkhead, wrapped around every LLM upstream call."""
+
+    def __init__(self, bulkhead: Optional[Bulkhead] = None, breaker: Optional[CircuitBreaker] = None, fallback: str = LLM_BREAKER_FALLBACK):
+        self.bulkhead = bulkhead or Bulkhead()
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback = fallback
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a bulkhead slot for the duration of the block and report its outcome to the
+        breaker. Used directly for streamed calls, whose slot lives as long as the stream.
+        """
+        probe = self.breaker.before_call()
+        try:
+            await self.bulkhead.acquire()
+        except UpstreamUnavailable:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        try:
+            yield
+        except Exception as exc:
+            if is_upstream_failure(exc):
+                self.breaker.record_failure()
+            elif probe:
+                self.breaker.release_probe()
+            raise
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self.bulkhead.release()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        async with self.slot():
+            return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"breaker": self.breaker.stats(), "bulkhead": self.bulkhead.stats(), "fallback": self.fallback}
+
+
+# process-wide guard for the Silra upstream
+llm_guard = UpstreamGuard()
@@ -0,0 +1,52 @@
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .batch_writer import BatchWriter
+from .db import async_session
+from . import crud
+
+VISIT_BUFFER_MAX = int(os.getenv("VISIT_BUFFER_MAX", "50000"))
+VISIT_BATCH_SIZE = int(os.getenv("VISIT_BATCH_SIZE", "500"))
+VISIT_FLUSH_INTERVAL = float(os.getenv("VISIT_FLUSH_INTERVAL", "1.0"))
+
+
+class VisitBuffer(BatchWriter):
+    """
+    Write-behind buffer for tap visits.
+    `enqueue` never blocks the request: when the buffer is full the visit is dropped and counted.
+    A background task drains it into multi-row inserts once `batch_size` rows are pending or
+    `flush_interval` seconds have passed, and drains everything left on `stop()`.
+    """
+
+    label = "visit buffer"
+    item_name = "visits"
+
+    def __init__(
+        self,
+        session_factory=None,
+        max_size: int = VISIT_BUFFER_MAX,
+        batch_size: int = VISIT_BATCH_SIZE,
+        flush_interval: float = VISIT_FLUSH_INTERVAL,
+    ):
+        super().__init__(max_size, batch_size, flush_interval)
+        self.session_factory = session_factory or async_session
+
+    def enqueue(self, tag_id: str, user_agent: Optional[str] = None, referer: Optional[str] = None) -> bool:
+        row = {
+            "id": str(uuid.uuid4()),
+            "tag_id": tag_id,
+            "user_agent": user_agent,
+            "referer": referer,
+            "created_at": datetime.utcnow(),
+        }
+        return self._put(row)
+
+    async def _sink(self, batch: List[Dict[str, Any]]) -> None:
+        async with self.session_factory() as db:
+            await crud.create_visits_bulk(db, batch)
+
+
+# process-wide buffer fed by /t/{token}; started and drained by the app lifespan
+visit_buffer = VisitBuffer()
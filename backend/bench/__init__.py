@@ -0,0 +1,5 @@
+# benchmark tooling: datagen (seeded bulk loader), mock_upstream (LLM stand-in), runner (load driver)
+
+# credentials of the admin user every generated dataset contains; the runner logs in with them
+BENCH_ADMIN_EMAIL = "bench-admin@bench.local"
+BENCH_ADMIN_PASSWORD = "bench-password"
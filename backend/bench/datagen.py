@@ -0,0 +1,219 @@
+"""
+Seeded bulk loader for benchmark databases.
+
+    python -m backend.bench.datagen --database-url sqlite+aiosqlite:///./bench.db \
+        --shops 2000 --tags-per-shop 1000 --visits 20000000 --seed 42
+
+The same seed and sizes always produce the same rows. Tags are named `bench000000001`, ...,
+visits are skewed towards a minority of hot tags, and the rollup tables are rebuilt at the
+end so dashboards read realistic counters. Rows are generated and written chunk by chunk
+(COPY on asyncpg), so memory stays flat at tens of millions of visits.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from . import BENCH_ADMIN_EMAIL, BENCH_ADMIN_PASSWORD
+from ..app import models, rollups
+from ..app.auth import get_password_hash
+from ..app.db import Base, make_engine
+from ..app.minting import tag_uri
+
+CHUNK_SIZE = 10000
+# share of visits that land on the hottest 10% of tags
+HOT_SHARE = 0.8
+
+_STATUSES = (models.TagStatus.unused, models.TagStatus.encoded, models.TagStatus.active)
+_USER_AGENTS = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 Chrome/124.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 13; SM-S918B) AppleWebKit/537.36 Chrome/123.0 Mobile Safari/537.36",
+)
+
+
+def bench_token(n: int) -> str:
+    return f"bench{n:09d}"
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _write(db: AsyncSession, table, rows: List[Dict[str, Any]]) -> None:
+    if db.bind.dialect.name == "postgresql" and db.bind.dialect.driver == "asyncpg":
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        columns = list(rows[0])
+        records = [
+            tuple(json.dumps(v) if isinstance(v, dict) else v.value if isinstance(v, models.TagStatus) else v for v in (r[c] for c in columns))
+            for r in rows
+        ]
+        await raw.driver_connection.copy_records_to_table(table.name, columns=columns, records=records)
+        return
+    await db.execute(insert(table), rows)
+
+
+class Generator:
+    def __init__(self, shops: int, tags_per_shop: int, visits: int, contents_per_shop: int, days: int, seed: int):
+        self.shops = shops
+        self.tags_per_shop = tags_per_shop
+        self.visits = visits
+        self.contents_per_shop = contents_per_shop
+        self.days = days
+        self.seed = seed
+        self.now = datetime(2026, 1, 1)
+        rng = random.Random(seed)
+        self.shop_ids = [_uuid(rng) for _ in range(shops)]
+        self.total_tags = shops * tags_per_shop
+
+    def _rng(self, stream: str) -> random.Random:
+        # one independent, reproducible stream per table
+        return random.Random(f"{self.seed}:{stream}")
+
+    def _when(self, rng: random.Random) -> datetime:
+        return self.now - timedelta(seconds=rng.random() * self.days * 86400)
+
+    def tag_id(self, n: int) -> str:
+        return str(uuid.UUID(int=(self.seed << 64) | n, version=4))
+
+    def shop_rows(self) -> Iterator[Dict[str, Any]]:
+        for i, shop_id in enumerate(self.shop_ids):
+            yield {"id": shop_id, "name": f"Bench Shop {i + 1:05d}", "description": None}
+
+    def tag_rows(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("tags")
+        for n in range(self.total_tags):
+            token = bench_token(n + 1)
+            yield {
+                "id": self.tag_id(n),
+                "shop_id": self.shop_ids[n // self.tags_per_shop],
+                "token": token,
+                "ndef_payload": {"uri": tag_uri(token)},
+                "status": rng.choices(_STATUSES, weights=(2, 3, 5))[0],
+            }
+
+    def content_rows(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("contents")
+        for shop_id in self.shop_ids:
+            for j in range(self.contents_per_shop):
+                yield {
+                    "id": _uuid(rng),
+                    "shop_id": shop_id,
+                    "title": f"Bench review {j + 1}",
+                    "body": "好评！" * rng.randint(5, 60),
+                    "created_by": "bench",
+                    "status": models.CONTENT_PUBLISHED,
+                    "created_at": self._when(rng),
+                }
+
+    def visit_rows(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("visits")
+        hot = max(1, self.total_tags // 10)
+        for _ in range(self.visits):
+            if rng.random() < HOT_SHARE or hot == self.total_tags:
+                n = rng.randrange(hot)
+            else:
+                n = rng.randrange(hot, self.total_tags)
+            yield {
+                "id": _uuid(rng),
+                "tag_id": self.tag_id(n),
+                "user_agent": rng.choice(_USER_AGENTS),
+                "referer": None,
+                "created_at": self._when(rng),
+            }
+
+
+async def generate(
+    database_url: str,
+    shops: int = 100,
+    tags_per_shop: int = 100,
+    visits: int = 100000,
+    contents_per_shop: int = 5,
+    days: int = 90,
+    seed: int = 42,
+    chunk_size: int = CHUNK_SIZE,
+    log=None,
+) -> Dict[str, Any]:
+    """Create the schema if needed and load one seeded dataset; returns row counts and timings."""
+    engine = make_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    gen = Generator(shops, tags_per_shop, visits, contents_per_shop, days, seed)
+    report: Dict[str, Any] = {"seed": seed, "database": engine.url.render_as_string(hide_password=True), "tables": {}}
+    try:
+        async with session_factory() as db:
+            admin = {
+                "id": str(uuid.UUID(int=seed, version=4)),
+                "email": BENCH_ADMIN_EMAIL,
+                "hashed_password": get_password_hash(BENCH_ADMIN_PASSWORD),
+                "is_admin": 1,
+                "is_active": 1,
+                "shop_id": None,
+            }
+            await _write(db, models.User.__table__, [admin])
+            for name, table, rows in (
+                ("shops", models.Shop.__table__, gen.shop_rows()),
+                ("nfc_tags", models.NFCTag.__table__, gen.tag_rows()),
+                ("content_items", models.ContentItem.__table__, gen.content_rows()),
+                ("visits", models.Visit.__table__, gen.visit_rows()),
+            ):
+                started, count = time.perf_counter(), 0
+                for chunk in _chunks(rows, chunk_size):
+                    await _write(db, table, chunk)
+                    await db.commit()
+                    count += len(chunk)
+                    if log:
+                        log(f"{name}: {count}")
+                elapsed = time.perf_counter() - started
+                report["tables"][name] = {"rows": count, "seconds": round(elapsed, 2), "rows_per_second": round(count / elapsed) if elapsed else None}
+            started = time.perf_counter()
+            report["rollups"] = await rollups.backfill(db)
+            await db.commit()
+            report["rollups_seconds"] = round(time.perf_counter() - started, 2)
+    finally:
+        await engine.dispose()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--shops", type=int, default=100)
+    parser.add_argument("--tags-per-shop", type=int, default=100)
+    parser.add_argument("--visits", type=int, default=100000)
+    parser.add_argument("--contents-per-shop", type=int, default=5)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    report = asyncio.run(generate(
+        args.database_url, args.shops, args.tags_per_shop, args.visits, args.contents_per_shop,
+        args.days, args.seed, args.chunk_size, log=lambda msg: print(msg, file=sys.stderr),
+    ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+OpenAI-compatible stand-in for the LLM upstream, so `/ai/generate` can be benchmarked
+without network calls or API costs.
+
+    python -m backend.bench.mock_upstream --port 8901 --latency 0.2
+
+Point the app at it with SILRA_API_URL=http://127.0.0.1:8901/v1/chat/completions and any
+non-empty SILRA_API_KEY.
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Optional
+
+import uvicorn
+
+
+class MockUpstream:
+    """Minimal ASGI app answering chat completions after `latency` (+/- `jitter`) seconds."""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            model = json.loads(body or b"{}").get("model") or "mock"
+        except ValueError:
+            model = "mock"
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        payload = json.dumps({
+            "id": f"mock-{self.calls}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "这是基准测试的模拟文案。"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 12, "total_tokens": 32},
+        }, ensure_ascii=False).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+
+
+class MockUpstreamServer:
+    """Runs MockUpstream with uvicorn inside the current event loop."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8901, latency: float = 0.2, jitter: float = 0.05):
+        self.app = MockUpstream(latency, jitter)
+        self.config = uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(self.config)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.config.host}:{self.config.port}/v1/chat/completions"
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+
+    async def stop(self) -> None:
+        self.server.should_exit = True
+        if self._task is not None:
+            await self._task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    args = parser.parse_args()
+    uvicorn.run(MockUpstream(args.latency, args.jitter), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Closed-loop benchmark runner for the tap, content, AI and dashboard endpoints.
+
+In-process (ASGI, no network; the app is imported against --database-url):
+
+    python -m backend.bench.runner --database-url sqlite+aiosqlite:///./bench.db \
+        --concurrency 1,10,50 --duration 10 --output bench.json
+
+Over HTTP against a running server (start it with SILRA_API_URL pointing at the mock
+upstream the runner starts, and rate limits raised as in BENCH_ENV):
+
+    python -m backend.bench.runner --base-url http://localhost:8000 --concurrency 10,50
+
+Each (scenario, concurrency) level runs `concurrency` workers back to back for `duration`
+seconds and reports throughput and p50/p95/p99 latency. The JSON report carries the git
+commit, so runs can be compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+# nothing from backend.app may be imported here: in-process runs configure it through the environment
+from . import BENCH_ADMIN_EMAIL, BENCH_ADMIN_PASSWORD
+from .mock_upstream import MockUpstreamServer
+
+# environment applied before the app is imported in-process; use the same for an HTTP target
+BENCH_ENV = {
+    "SILRA_API_KEY": "bench",
+    "RATE_LIMIT_MAX": "100000000",
+    "LLM_MAX_CONCURRENCY": "1000",
+    "LLM_MAX_QUEUE": "10000",
+}
+
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+class Context:
+    """Data the scenarios draw from: an admin bearer token, shop ids and tag tokens."""
+
+    def __init__(self, rng: random.Random, auth: Dict[str, str], shop_ids: List[str], tokens: List[str], batch_encode_count: int):
+        self.rng = rng
+        self.auth = auth
+        self.shop_ids = shop_ids
+        self.tokens = tokens
+        self.batch_encode_count = batch_encode_count
+
+    def token(self) -> str:
+        return self.rng.choice(self.tokens)
+
+    def shop(self) -> str:
+        return self.rng.choice(self.shop_ids)
+
+
+SCENARIOS: Dict[str, Callable[[Context], Request]] = {
+    "t_token": lambda c: ("GET", f"/t/{c.token()}", {}),
+    "content": lambda c: ("POST", "/content", {"json": {"token": c.token(), "title": "bench", "body": "基准测试评价内容"}}),
+    "ai_generate": lambda c: ("POST", "/ai/generate", {"json": {
+        "model": "bench-model",
+        "messages": [{"role": "user", "content": f"bench prompt {c.rng.randrange(1 << 30)}"}],
+        "cache": False,
+    }}),
+    "shops": lambda c: ("GET", "/api/shops", {"headers": c.auth}),
+    "merchant": lambda c: ("GET", f"/api/merchant/{c.shop()}", {"headers": c.auth}),
+    "batch_encode": lambda c: ("POST", f"/api/shops/{c.shop()}/tags/batch_encode", {"headers": c.auth, "json": {"count": c.batch_encode_count}}),
+}
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> Optional[float]:
+    # nearest-rank percentile of an ascending list
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(scenario: str, concurrency: int, elapsed: float, latencies: List[float], statuses: Counter) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    ok = sum(n for s, n in statuses.items() if isinstance(s, int) and s < 400)
+
+    def ms(v: Optional[float]) -> Optional[float]:
+        return round(v * 1000, 3) if v is not None else None
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "status_counts": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+    }
+
+
+async def run_level(client: httpx.AsyncClient, scenario: str, ctx: Context, concurrency: int, duration: float, max_requests: Optional[int] = None) -> Dict[str, Any]:
+    build = SCENARIOS[scenario]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline and (max_requests is None or len(latencies) < max_requests):
+            method, url, kwargs = build(ctx)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, **kwargs)
+                await resp.aread()
+                status: Any = resp.status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(scenario, concurrency, time.perf_counter() - started, latencies, statuses)
+
+
+async def prepare(client: httpx.AsyncClient, rng: random.Random, token_sample: int, batch_encode_count: int) -> Context:
+    r = await client.post("/api/auth/token", json={"email": BENCH_ADMIN_EMAIL, "password": BENCH_ADMIN_PASSWORD})
+    r.raise_for_status()
+    auth = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    r = await client.get("/api/shops/page", params={"limit": 500}, headers=auth)
+    r.raise_for_status()
+    shop_ids = [s["id"] for s in r.json()["items"]]
+    if not shop_ids:
+        raise SystemExit("no shops found; load data with backend.bench.datagen first")
+    tokens: List[str] = []
+    for shop_id in rng.sample(shop_ids, min(len(shop_ids), 20)):
+        r = await client.get(f"/api/shops/{shop_id}/tags/export", params={"format": "txt"}, headers=auth)
+        r.raise_for_status()
+        tokens.extend(r.text.split())
+        if len(tokens) >= token_sample:
+            break
+    if not tokens:
+        raise SystemExit("no tags found; load data with backend.bench.datagen first")
+    return Context(rng, auth, shop_ids, rng.sample(tokens, min(len(tokens), token_sample)), batch_encode_count)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5, cwd=os.path.dirname(__file__))
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    rng = random.Random(args.seed)
+
+    mock = None
+    if "ai_generate" in scenarios and not args.no_mock_upstream:
+        mock = MockUpstreamServer(port=args.mock_port, latency=args.mock_latency)
+        await mock.start()
+
+    results: List[Dict[str, Any]] = []
+    try:
+        if args.base_url:
+            limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+            async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+                results = await _run_levels(client, scenarios, levels, rng, args)
+        else:
+            os.environ["DATABASE_URL"] = args.database_url
+            if mock is not None:
+                os.environ["SILRA_API_URL"] = mock.url
+            for key, value in BENCH_ENV.items():
+                os.environ.setdefault(key, value)
+            # imported late so the environment above configures it
+            from ..app.main import app
+
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=args.timeout) as client:
+                    results = await _run_levels(client, scenarios, levels, rng, args)
+    finally:
+        if mock is not None:
+            await mock.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "mode": "http" if args.base_url else "inprocess",
+            "target": args.base_url or args.database_url,
+            "seed": args.seed,
+            "duration_s": args.duration,
+            "python": platform.python_version(),
+            "upstream_latency_s": args.mock_latency if mock is not None else None,
+        },
+        "results": results,
+    }
+
+
+async def _run_levels(client, scenarios, levels, rng, args) -> List[Dict[str, Any]]:
+    ctx = await prepare(client, rng, args.token_sample, args.batch_encode_count)
+    results = []
+    for scenario in scenarios:
+        for concurrency in levels:
+            if args.warmup > 0:
+                await run_level(client, scenario, ctx, concurrency, args.warmup)
+            result = await run_level(client, scenario, ctx, concurrency, args.duration, args.max_requests)
+            print(f"{scenario:>13} c={concurrency:<4} {result['rps']} req/s  p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}", file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--database-url", help="run in-process against this database")
+    target.add_argument("--base-url", help="run over HTTP against a running server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds per level, not reported")
+    parser.add_argument("--max-requests", type=int, default=None, help="stop a level early after this many requests")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--token-sample", type=int, default=5000)
+    parser.add_argument("--batch-encode-count", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--mock-port", type=int, default=8901)
+    parser.add_argument("--mock-latency", type=float, default=0.2)
+    parser.add_argument("--no-mock-upstream", action="store_true")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+-- Draft/published state of content items; batch AI generation stores drafts
+-- PostgreSQL only (SQLite has no ADD COLUMN IF NOT EXISTS): on SQLite run `python migrate_db.py`
+ALTER TABLE content_items ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'published';
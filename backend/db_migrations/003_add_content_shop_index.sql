@@ -0,0 +1,2 @@
+-- Newest published content per shop; /t/{token} looks it up on every uncached tap
+CREATE INDEX IF NOT EXISTS ix_content_items_shop_created ON content_items (shop_id, created_at, id);
@@ -0,0 +1,2 @@
+-- Keyset pagination of /api/shops/page sorted by name
+CREATE INDEX IF NOT EXISTS ix_shops_name ON shops (name, id);
@@ -0,0 +1,6 @@
+-- Every shop has a shop_totals row; /api/shops/page sorts by visits/reviews from it
+-- (run `python -m app.rollups` first if shop_totals does not exist yet, then again to fill in the counts)
+INSERT INTO shop_totals (shop_id, visits, contents)
+SELECT id, 0, 0 FROM shops WHERE id NOT IN (SELECT shop_id FROM shop_totals);
+CREATE INDEX IF NOT EXISTS ix_shop_totals_visits ON shop_totals (visits DESC, shop_id DESC);
+CREATE INDEX IF NOT EXISTS ix_shop_totals_contents ON shop_totals (contents DESC, shop_id DESC);
@@ -1,20 +1,56 @@
 #!/usr/bin/env python3
 import asyncio
 from sqlalchemy import text
-from app.db import engine
+from app.db import engine, Base
+from app import models
+
+
+async def add_column(conn, table: str, column: str, ddl: str) -> bool:
+    """Add `table.column` (type and default in `ddl`) unless it already exists; True if added."""
+    if conn.dialect.name == "sqlite":
+        # SQLite has no ADD COLUMN IF NOT EXISTS
+        res = await conn.execute(text(f"PRAGMA table_info({table})"))
+        if column in {row[1] for row in res.fetchall()}:
+            return False
+        await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        return True
+    await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}"))
+    return True
+
 
 async def migrate():
     async with engine.begin() as conn:
         # Add shop_id column if it doesn't exist
-        await conn.execute(text('ALTER TABLE users ADD COLUMN IF NOT EXISTS shop_id VARCHAR(255);'))
+        await add_column(conn, "users", "shop_id", "VARCHAR(255)")
         print("Added shop_id column")
 
         # Add is_admin column if it doesn't exist
-        await conn.execute(text('ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin INTEGER DEFAULT 0;'))
+        await add_column(conn, "users", "is_admin", "INTEGER DEFAULT 0")
         print("Added is_admin column")
 
-        await conn.commit()
-        print('Migration completed successfully!')
+        # Draft/published state of content items (generated copy is stored as draft)
+        await add_column(conn, "content_items", "status", "VARCHAR(20) DEFAULT 'published'")
+        print("Added content_items.status column")
+
+        # Newest content per shop, looked up by /t/{token}
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_content_items_shop_created ON content_items (shop_id, created_at, id);"))
+        print("Added ix_content_items_shop_created index")
+
+        # Keyset pagination of /api/shops/page by name
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_shops_name ON shops (name, id);"))
+        print("Added ix_shops_name index")
+
+        # Every shop has a shop_totals row; /api/shops/page sorts by visits/reviews from it
+        await conn.run_sync(Base.metadata.create_all, tables=[models.ShopTotals.__table__])
+        await conn.execute(text(
+            "INSERT INTO shop_totals (shop_id, visits, contents) "
+            "SELECT id, 0, 0 FROM shops WHERE id NOT IN (SELECT shop_id FROM shop_totals);"
+        ))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_shop_totals_visits ON shop_totals (visits DESC, shop_id DESC);"))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_shop_totals_contents ON shop_totals (contents DESC, shop_id DESC);"))
+        print("Added shop_totals rows for every shop and the visits/contents indexes")
+
+    print('Migration completed successfully!')
 
 if __name__ == "__main__":
     asyncio.run(migrate())
@@ -28,6 +28,8 @@ if (Test-Path $req) {
 
 Write-Host "Initializing DB..."
 python -m app.init_db
+# adds columns introduced since dev.db was created (idempotent)
+python migrate_db.py
 
 Write-Host "Starting uvicorn..."
 python -m uvicorn app.main:app --reload --host 0.0.0.0 --port $env:PORT
@@ -13,6 +13,8 @@ export SILRA_API_KEY="${SILRA_API_KEY:-}"
 export SECRET_KEY="${SECRET_KEY:-dev-secret}"
 
 python -m app.init_db
+# adds columns introduced since dev.db was created (idempotent)
+python migrate_db.py
 exec uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
 
 
@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from backend.app.db import Base
+from backend.app.llm_cache import llm_cache
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    # isolated SQLite file per test with the full schema created
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_llm_cache():
+    # route tests monkeypatch the upstream; never let one test's cached reply answer another
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
@@ -0,0 +1,57 @@
+import asyncio
+import httpx
+import pytest
+from sqlalchemy import select
+from backend.app import ai_batch, crud, models, rollups
+
+
+@pytest.mark.asyncio
+async def test_drafts_generated_with_bounded_parallelism_and_retries(session_factory, monkeypatch):
+    monkeypatch.setattr(ai_batch, "backoff_delay", lambda attempt, *a, **k: 0)
+    async with session_factory() as db:
+        db.add_all([models.Shop(id=f"s{i}", name=f"Shop {i}") for i in range(6)])
+        db.add(models.NFCTag(id="t0", shop_id="s0", token="tok0"))
+        await db.commit()
+
+    state = {"active": 0, "peak": 0, "calls": 0}
+    flaky = {"s1": 1}
+
+    async def generate(item):
+        state["calls"] += 1
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0.01)
+            if flaky.get(item["shop_id"], 0) > 0:
+                flaky[item["shop_id"]] -= 1
+                raise httpx.ReadTimeout("slow")
+            if item["shop_id"] == "s5":
+                raise ValueError("bad template")
+            return {"model": "m", "choices": [{"message": {"content": f"Copy for {item['shop_id']}\nbody"}}]}
+        finally:
+            state["active"] -= 1
+
+    items = [{"shop_id": f"s{i}", "template_id": "launch"} for i in range(6)]
+    async with session_factory() as db:
+        result = await ai_batch.generate_drafts(db, items, generate, marker="ai-batch:j1", parallelism=2, write_size=2)
+    assert result["created"] == 5 and result["failed"] == 1
+    assert result["errors"][0]["shop_id"] == "s5"
+    assert state["peak"] == 2 and state["calls"] == 7  # one retry for s1
+
+    async with session_factory() as db:
+        # drafts are neither served nor counted
+        assert await crud.get_content_for_tag(db, "t0") is None
+        assert (await rollups.shop_totals(db, "s0"))["contents"] == 0
+
+        # a re-run only retries the failed item
+        again = await ai_batch.generate_drafts(db, items, generate, marker="ai-batch:j1", parallelism=2)
+        assert again["skipped"] == 5 and again["created"] == 0
+
+        res = await db.execute(select(models.ContentItem).where(models.ContentItem.shop_id == "s0"))
+        draft = res.scalars().one()
+        assert draft.status == models.CONTENT_DRAFT and draft.title == "Copy for s0"
+        assert draft.metadata_json["template_id"] == "launch"
+
+        await crud.publish_content(db, draft.id)
+        assert (await crud.get_content_for_tag(db, "t0")).id == draft.id
+        assert (await rollups.shop_totals(db, "s0"))["contents"] == 1
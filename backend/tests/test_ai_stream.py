@@ -0,0 +1,99 @@
+import asyncio
+import json
+import pytest
+from httpx import AsyncClient
+from backend.app import ai_utils, http_client
+from backend.app.audit_log import AuditLog
+from backend.app.rate_limit import MemoryBackend, RateLimiter
+from backend.app.main import app
+
+
+@pytest.mark.asyncio
+async def test_stream_text_relays_chunks_before_upstream_finishes(monkeypatch, tmp_path):
+    release = asyncio.Event()
+
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int([l for l in head.split(b"\r\n") if l.lower().startswith(b"content-length")][0].split(b":")[1])
+        await reader.readexactly(length)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for event in (b'data: {"delta": "a"}\n\n', b'data: {"delta": "b"}\n\n', b"data: [DONE]\n\n"):
+            writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+            await writer.drain()
+            # hold the rest of the stream until the client has seen the first event
+            await release.wait()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(ai_utils, "SILRA_API_URL", f"http://127.0.0.1:{port}/v1/chat/completions")
+    monkeypatch.setattr(ai_utils, "SILRA_API_KEY", "test-key")
+    limiter = RateLimiter(60, 60, backend=MemoryBackend(), name="ai")
+    monkeypatch.setattr(ai_utils, "ai_limiter", limiter)
+    audit = AuditLog(directory=str(tmp_path))
+    monkeypatch.setattr(ai_utils, "audit_log", audit)
+    try:
+        chunks = ai_utils.stream_text(model="deepseek-chat", messages=[{"role": "user", "content": "hi"}], client_ip="1.2.3.4")
+        first = await asyncio.wait_for(chunks.__anext__(), timeout=5)
+        assert first.startswith(b"data:")
+        # the call is only counted against the limiter once the stream ends
+        assert (await limiter.check("1.2.3.4")).remaining == 60
+        release.set()
+        rest = b"".join([c async for c in chunks])
+        assert rest.endswith(b"data: [DONE]\n\n")
+        assert (await limiter.check("1.2.3.4")).remaining == 59
+        await audit.flush_pending()
+        record = json.loads((tmp_path / "ai_calls.jsonl").read_text(encoding="utf-8"))
+        assert record["stream"] is True and record["status"] == "completed" and record["chunks"] == 3
+    finally:
+        await http_client.shutdown()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_text_decodes_compressed_upstream(monkeypatch, tmp_path):
+    import gzip
+
+    body = gzip.compress(b'data: {"delta": "a"}\n\ndata: [DONE]\n\n')
+
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int([l for l in head.split(b"\r\n") if l.lower().startswith(b"content-length")][0].split(b":")[1])
+        await reader.readexactly(length)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nContent-Encoding: gzip\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(ai_utils, "SILRA_API_URL", f"http://127.0.0.1:{port}/v1/chat/completions")
+    monkeypatch.setattr(ai_utils, "SILRA_API_KEY", "test-key")
+    monkeypatch.setattr(ai_utils, "audit_log", AuditLog(directory=str(tmp_path)))
+    try:
+        chunks = ai_utils.stream_text(model="deepseek-chat", messages=[{"role": "user", "content": "hi"}], enforce_limit=False)
+        assert b"".join([c async for c in chunks]) == b'data: {"delta": "a"}\n\ndata: [DONE]\n\n'
+    finally:
+        await http_client.shutdown()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_ai_generate_stream_route(monkeypatch):
+    async def fake_stream_text(model, messages, temperature=0.0, timeout_seconds=None, client_ip=None, enforce_limit=True):
+        if messages[0]["content"] == "limited":
+            raise RuntimeError("rate_limit_exceeded")
+        for part in (b'data: {"delta": "x"}\n\n', b"data: [DONE]\n\n"):
+            yield part
+
+    monkeypatch.setattr(ai_utils, "stream_text", fake_stream_text)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        r = await ac.post("/ai/generate", json={"messages": [{"role": "user", "content": "hi"}], "stream": True})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        assert r.text == 'data: {"delta": "x"}\n\ndata: [DONE]\n\n'
+
+        r = await ac.post("/ai/generate", json={"messages": [{"role": "user", "content": "limited"}], "stream": True})
+        assert r.status_code == 429
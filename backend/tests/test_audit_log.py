@@ -0,0 +1,39 @@
+import json
+import pytest
+from backend.app.audit_log import AuditLog
+
+
+@pytest.mark.asyncio
+async def test_records_are_batched_into_json_lines(tmp_path):
+    log = AuditLog(directory=str(tmp_path), flush_interval=0.01)
+    await log.start()
+    for i in range(5):
+        log.log("ai_calls", model="deepseek-chat", duration_ms=i)
+    log.log("social_publish", platform="wechat")
+    await log.stop()
+
+    lines = (tmp_path / "ai_calls.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(l)["duration_ms"] for l in lines] == [0, 1, 2, 3, 4]
+    assert json.loads((tmp_path / "social_publish.jsonl").read_text(encoding="utf-8"))["platform"] == "wechat"
+    assert log.stats()["written"] == 6
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = AuditLog(directory=str(tmp_path), max_size=2)
+    assert log.log("s", n=1) and log.log("s", n=2)
+    assert not log.log("s", n=3)
+    assert log.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_size_rotation_keeps_backups(tmp_path):
+    log = AuditLog(directory=str(tmp_path), max_bytes=50, backups=2)
+    for batch in range(4):
+        log.log("s", batch=batch, padding="x" * 40)
+        await log.flush_pending()
+    assert json.loads((tmp_path / "s.jsonl").read_text())["batch"] == 3
+    assert json.loads((tmp_path / "s.jsonl.1").read_text())["batch"] == 2
+    assert json.loads((tmp_path / "s.jsonl.2").read_text())["batch"] == 1
+    assert not (tmp_path / "s.jsonl.3").exists()
+    assert log.rotations == 3
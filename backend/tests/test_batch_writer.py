@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from backend.app.batch_writer import BatchWriter
+
+
+class _Recorder(BatchWriter):
+    def __init__(self, **kw):
+        super().__init__(max_size=100, flush_interval=60, **kw)
+        self.batches = []
+
+    async def _sink(self, batch):
+        if "bad" in batch:
+            raise ValueError("sink failed")
+        self.batches.append(list(batch))
+
+
+@pytest.mark.asyncio
+async def test_batches_by_size_and_counts_sink_failures():
+    writer = _Recorder(batch_size=3)
+    await writer.start()
+    for item in ["a", "b", "c", "d", "bad"]:
+        assert writer._put(item)
+    await writer.stop()
+
+    assert writer.batches == [["a", "b", "c"]]
+    stats = writer.stats()
+    assert stats["written"] == 3 and stats["failed"] == 2 and stats["flushes"] == 2 and not stats["running"]
+
+
+def test_restarts_on_a_new_event_loop():
+    writer = _Recorder(batch_size=10)
+
+    async def cycle(item):
+        await writer.start()
+        await asyncio.sleep(0)  # let the worker block on the empty queue
+        writer._put(item)
+        await writer.stop()
+
+    for item in ["first", "second"]:
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(cycle(item))
+        finally:
+            loop.close()
+
+    assert writer.batches == [["first"], ["second"]]
+    assert writer.stats()["failed"] == 0
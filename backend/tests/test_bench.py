@@ -0,0 +1,58 @@
+import asyncio
+import random
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from backend.app import models, rollups
+from backend.bench import datagen, runner
+
+
+@pytest.mark.asyncio
+async def test_datagen_is_seeded_and_fills_rollups(tmp_path):
+    counts = {}
+    for name in ("a", "b"):
+        url = f"sqlite+aiosqlite:///{tmp_path / name}.db"
+        report = await datagen.generate(url, shops=3, tags_per_shop=20, visits=500, contents_per_shop=2, seed=7, chunk_size=64)
+        assert report["tables"]["visits"]["rows"] == 500 and report["tables"]["nfc_tags"]["rows"] == 60
+        engine = create_async_engine(url)
+        async with sessionmaker(engine, class_=AsyncSession)() as db:
+            visit_ids = (await db.execute(select(models.Visit.id).order_by(models.Visit.id))).scalars().all()
+            shop_id = (await db.execute(select(models.Shop.id).limit(1))).scalar()
+            totals = await rollups.shop_totals(db, shop_id)
+            all_visits = (await db.execute(select(func.sum(models.ShopTotals.visits)))).scalar()
+        await engine.dispose()
+        assert totals["contents"] == 2 and all_visits == 500
+        counts[name] = visit_ids
+    assert counts["a"] == counts["b"]
+
+
+def test_percentiles_use_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]
+    assert runner.percentile(values, 50) == 0.05
+    assert runner.percentile(values, 99) == 0.099
+    assert runner.percentile([], 50) is None
+    result = runner.summarize("t_token", 4, 2.0, values, {200: 98, 404: 2})
+    assert result["rps"] == 50.0 and result["errors"] == 2 and result["p95_ms"] == 95.0
+
+
+@pytest.mark.asyncio
+async def test_run_level_drives_fixed_concurrency():
+    app = FastAPI()
+    in_flight = {"now": 0, "peak": 0}
+
+    @app.get("/t/{token}")
+    async def tap(token: str):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.005)
+        in_flight["now"] -= 1
+        return {"token": token}
+
+    ctx = runner.Context(random.Random(1), {}, ["shop"], ["tok-1", "tok-2"], 1)
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        result = await runner.run_level(client, "t_token", ctx, concurrency=4, duration=5, max_requests=40)
+    assert 40 <= result["requests"] < 44 and result["errors"] == 0
+    assert in_flight["peak"] == 4
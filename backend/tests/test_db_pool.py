@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from backend.app.db import make_engine, pool_stats
+
+
+@pytest.mark.asyncio
+async def test_sqlite_file_engine_gets_pragmas_and_pool_gauges(tmp_path):
+    engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0, pool_timeout=0.2)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+            stats = pool_stats(engine)
+            assert stats["pool_class"] == "InstrumentedQueuePool"
+            assert stats["size"] == 1 and stats["checked_out"] == 1
+
+            # the only connection is held: a second checkout waits, then times out
+            with pytest.raises(PoolTimeout):
+                async with engine.connect() as other:
+                    await other.execute(text("SELECT 1"))
+
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 0 and stats["timeouts"] == 1
+        assert stats["connects"] == 1 and stats["wait_ms_max"] >= 150
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_sqlite_keeps_default_pool():
+    engine = make_engine("sqlite+aiosqlite://")
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SELECT 1"))).scalar() == 1
+        assert pool_stats(engine)["checkouts"] == 1
+        assert "checked_out" not in pool_stats(engine)
+    finally:
+        await engine.dispose()
@@ -0,0 +1,31 @@
+import csv
+import io
+import json
+import pytest
+from backend.app import crud, exports, minting
+
+
+async def _collect(chunks):
+    return "".join([c async for c in chunks])
+
+
+@pytest.mark.asyncio
+async def test_tag_and_visit_exports(session_factory):
+    async with session_factory() as db:
+        tokens = await minting.mint_tags(db, "shop-1", 25)
+        tag_ids = {}
+        for row in [r async for batch in exports.iter_tags("shop-1", session_factory=session_factory) for r in batch]:
+            tag_ids[row["token"]] = row["id"]
+        await crud.create_visits_bulk(db, [{"id": f"v{i}", "tag_id": tag_ids[tokens[i]]} for i in range(10)])
+
+    text = await _collect(exports.encode(exports.iter_tags("shop-1", session_factory=session_factory, batch_size=7), "csv", exports.TAG_COLUMNS))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert sorted(r["token"] for r in rows) == sorted(tokens)
+    assert all(r["status"] == "unused" and r["uri"].endswith("/t/" + r["token"]) for r in rows)
+
+    text = await _collect(exports.encode(exports.iter_tags("shop-1", session_factory=session_factory), "txt", exports.TAG_COLUMNS))
+    assert sorted(text.split()) == sorted(tokens)
+
+    text = await _collect(exports.encode(exports.iter_visits("shop-1", session_factory=session_factory, batch_size=3), "ndjson", exports.VISIT_COLUMNS))
+    visits = [json.loads(line) for line in text.splitlines()]
+    assert len(visits) == 10 and {v["token"] for v in visits} == set(tokens[:10])
@@ -0,0 +1,43 @@
+import asyncio
+import json
+import pytest
+from backend.app import ai, http_client
+
+
+async def _mock_upstream(handler_calls):
+    """Minimal keep-alive HTTP/1.1 server answering chat completions with canned JSON."""
+    async def handle(reader, writer):
+        handler_calls["connections"] += 1
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                writer.close()
+                return
+            length = int([l for l in head.split(b"\r\n") if l.lower().startswith(b"content-length")][0].split(b":")[1])
+            body = json.loads(await reader.readexactly(length))
+            handler_calls["requests"] += 1
+            out = json.dumps({"model": body["model"], "choices": [{"message": {"content": "ok"}}]}).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(out), out))
+            await writer.drain()
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+@pytest.mark.asyncio
+async def test_generate_text_reuses_pooled_connection(monkeypatch, tmp_path):
+    calls = {"connections": 0, "requests": 0}
+    server = await _mock_upstream(calls)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(ai, "SILRA_API_URL", f"http://127.0.0.1:{port}/v1/chat/completions")
+    monkeypatch.setattr(ai, "SILRA_API_KEY", "test-key")
+    monkeypatch.chdir(tmp_path)
+    try:
+        for _ in range(3):
+            result = await ai.generate_text(model="deepseek-chat", messages=[{"role": "user", "content": "hi"}])
+            assert result["model"] == "deepseek-chat"
+        stats = http_client.pool_stats()
+        assert calls == {"connections": 1, "requests": 3}
+        assert stats["connections"] == 1 and stats["responses_2xx"] >= 3
+    finally:
+        await http_client.shutdown()
+        server.close()
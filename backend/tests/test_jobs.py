@@ -0,0 +1,171 @@
+import asyncio
+import pytest
+from backend.app import jobs
+
+
+async def _wait_for(runner, job_id, statuses, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await runner.get(job_id)
+        if job.status in statuses:
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"job stuck in {job.status}"
+        await asyncio.sleep(0.02)
+
+
+@jobs.job_handler("test_count")
+async def _count(ctx):
+    n = ctx.params["n"]
+    done = ctx.resume_from
+    while done < n:
+        await asyncio.sleep(ctx.params.get("delay", 0))
+        done += 1
+        await ctx.progress(done, n, force=True)
+    return {"done": done, "attempt": ctx.attempt}
+
+
+@jobs.job_handler("test_fail")
+async def _fail(ctx):
+    raise ValueError("boom")
+
+
+@pytest.mark.asyncio
+async def test_submit_and_poll(session_factory):
+    runner = jobs.JobRunner(session_factory=session_factory, concurrency=1)
+    first = await runner.submit("test_count", {"n": 3})
+    failing = await runner.submit("test_fail")
+    assert first["status"] == "queued"
+
+    job = await _wait_for(runner, first["id"], jobs.FINISHED)
+    assert job.status == "succeeded" and job.result == {"done": 3, "attempt": 1} and job.progress == 3
+    job = await _wait_for(runner, failing["id"], jobs.FINISHED)
+    assert job.status == "failed" and "boom" in job.error
+
+    with pytest.raises(ValueError):
+        await runner.submit("no_such_kind")
+    await runner.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_queued(session_factory):
+    runner = jobs.JobRunner(session_factory=session_factory, concurrency=1)
+    slow = await runner.submit("test_count", {"n": 1000, "delay": 0.01})
+    waiting = await runner.submit("test_count", {"n": 1})
+    await _wait_for(runner, slow["id"], {"running"})
+
+    assert (await runner.cancel(waiting["id"]))["status"] == "cancelled"
+    assert (await runner.cancel(slow["id"]))["status"] == "cancelled"
+    await runner.stop()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_job_resumes_after_restart(session_factory):
+    runner = jobs.JobRunner(session_factory=session_factory)
+    submitted = await runner.submit("test_count", {"n": 30, "delay": 0.01})
+    await _wait_for(runner, submitted["id"], {"running"})
+    await asyncio.sleep(0.1)
+    await runner.stop()
+
+    interrupted = await runner.get(submitted["id"])
+    assert interrupted.status == "queued" and 0 < interrupted.progress < 30
+
+    restarted = jobs.JobRunner(session_factory=session_factory)
+    await restarted.start()
+    job = await _wait_for(restarted, submitted["id"], jobs.FINISHED)
+    assert job.status == "succeeded" and job.result == {"done": 30, "attempt": 2}
+    await restarted.stop()
+
+
+@pytest.mark.asyncio
+async def test_resumed_mint_job_keeps_only_committed_tokens(session_factory, monkeypatch, tmp_path):
+    from sqlalchemy import select
+    from backend.app import job_handlers, minting, models
+
+    monkeypatch.setattr(jobs, "JOB_ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(job_handlers, "async_session", session_factory)
+    chunks = []
+
+    async def mint_in_small_chunks(db, shop_id, count, prefix=None, on_chunk=None, **kw):
+        async def record_then_maybe_crash(tokens):
+            await on_chunk(tokens)
+            chunks.append(tokens)
+            if len(chunks) == 2:
+                # the second chunk is in the artifact but its commit never happens
+                await asyncio.Event().wait()
+        return await minting.mint_tags(db, shop_id, count, prefix=prefix, chunk_size=5, on_chunk=record_then_maybe_crash, **kw)
+
+    monkeypatch.setattr(job_handlers, "mint_tags", mint_in_small_chunks)
+    runner = jobs.JobRunner(session_factory=session_factory)
+    submitted = await runner.submit("mint_tags", {"shop_id": None, "count": 20}, total=20)
+    path = tmp_path / f"{submitted['id']}.txt"
+    deadline = asyncio.get_running_loop().time() + 5
+    while len(chunks) < 2:
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.02)
+    await runner.stop()
+    # a crash can also land before the checkpoint is written: resume from a stale one
+    await runner._update(submitted["id"], progress=0)
+    written = path.read_text().split()
+    assert written == chunks[0] + chunks[1]
+    # and mid-line: the torn token is discarded too
+    with open(path, "a") as f:
+        f.write("torn")
+
+    restarted = jobs.JobRunner(session_factory=session_factory)
+    await restarted.start()
+    job = await _wait_for(restarted, submitted["id"], jobs.FINISHED)
+    await restarted.stop()
+
+    assert job.status == "succeeded" and job.result["count"] == 20
+    tokens = path.read_text().split()
+    assert tokens[:5] == chunks[0] and not set(tokens) & set(chunks[1]) and len(set(tokens)) == 20
+    async with session_factory() as db:
+        stored = (await db.execute(select(models.NFCTag.token))).scalars().all()
+        assert sorted(stored) == sorted(tokens)
+
+@pytest.mark.asyncio
+async def test_resumed_merchant_job_drops_credentials_that_were_never_committed(session_factory, monkeypatch, tmp_path):
+    import csv
+    from sqlalchemy import select
+    from backend.app import crud, job_handlers, models
+
+    monkeypatch.setattr(jobs, "JOB_ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(job_handlers, "async_session", session_factory)
+    monkeypatch.setattr(job_handlers, "MERCHANT_JOB_CHUNK", 3)
+    create, chunks = crud.create_merchant_accounts, []
+
+    async def create_then_maybe_crash(db, count, **kw):
+        created = await create(db, count, **kw)
+        chunks.append(created)
+        if len(chunks) == 2:
+            # the second chunk reaches the artifact but its commit never happens
+            async def never():
+                await asyncio.Event().wait()
+            db.commit = never
+        return created
+
+    monkeypatch.setattr(crud, "create_merchant_accounts", create_then_maybe_crash)
+    runner = jobs.JobRunner(session_factory=session_factory)
+    submitted = await runner.submit("create_merchants", {"count": 7}, total=7)
+    deadline = asyncio.get_running_loop().time() + 5
+    while len(chunks) < 2:
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.02)
+    await runner.stop()
+    path = tmp_path / f"{submitted['id']}.csv"
+    with open(path, newline="") as f:
+        first = [r["email"] for r in csv.DictReader(f)]
+    assert len(first) == 6
+
+    restarted = jobs.JobRunner(session_factory=session_factory)
+    await restarted.start()
+    job = await _wait_for(restarted, submitted["id"], jobs.FINISHED)
+    await restarted.stop()
+
+    assert job.status == "succeeded" and job.result["count"] == 7
+    with open(path, newline="") as f:
+        emails = [r["email"] for r in csv.DictReader(f)]
+    assert emails[:3] == first[:3] and not set(emails) & set(first[3:]) and len(set(emails)) == 7
+    async with session_factory() as db:
+        stored = (await db.execute(select(models.User.email))).scalars().all()
+        assert sorted(stored) == sorted(emails)
@@ -0,0 +1,49 @@
+import pytest
+from httpx import AsyncClient
+from backend.app.main import app
+from backend.app.llm_cache import LLMCache, cache_key, llm_cache
+
+
+def test_cache_key_is_canonical():
+    a = cache_key("m", [{"role": "user", "content": "hi"}], 0)
+    b = cache_key("m", [{"content": "hi", "role": "user"}], 0.0)
+    assert a == b
+    assert a != cache_key("m", [{"role": "user", "content": "hi"}], 0.5)
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = LLMCache(maxsize=1, ttl=60, db_path=str(tmp_path / "llm.db"))
+    await cache.set("k1", {"text": "one"}, 1.5)
+    await cache.set("k2", {"text": "two"}, 1.0)  # pushes k1 out of memory
+    assert await cache.get("k1") == {"text": "one"}
+    stats = cache.stats()
+    assert stats["hits_disk"] == 1 and stats["saved_upstream_seconds"] == 1.5
+    assert cache.cacheable(0.7) is False and cache.stats()["bypassed"] == 0
+    cache.record_bypass()
+    assert cache.stats()["bypassed"] == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_ai_generate_served_from_cache(monkeypatch):
+    calls = {"n": 0}
+
+    async def fake_generate_text(model, messages, stream=False, temperature=0.0):
+        calls["n"] += 1
+        return {"id": f"resp-{calls['n']}", "model": model}
+
+    monkeypatch.setattr("backend.app.ai.generate_text", fake_generate_text)
+    body = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "hi"}]}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.post("/ai/generate", json=body)
+        second = await ac.post("/ai/generate", json=body)
+        assert first.json() == second.json()
+        assert calls["n"] == 1
+
+        await ac.post("/ai/generate", json={**body, "cache": False})
+        await ac.post("/ai/generate", json=body, headers={"Cache-Control": "no-cache"})
+        await ac.post("/ai/generate", json={**body, "temperature": 0.8})
+        assert calls["n"] == 4
+    assert llm_cache.stats()["hits_memory"] == 1
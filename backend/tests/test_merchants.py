@@ -0,0 +1,17 @@
+import pytest
+from sqlalchemy import func, select
+from backend.app import auth, crud, models
+
+
+@pytest.mark.asyncio
+async def test_bulk_provisioning_creates_linked_shops_and_users(session_factory):
+    async with session_factory() as db:
+        created = await crud.create_merchant_accounts(db, 30, chunk_size=7)
+        assert len(created) == 30 and len({c["email"] for c in created}) == 30
+        assert (await db.execute(select(func.count()).select_from(models.Shop))).scalar() == 30
+        assert (await db.execute(select(func.count()).select_from(models.User))).scalar() == 30
+
+        sample = created[11]
+        user = await crud.get_user_by_email(db, sample["email"])
+        assert user.shop_id == sample["shop_id"] and user.is_admin == 0 and user.is_active == 1
+        assert auth.verify_password(sample["password"], user.hashed_password)
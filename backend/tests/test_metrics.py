@@ -0,0 +1,71 @@
+import pytest
+from httpx import AsyncClient
+from backend.app import metrics
+from backend.app.db import get_read_db
+from backend.app.main import app
+
+
+def _sample(text, prefix):
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value, "/x")
+    text = "\n".join(h.render())
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/x",le="1"} 3' in text
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 4' in text
+    assert _sample(text, 'demo_seconds_count{route="/x"}') == 4
+
+
+@pytest.mark.asyncio
+async def test_routes_queries_and_upstream_calls_are_exported(session_factory, monkeypatch):
+    async def read_db():
+        async with session_factory() as session:
+            yield session
+
+    async def fake_generate_text(model, messages, stream=False, temperature=0.0, client_ip=None):
+        return {"choices": [{"message": {"content": "ok"}}], "model": model}
+
+    monkeypatch.setattr("backend.app.ai.generate_text", fake_generate_text)
+    app.dependency_overrides[get_read_db] = read_db
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            before = (await ac.get("/metrics")).text
+            for token in ("metrics-a", "metrics-b"):
+                assert (await ac.get(f"/t/{token}")).status_code == 404
+            r = await ac.post("/ai/generate", json={"model": "metrics-model", "messages": [{"role": "user", "content": "hi"}], "cache": False})
+            assert r.status_code == 200
+            r = await ac.get("/metrics")
+    finally:
+        app.dependency_overrides.pop(get_read_db, None)
+
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    key = 'http_requests_total{method="GET",route="/t/{token}",status="404"}'
+    assert _sample(r.text, key) - (_sample(before, key) or 0) == 2
+    queries = 'db_queries_per_request_sum{route="/t/{token}"}'
+    assert _sample(r.text, queries) - (_sample(before, queries) or 0) >= 2
+    assert _sample(r.text, 'llm_upstream_duration_seconds_count{model="metrics-model",status="ok"}') == 1
+    assert 'db_query_duration_seconds_bucket{operation="SELECT"' in r.text
+
+
+def test_failed_statements_leave_no_timing_state():
+    from sqlalchemy import create_engine, exc
+
+    metrics.instrument_sqlalchemy()
+    engine = create_engine("sqlite://")
+    # observations = bucket counts + overflow; the last slot is the sum
+    count = lambda: sum(metrics.db_latency._series.get(("SELECT",), [0])[:-1])
+    with engine.connect() as conn:
+        before = count()
+        for _ in range(3):
+            with pytest.raises(exc.OperationalError):
+                conn.exec_driver_sql("SELECT * FROM missing_table")
+        conn.exec_driver_sql("SELECT 1")
+        assert count() - before == 1
+        assert not conn.info.get("query_start")
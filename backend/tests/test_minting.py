@@ -0,0 +1,50 @@
+import itertools
+import pytest
+from sqlalchemy import select, func
+from backend.app import models, minting
+
+
+@pytest.mark.asyncio
+async def test_mint_tags_in_chunks(session_factory):
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    async with session_factory() as db:
+        tokens = await minting.mint_tags(db, "shop-1", 2500, prefix="px-", chunk_size=1000, on_progress=on_progress)
+        res = await db.execute(select(func.count()).select_from(models.NFCTag).where(models.NFCTag.shop_id == "shop-1"))
+        assert res.scalar() == 2500
+    assert len(set(tokens)) == 2500 and all(t.startswith("px-") for t in tokens)
+    assert progress == [(1000, 2500), (2000, 2500), (2500, 2500)]
+
+
+@pytest.mark.asyncio
+async def test_existing_tokens_are_skipped(session_factory, monkeypatch):
+    async with session_factory() as db:
+        db.add(models.NFCTag(id="existing", token="dup", ndef_payload={}))
+        await db.commit()
+
+        counter = itertools.count()
+        monkeypatch.setattr(minting, "new_token", lambda prefix=None: "dup" if next(counter) == 0 else f"tok{next(counter)}")
+        tokens = await minting.mint_tags(db, None, 3)
+    assert "dup" not in tokens and len(tokens) == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_mint_leaves_no_tags(session_factory, monkeypatch):
+    write_chunk = minting._write_chunk
+    calls = itertools.count()
+
+    async def fail_on_second_chunk(db, rows):
+        if next(calls) == 1:
+            raise OSError("connection lost")
+        await write_chunk(db, rows)
+
+    monkeypatch.setattr(minting, "_write_chunk", fail_on_second_chunk)
+    async with session_factory() as db:
+        with pytest.raises(OSError):
+            await minting.mint_tags(db, "shop-1", 30, chunk_size=10)
+    async with session_factory() as db:
+        res = await db.execute(select(func.count()).select_from(models.NFCTag))
+        assert res.scalar() == 0
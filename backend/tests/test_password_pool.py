@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import time
+import pytest
+from passlib.context import CryptContext
+from backend.app import auth
+from backend.app.password_pool import PasswordPool
+
+
+@pytest.mark.asyncio
+async def test_hashing_runs_off_the_event_loop_with_a_concurrency_cap(monkeypatch):
+    pool = PasswordPool(workers=2)
+    monkeypatch.setattr(auth, "password_pool", pool)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.001)
+            ticks += 1
+
+    def slow_hash(password):
+        time.sleep(0.05)  # stands in for pbkdf2 holding a worker
+        return password[::-1]
+
+    t = asyncio.create_task(ticker())
+    results = await asyncio.gather(*[pool.run(slow_hash, f"pw{i}") for i in range(4)])
+    t.cancel()
+    assert results == ["0wp", "1wp", "2wp", "3wp"]
+    stats = pool.stats()
+    assert stats["completed"] == 4 and stats["queue_ms_max"] >= 40  # two of four had to wait
+    assert ticks > 20  # the loop kept running while hashes were computed
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_login_verification_upgrades_outdated_hashes(monkeypatch):
+    old = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=1000).hash("secret")
+    ok, new_hash = await auth.verify_and_update_async("secret", old)
+    assert ok and new_hash and auth.pwd_context.verify("secret", new_hash)
+
+    current = auth.get_password_hash("secret")
+    assert await auth.verify_and_update_async("secret", current) == (True, None)
+    assert (await auth.verify_and_update_async("wrong", current))[0] is False
+
+
+def test_legacy_sha256_only_for_unrecognised_hashes(monkeypatch):
+    legacy = hashlib.sha256(b"password123").hexdigest()
+    ok, new_hash = auth.verify_and_update("password123", legacy)
+    assert ok and auth.pwd_context.identify(new_hash) == "pbkdf2_sha256"
+
+    calls = []
+    monkeypatch.setattr(auth, "_legacy_sha256", lambda *a: calls.append(a) or False)
+    auth.verify_password("password123", auth.get_password_hash("password123"))
+    assert calls == []
+
+
+def test_pool_is_usable_from_successive_event_loops():
+    pool = PasswordPool(workers=1)
+
+    async def contended():
+        return await asyncio.gather(*[pool.run(str.upper, f"pw{i}") for i in range(3)])
+
+    for _ in range(2):
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(contended()) == ["PW0", "PW1", "PW2"]
+        finally:
+            loop.close()
+    pool.shutdown()
+    assert pool._semaphore is None
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+from backend.app import auth, crud
+from backend.app.principal_cache import PrincipalCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PrincipalCache(maxsize=100, ttl=60)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_repeated_calls_skip_jwt_decode_and_user_query(session_factory, cache, monkeypatch):
+    lookups = []
+    real_lookup = crud.get_user_by_email
+
+    async def counting_lookup(db, email):
+        lookups.append(email)
+        return await real_lookup(db, email)
+
+    monkeypatch.setattr(crud, "get_user_by_email", counting_lookup)
+    async with session_factory() as db:
+        await crud.create_user(db, "m@example.com", "pw", shop_id=None, is_admin=0)
+        token = auth.create_access_token({"sub": "m@example.com"})
+        for _ in range(3):
+            principal = await auth.get_current_user(token, db)
+        assert principal.email == "m@example.com" and principal.is_admin == 0
+    assert lookups == ["m@example.com"]
+    assert cache.stats()["jwt_memo_hits"] == 2 and cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_role_change_and_deactivation_invalidate(session_factory, cache):
+    async with session_factory() as db:
+        user = await crud.create_user(db, "m@example.com", "pw")
+        token = auth.create_access_token({"sub": "m@example.com"})
+        assert (await auth.get_current_user(token, db)).is_admin == 0
+
+        user.is_admin = 1
+        await db.commit()
+        assert (await auth.get_current_user(token, db)).is_admin == 1
+
+        user.is_active = 0
+        await db.commit()
+        with pytest.raises(HTTPException) as exc:
+            await auth.get_current_user(token, db)
+        assert exc.value.status_code == 401
+    assert cache.invalidations == 2
+
+
+@pytest.mark.asyncio
+async def test_invalid_tokens_are_not_memoized(session_factory, cache):
+    async with session_factory() as db:
+        with pytest.raises(HTTPException):
+            await auth.get_current_user("not-a-jwt", db)
+    assert cache.stats()["verified_tokens"] == 0
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from backend.app.profiling import ProfileStore, ProfilingMiddleware
+
+
+def _app(store):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, secret="let-me-profile", sample_rate=0, store=store)
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"total": sum(i * i for i in range(20000))}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_only_requests_with_the_secret_header_are_profiled(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=1)
+    async with AsyncClient(app=_app(store), base_url="http://test") as ac:
+        r = await ac.get("/slow")
+        assert r.status_code == 200 and "x-profile-id" not in r.headers
+        r = await ac.get("/slow", headers={"X-Profile": "wrong"})
+        assert "x-profile-id" not in r.headers and store.list() == []
+
+        r = await ac.get("/slow", headers={"X-Profile": "let-me-profile"})
+        profile_id = r.headers["x-profile-id"]
+        meta = store.get(profile_id)
+        assert meta["path"] == "/slow" and meta["status"] == 200 and meta["mode"] == "sample"
+        assert meta["samples"] > 0
+        with open(store.path(profile_id, "folded"), encoding="utf-8") as f:
+            folded = f.read()
+        # the 50 ms the handler spends suspended shows up as awaiting in `slow`
+        assert any(line.startswith("await;") and "slow (test_profiling.py" in line for line in folded.splitlines())
+
+        r = await ac.get("/slow", headers={"X-Profile": "let-me-profile", "X-Profile-Mode": "cprofile"})
+        second = r.headers["x-profile-id"]
+    assert [m["id"] for m in store.list()] == [second]
+    assert store.get(second)["files"] == ["prof", "txt"]
+    assert os.path.exists(store.path(second, "prof"))
+    assert not os.path.exists(store.path(profile_id, "folded"))
+
+
+@pytest.mark.asyncio
+async def test_index_is_rebuilt_from_disk_after_a_restart(tmp_path):
+    before = ProfileStore(str(tmp_path), keep=5)
+    for n in range(3):
+        await before.add({"id": f"p{n}", "created_at": f"2026-01-0{n + 1}T00:00:00Z"}, {"txt": "x"})
+
+    after = ProfileStore(str(tmp_path), keep=2)
+    assert [m["id"] for m in after.list()] == ["p2", "p1"]
+    assert after.get("p2")["files"] == ["txt"]
+    # beyond `keep`, leftovers of the previous process are deleted
+    assert not os.path.exists(after.path("p0", "txt")) and not os.path.exists(after.path("p0", "json"))
+
+
+@pytest.mark.asyncio
+async def test_sampler_separates_running_from_suspended_time():
+    from backend.app.profiling import StackSampler
+
+    async def work():
+        await asyncio.sleep(0.05)
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return "done"
+
+    sampler = StackSampler(interval=0.002)
+    sampler.start()
+    try:
+        assert await sampler.track(work()) == "done"
+    finally:
+        sampler.stop()
+    kinds = {stack.split(";", 1)[0] for stack in sampler.stacks}
+    assert kinds == {"cpu", "await"}
+    assert any(stack.startswith("cpu;") and "work (test_profiling.py" in stack for stack in sampler.stacks)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient
+from backend.app import rate_limit
+from backend.app.rate_limit import MemoryBackend, RateLimiter, RedisBackend, SQLiteBackend
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_limits_and_reports_retry_after():
+    limiter = RateLimiter(3, 60, backend=MemoryBackend(), name="t")
+    results = [await limiter.hit("ip") for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[2].remaining == 0 and results[3].retry_after > 0
+    assert (await limiter.hit("other-ip")).allowed
+    # check never counts
+    assert (await limiter.check("fresh")).remaining == 3
+    assert (await limiter.check("fresh")).remaining == 3
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_is_bounded():
+    backend = MemoryBackend(max_keys=100)
+    limiter = RateLimiter(5, 60, backend=backend, name="t")
+    for i in range(1000):
+        await limiter.hit(f"ip-{i}")
+    assert backend.stats()["keys"] <= 100
+    assert backend.evicted >= 900
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "rl.db")
+    # two backend instances stand in for two worker processes
+    worker_a = RateLimiter(2, 60, backend=SQLiteBackend(path), name="t")
+    worker_b = RateLimiter(2, 60, backend=SQLiteBackend(path), name="t")
+    assert (await worker_a.hit("ip")).allowed
+    assert (await worker_b.hit("ip")).allowed
+    assert not (await worker_a.hit("ip")).allowed
+    await worker_a.backend.close()
+    await worker_b.backend.close()
+
+
+async def _redis_stand_in():
+    """Tiny RESP server with the commands the backend uses."""
+    data = {}
+
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                writer.close()
+                return
+            args = []
+            for _ in range(int(line[1:-2])):
+                size = int((await reader.readline())[1:-2])
+                args.append((await reader.readexactly(size + 2))[:-2].decode())
+            cmd = args[0].upper()
+            if cmd in ("INCR", "DECR"):
+                data[args[1]] = int(data.get(args[1], 0)) + (1 if cmd == "INCR" else -1)
+                writer.write(b":%d\r\n" % data[args[1]])
+            elif cmd == "GET":
+                value = data.get(args[1])
+                writer.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(str(value)), str(value).encode()))
+            elif cmd == "EXPIRE":
+                writer.write(b":1\r\n")
+            else:
+                writer.write(b"-ERR unknown command\r\n")
+            await writer.drain()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0), data
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_against_local_stand_in():
+    server, data = await _redis_stand_in()
+    port = server.sockets[0].getsockname()[1]
+    backend = RedisBackend(f"redis://127.0.0.1:{port}/0")
+    limiter = RateLimiter(2, 60, backend=backend, name="t")
+    try:
+        assert [(await limiter.hit("ip")).allowed for _ in range(3)] == [True, True, False]
+        # the rejected request's optimistic increment was taken back
+        assert sorted(data.values()) == [2]
+    finally:
+        await backend.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_stalled_redis_fails_open_and_drops_the_connection():
+    async def never_reply(reader, writer):
+        await reader.read()
+
+    server = await asyncio.start_server(never_reply, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.1)
+    limiter = RateLimiter(1, 60, backend=backend, name="t")
+    try:
+        started = time.monotonic()
+        results = await asyncio.gather(*[limiter.hit(f"ip{i}") for i in range(3)])
+        assert all(r.allowed for r in results) and limiter.errors == 3
+        assert time.monotonic() - started < 1
+        # the timed-out pipeline's replies were never read; the connection is not reused
+        assert backend._writer is None
+    finally:
+        await backend.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_backend_failure_fails_open():
+    limiter = RateLimiter(1, 60, backend=RedisBackend("redis://127.0.0.1:1/0"), name="t")
+    assert (await limiter.hit("ip")).allowed and limiter.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_dependency_returns_429_with_headers(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_backend", MemoryBackend())
+    app = FastAPI()
+
+    @app.get("/ping", dependencies=[Depends(rate_limit.rate_limit(2, 60, name="ping"))])
+    async def ping():
+        return {"ok": True}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.get("/ping")
+        assert first.headers["x-ratelimit-remaining"] == "1"
+        await ac.get("/ping")
+        third = await ac.get("/ping")
+    assert third.status_code == 429 and int(third.headers["retry-after"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_ai_generate_is_limited_before_cache_hits(monkeypatch):
+    from backend.app import main
+
+    async def fake_generate_text(model, messages, stream=False, temperature=0.0):
+        return {"id": "resp", "model": model}
+
+    monkeypatch.setattr("backend.app.ai.generate_text", fake_generate_text)
+    monkeypatch.setattr(rate_limit, "_backend", MemoryBackend())
+    monkeypatch.setattr(main.ai_rate_limit.limiter, "limit", 2)
+    body = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "hi"}]}
+
+    async with AsyncClient(app=main.app, base_url="http://test") as ac:
+        statuses = [(await ac.post("/ai/generate", json=body)).status_code for _ in range(3)]
+    # the second call is a cache hit and still counts; the third is rejected
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,98 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from backend.app import crud, main, minting
+from backend.app.db import Base, ReadRouter, get_read_db
+
+
+async def _factory(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replica_and_fall_back_when_unreachable(tmp_path):
+    primary_engine, primary = await _factory(tmp_path / "primary.db")
+    replica_engine, replica = await _factory(tmp_path / "replica.db")
+    async with replica() as db:
+        token = (await minting.mint_tags(db, "shop-1", 1))[0]
+    try:
+        router = ReadRouter(primary, replica)
+        async with router.session() as db:
+            assert db.info.get("replica") is True
+            assert await crud.get_tag_by_token(db, token) is not None
+
+        dead_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+        router = ReadRouter(primary, sessionmaker(dead_engine, class_=AsyncSession), retry_seconds=60)
+        for _ in range(2):
+            async with router.session() as db:
+                assert not db.info.get("replica")
+        assert router.stats()["fallbacks"] == 1 and router.stats()["primary_sessions"] == 2
+        assert router.stats()["replica_available"] is False
+        await dead_engine.dispose()
+    finally:
+        await primary_engine.dispose()
+        await replica_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_token_missing_on_replica_is_read_from_primary(tmp_path, monkeypatch):
+    primary_engine, primary = await _factory(tmp_path / "primary.db")
+    replica_engine, replica = await _factory(tmp_path / "replica.db")
+    async with primary() as db:
+        token = (await minting.mint_tags(db, "shop-1", 1))[0]
+    router = ReadRouter(primary, replica)
+
+    async def read_db():
+        async with router.session() as session:
+            yield session
+
+    monkeypatch.setattr(main, "async_session", primary)
+    main.app.dependency_overrides[get_read_db] = read_db
+    try:
+        async with AsyncClient(app=main.app, base_url="http://test") as ac:
+            r = await ac.get(f"/t/{token}")
+            assert r.status_code == 200 and r.json()["shop"]["id"] == "shop-1"
+            assert (await ac.get("/t/never-minted")).status_code == 404
+        assert router.stats()["replica_sessions"] == 2
+    finally:
+        main.app.dependency_overrides.pop(get_read_db, None)
+        await primary_engine.dispose()
+        await replica_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_replica_responses_are_cached_briefly(tmp_path, monkeypatch):
+    import time
+    from backend.app.token_cache import TOKEN_CACHE_REPLICA_TTL, token_cache
+
+    primary_engine, primary = await _factory(tmp_path / "primary.db")
+    replica_engine, replica = await _factory(tmp_path / "replica.db")
+    async with replica() as db:
+        on_replica = (await minting.mint_tags(db, "shop-1", 1))[0]
+    async with primary() as db:
+        on_primary = (await minting.mint_tags(db, "shop-1", 1))[0]
+    router = ReadRouter(primary, replica)
+
+    async def read_db():
+        async with router.session() as session:
+            yield session
+
+    monkeypatch.setattr(main, "async_session", primary)
+    main.app.dependency_overrides[get_read_db] = read_db
+    token_cache.clear()
+    try:
+        async with AsyncClient(app=main.app, base_url="http://test") as ac:
+            assert (await ac.get(f"/t/{on_replica}")).status_code == 200
+            assert (await ac.get(f"/t/{on_primary}")).status_code == 200
+        now = time.monotonic()
+        assert token_cache._data[on_replica][0] - now <= TOKEN_CACHE_REPLICA_TTL
+        assert token_cache._data[on_primary][0] - now > TOKEN_CACHE_REPLICA_TTL
+    finally:
+        main.app.dependency_overrides.pop(get_read_db, None)
+        token_cache.clear()
+        await primary_engine.dispose()
+        await replica_engine.dispose()
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import event, func, select
+from datetime import datetime, timedelta
+from backend.app import crud, models, rollups
+
+
+async def _seed(db):
+    db.add(models.Shop(id="shop-1", name="Alpha"))
+    db.add(models.Shop(id="shop-2", name="Beta"))
+    db.add(models.NFCTag(id="tag-1", shop_id="shop-1", token="tok-1"))
+    db.add(models.NFCTag(id="tag-2", shop_id="shop-1", token="tok-2"))
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_incremental_counters_match_backfill(session_factory):
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    async with session_factory() as db:
+        await _seed(db)
+        await crud.create_visits_bulk(db, [
+            {"id": "v1", "tag_id": "tag-1", "created_at": yesterday},
+            {"id": "v2", "tag_id": "tag-1", "created_at": yesterday},
+            {"id": "v3", "tag_id": "tag-2", "created_at": datetime.utcnow()},
+        ])
+        await crud.create_visit(db, "tag-2")
+        await crud.create_content(db, "shop-1", "t", "b")
+
+        incremental = await crud.list_shops_with_metrics(db)
+        assert {s["id"]: (s["visits"], s["reviews"]) for s in incremental} == {"shop-1": (4, 1), "shop-2": (0, 0)}
+        assert (await rollups.shop_day(db, "shop-1", yesterday.date()))["visits"] == 2
+
+        result = await rollups.backfill(db)
+        assert result["shop_days"] >= 1
+        assert await crud.list_shops_with_metrics(db) == incremental
+        assert await rollups.shop_totals(db, "shop-1") == {"visits": 4, "contents": 1}
+
+
+@pytest.mark.asyncio
+async def test_keyset_pagination_walks_all_shops(session_factory):
+    async with session_factory() as db:
+        for i in range(7):
+            db.add(models.Shop(id=f"s{i}", name=f"Shop {i % 3}"))
+            db.add(models.NFCTag(id=f"t{i}", shop_id=f"s{i}", token=f"k{i}"))
+        await db.flush()
+        await rollups.add_shops(db, [f"s{i}" for i in range(7)])
+        await db.commit()
+        await crud.create_visits_bulk(db, [{"id": f"v{i}-{j}", "tag_id": f"t{i}"} for i in range(7) for j in range(i % 4)])
+
+        for sort in ("name", "visits", "reviews"):
+            seen, cursor = [], None
+            while True:
+                items, cursor = await crud.list_shops_page(db, sort=sort, limit=3, cursor=cursor)
+                seen.extend(items)
+                if cursor is None:
+                    break
+            assert sorted(s["id"] for s in seen) == [f"s{i}" for i in range(7)]
+            if sort == "visits":
+                assert [(s["visits"], s["id"]) for s in seen] == sorted(((s["visits"], s["id"]) for s in seen), reverse=True)
+
+        mine, cursor = await crud.list_shops_page(db, sort="visits", shop_id="s3")
+        assert [s["id"] for s in mine] == ["s3"] and mine[0]["visits"] == 3 and cursor is None
+
+        with pytest.raises(ValueError):
+            await crud.list_shops_page(db, sort="name", cursor="garbage")
+
+
+
+@pytest.mark.asyncio
+async def test_every_shop_has_totals_and_sorted_pages_scan_an_index(session_factory):
+    async with session_factory() as db:
+        await crud.create_merchant_account(db)
+        await crud.create_merchant_accounts(db, 3)
+        shops = (await db.execute(select(func.count()).select_from(models.Shop))).scalar()
+        totals = (await db.execute(select(func.count()).select_from(models.ShopTotals))).scalar()
+        assert shops == totals == 4
+
+        conn = await db.connection()
+        statements = []
+
+        def capture(_conn, _cursor, statement, parameters, _context, _executemany):
+            statements.append((statement, parameters))
+
+        event.listen(conn.sync_connection, "before_cursor_execute", capture)
+        for sort in ("visits", "reviews"):
+            _, cursor = await crud.list_shops_page(db, sort=sort, limit=1)
+            await crud.list_shops_page(db, sort=sort, limit=1, cursor=cursor)
+        event.remove(conn.sync_connection, "before_cursor_execute", capture)
+
+        for statement, parameters in statements:
+            plan = " ".join(str(r[-1]) for r in await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            assert "ix_shop_totals_" in plan and "TEMP B-TREE" not in plan, plan
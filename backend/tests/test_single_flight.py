@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from backend.app.main import app
+from backend.app.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = {"n": 0}
+
+    async def slow():
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        return {"n": calls["n"]}
+
+    results = await asyncio.gather(*[flight.do("k", slow) for _ in range(5)])
+    assert calls["n"] == 1 and all(r == {"n": 1} for r in results)
+    assert flight.stats()["saved_upstream_calls"] == 4 and flight.stats()["in_flight"] == 0
+
+    # the key is released after completion: the next call executes again
+    await flight.do("k", slow)
+    assert calls["n"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failure_reaches_every_waiter_and_is_not_replayed():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*[flight.do("k", boom) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["failures"] == 1
+
+    async def ok():
+        return "fine"
+
+    assert await flight.do("k", ok) == "fine"
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_the_shared_call():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = {"shared": False}
+
+    async def slow():
+        started.set()
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled["shared"] = True
+            raise
+        return "done"
+
+    first = asyncio.create_task(flight.do("k", slow))
+    second = asyncio.create_task(flight.do("k", slow))
+    await started.wait()
+    first.cancel()
+    assert await second == "done"
+    assert first.cancelled() and not cancelled["shared"]
+
+    # once every waiter is gone the shared call is cancelled too
+    only = asyncio.create_task(flight.do("j", slow))
+    await asyncio.sleep(0.01)
+    only.cancel()
+    await asyncio.sleep(0.01)
+    assert cancelled["shared"] and flight.stats()["abandoned"] == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_ai_requests_are_coalesced(monkeypatch):
+    calls = {"n": 0}
+
+    async def fake_generate_text(model, messages, stream=False, temperature=0.0):
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        return {"id": "resp", "model": model}
+
+    monkeypatch.setattr("backend.app.ai.generate_text", fake_generate_text)
+    body = {"template_id": "promo", "context": {"shop": "s1"}}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        responses = await asyncio.gather(*[ac.post("/ai/generate", json=body) for _ in range(4)])
+    assert all(r.status_code == 200 for r in responses)
+    assert calls["n"] == 1
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import select
+from backend.app import models, tag_migration
+
+
+async def _seed(db, n):
+    for i in range(n):
+        payload = {"uri": f"https://old.example/t/tok{i}", "extra": i}
+        if i < 2:
+            payload = [None, "not an object"][i]
+        db.add(models.NFCTag(id=f"tag-{i:04d}", token=f"tok{i}", ndef_payload=payload))
+    await db.commit()
+
+
+async def _payloads(db):
+    res = await db.execute(select(models.NFCTag.token, models.NFCTag.ndef_payload))
+    return dict(res.fetchall())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("set_based", [True, False])
+async def test_migration_rewrites_uri_and_keeps_other_keys(session_factory, monkeypatch, set_based):
+    if not set_based:
+        monkeypatch.setattr(tag_migration, "_SET_URI_SQL", {})
+    async with session_factory() as db:
+        await _seed(db, 12)
+        result = await tag_migration.migrate_tag_uris(db, base="https://new.example/t/", chunk_size=5)
+        assert result == {"migrated": 12, "resumed_from": 0, "chunks": 3}
+        payloads = await _payloads(db)
+    assert all(p["uri"] == f"https://new.example/t/{t}" for t, p in payloads.items())
+    assert payloads["tok3"]["extra"] == 3
+
+
+@pytest.mark.asyncio
+async def test_migration_resumes_from_checkpoint(session_factory):
+    class Crash(Exception):
+        pass
+
+    async def crash_after_first_chunk(done, total):
+        raise Crash()
+
+    async with session_factory() as db:
+        await _seed(db, 10)
+        with pytest.raises(Crash):
+            await tag_migration.migrate_tag_uris(db, base="https://new.example/t/", chunk_size=4, on_progress=crash_after_first_chunk)
+
+    async with session_factory() as db:
+        result = await tag_migration.migrate_tag_uris(db, base="https://new.example/t/", chunk_size=4)
+        assert result["resumed_from"] == 4 and result["migrated"] == 10 and result["chunks"] == 2
+        assert all(p["uri"].startswith("https://new.example/") for p in (await _payloads(db)).values())
+
+        again = await tag_migration.migrate_tag_uris(db, chunk_size=4)
+        assert again["resumed_from"] == 0 and again["migrated"] == 10
@@ -0,0 +1,59 @@
+import pytest
+from httpx import AsyncClient
+from backend.app.main import app
+from backend.app.token_cache import TokenCache, token_cache
+
+
+def test_lru_eviction_and_shop_invalidation():
+    cache = TokenCache(maxsize=2, ttl=60)
+    cache.set("a", "shop-1", {"tag_id": "1"})
+    cache.set("b", "shop-2", {"tag_id": "2"})
+    assert cache.get("a") is not None  # "a" becomes most recently used
+    cache.set("c", "shop-1", {"tag_id": "3"})
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    cache.invalidate_shop("shop-1")
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_ttl_expiry():
+    cache = TokenCache(maxsize=10, ttl=-1)
+    cache.set("a", None, {"tag_id": "1"})
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_resolve_token_served_from_cache(monkeypatch):
+    calls = {"tag": 0}
+
+    async def fake_get_tag_by_token(db, token):
+        calls["tag"] += 1
+
+        class Tag:
+            id = "tag-cached"
+            shop_id = "shop-cached"
+        return Tag()
+
+    async def fake_get_content_for_tag(db, tag_id):
+        return None
+
+    async def fake_create_visit(db, tag_id):
+        return None
+
+    monkeypatch.setattr("backend.app.crud.get_tag_by_token", fake_get_tag_by_token)
+    monkeypatch.setattr("backend.app.crud.get_content_for_tag", fake_get_content_for_tag)
+    monkeypatch.setattr("backend.app.crud.create_visit", fake_create_visit)
+    token_cache.invalidate_token("cached-token")
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.get("/t/cached-token")
+        second = await ac.get("/t/cached-token")
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert calls["tag"] == 1
+
+    token_cache.invalidate_shop("shop-cached")
+    assert token_cache.get("cached-token") is None
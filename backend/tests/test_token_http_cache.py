@@ -0,0 +1,97 @@
+import pytest
+from httpx import AsyncClient
+from backend.app import crud, minting
+from backend.app.db import get_read_db
+from backend.app.main import app
+from backend.app.token_cache import token_cache
+from backend.app.visit_buffer import visit_buffer
+
+
+@pytest.fixture
+async def client(session_factory):
+    async def read_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_read_db] = read_db
+    token_cache.clear()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            yield ac
+    finally:
+        app.dependency_overrides.pop(get_read_db, None)
+        token_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_etag_revalidation_and_content_change(session_factory, client, monkeypatch):
+    async with session_factory() as db:
+        token = (await minting.mint_tags(db, "shop-1", 1))[0]
+
+    r = await client.get(f"/t/{token}")
+    assert r.status_code == 200 and r.json()["type"] == "shop"
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "public, no-cache"
+
+    # revalidation from the token cache, then from the database without loading the content body
+    assert (await client.get(f"/t/{token}", headers={"If-None-Match": etag})).status_code == 304
+    token_cache.clear()
+
+    async def no_body(db, tag_id):
+        raise AssertionError("content body loaded for a matching ETag")
+
+    with monkeypatch.context() as m:
+        m.setattr(crud, "get_content_for_tag", no_body)
+        r = await client.get(f"/t/{token}", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert r.status_code == 304 and r.content == b"" and r.headers["etag"] == etag
+
+    async with session_factory() as db:
+        await crud.create_content(db, "shop-1", "New title", "New body")
+    r = await client.get(f"/t/{token}", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["title"] == "New title"
+    assert r.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_visits_are_counted_on_revalidation_and_by_beacon(session_factory, client, monkeypatch):
+    async with session_factory() as db:
+        token = (await minting.mint_tags(db, "shop-1", 1))[0]
+    before = visit_buffer.enqueued
+
+    etag = (await client.get(f"/t/{token}")).headers["etag"]
+    await client.get(f"/t/{token}", headers={"If-None-Match": etag})
+    assert visit_buffer.enqueued - before == 2
+
+    monkeypatch.setattr("backend.app.main.TAP_COUNT_ON_GET", False)
+    await client.get(f"/t/{token}")
+    assert (await client.post(f"/t/{token}/visit")).status_code == 204
+    assert visit_buffer.enqueued - before == 3
+    assert (await client.post("/t/never-minted/visit")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_cache_control_policy(session_factory, client, monkeypatch):
+    async with session_factory() as db:
+        token = (await minting.mint_tags(db, "shop-1", 1))[0]
+    monkeypatch.setattr("backend.app.main.TAP_CACHE_MAX_AGE", 300)
+    monkeypatch.setattr("backend.app.main.TAP_CACHE_STALE_WHILE_REVALIDATE", 60)
+    r = await client.get(f"/t/{token}")
+    assert r.headers["cache-control"] == "public, max-age=300, stale-while-revalidate=60"
+
+
+@pytest.mark.asyncio
+async def test_etag_and_body_come_from_the_same_content_item(session_factory):
+    from datetime import datetime
+    from sqlalchemy import insert
+    from backend.app import models
+
+    async with session_factory() as db:
+        tag_id = (await db.execute(insert(models.NFCTag).values(id="tag-1", shop_id="shop-1", token="tok"))).inserted_primary_key[0]
+        await db.execute(insert(models.ContentItem), [
+            {"id": "c-old", "shop_id": "shop-1", "title": "old", "created_at": datetime(2026, 1, 1), "status": models.CONTENT_PUBLISHED},
+            {"id": "c-new", "shop_id": "shop-1", "title": "new", "created_at": datetime(2026, 3, 1), "status": models.CONTENT_PUBLISHED},
+            {"id": "c-draft", "shop_id": "shop-1", "title": "draft", "created_at": datetime(2026, 4, 1), "status": models.CONTENT_DRAFT},
+        ])
+        await db.commit()
+        assert await crud.get_content_id_for_tag(db, tag_id) == "c-new"
+        assert (await crud.get_content_for_tag(db, tag_id)).id == "c-new"
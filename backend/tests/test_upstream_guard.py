@@ -0,0 +1,115 @@
+import asyncio
+import httpx
+import pytest
+from httpx import AsyncClient
+from backend.app import main
+from backend.app.main import app
+from backend.app.upstream_guard import Bulkhead, CircuitBreaker, UpstreamGuard, UpstreamUnavailable, CLOSED, OPEN
+
+
+def _timeout():
+    return httpx.ReadTimeout("slow upstream")
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_rejects_when_queue_is_full_or_wait_expires():
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    await bulkhead.acquire()
+    waiter = asyncio.create_task(bulkhead.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(UpstreamUnavailable) as full:
+        await bulkhead.acquire()
+    assert full.value.reason == "bulkhead_full"
+    with pytest.raises(UpstreamUnavailable) as timed_out:
+        await waiter
+    assert timed_out.value.reason == "bulkhead_timeout"
+    bulkhead.release()
+    assert bulkhead.stats()["active"] == 0 and bulkhead.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_keeps_permits_of_waiters_that_give_up():
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=5, queue_timeout=0.05)
+    for _ in range(20):
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await asyncio.sleep(0)
+        # the permit is handed to the waiter, which is cancelled before it can run
+        bulkhead.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+    await asyncio.wait_for(bulkhead.acquire(), 1)
+    bulkhead.release()
+    assert bulkhead._semaphore._value == 1 and bulkhead.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers_through_probe():
+    guard = UpstreamGuard(Bulkhead(max_concurrent=2), CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+
+    async def failing():
+        raise _timeout()
+
+    for _ in range(2):
+        with pytest.raises(httpx.ReadTimeout):
+            await guard.call(failing)
+    assert guard.breaker.state == OPEN
+
+    calls = {"n": 0}
+
+    async def ok():
+        calls["n"] += 1
+        return "ok"
+
+    with pytest.raises(UpstreamUnavailable):
+        await guard.call(ok)
+    assert calls["n"] == 0
+
+    await asyncio.sleep(0.06)
+    # half-open: a failed probe re-opens immediately
+    with pytest.raises(httpx.ReadTimeout):
+        await guard.call(failing)
+    assert guard.breaker.state == OPEN
+
+    await asyncio.sleep(0.06)
+    assert await guard.call(ok) == "ok"
+    assert guard.breaker.state == CLOSED and guard.breaker.stats()["times_opened"] == 2
+
+
+@pytest.mark.asyncio
+async def test_non_upstream_errors_do_not_trip_the_breaker():
+    guard = UpstreamGuard(Bulkhead(), CircuitBreaker(failure_threshold=1, reset_timeout=60))
+
+    async def misconfigured():
+        raise RuntimeError("SILRA_API_KEY not configured in environment")
+
+    with pytest.raises(RuntimeError):
+        await guard.call(misconfigured)
+    assert guard.breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_ai_generate_degrades_when_breaker_is_open(monkeypatch):
+    guard = UpstreamGuard(Bulkhead(), CircuitBreaker(failure_threshold=1, reset_timeout=60), fallback="mock")
+    monkeypatch.setattr(main, "llm_guard", guard)
+    calls = {"n": 0}
+
+    async def fake_generate_text(model, messages, stream=False, temperature=0.0):
+        calls["n"] += 1
+        raise _timeout()
+
+    monkeypatch.setattr("backend.app.ai.generate_text", fake_generate_text)
+    body = {"messages": [{"role": "user", "content": "hi"}], "cache": False}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        r = await ac.post("/ai/generate", json=body)
+        assert r.status_code == 500
+        r = await ac.post("/ai/generate", json=body)
+        assert r.status_code == 200 and r.json()["raw"]["degraded"] == "circuit_open"
+        assert calls["n"] == 1
+
+        guard.fallback = "error"
+        r = await ac.post("/ai/generate", json=body)
+        assert r.status_code == 503 and "retry-after" in r.headers
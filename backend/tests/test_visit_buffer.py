@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import select, func
+from backend.app import models
+from backend.app.visit_buffer import VisitBuffer
+
+
+async def _count_visits(session_factory):
+    async with session_factory() as db:
+        res = await db.execute(select(func.count()).select_from(models.Visit))
+        return res.scalar()
+
+
+@pytest.mark.asyncio
+async def test_buffer_drains_on_stop(session_factory):
+    buf = VisitBuffer(session_factory=session_factory, max_size=100, batch_size=7, flush_interval=60)
+    await buf.start()
+    for i in range(25):
+        assert buf.enqueue(f"tag-{i % 3}", user_agent="pytest")
+    await buf.stop()
+
+    assert await _count_visits(session_factory) == 25
+    stats = buf.stats()
+    assert stats["written"] == 25 and stats["dropped"] == 0 and not stats["running"]
+
+
+@pytest.mark.asyncio
+async def test_buffer_drops_when_full(session_factory):
+    buf = VisitBuffer(session_factory=session_factory, max_size=3, batch_size=10, flush_interval=60)
+    results = [buf.enqueue("tag-1") for _ in range(5)]
+    assert results == [True, True, True, False, False]
+    assert buf.dropped == 2
+
+    await buf.stop()
+    assert await _count_visits(session_factory) == 3